@@ -0,0 +1,37 @@
+import asyncio
+import os
+from unittest.mock import patch
+
+import pytest
+
+from benchmarks.datagen import SCALES, generate_database
+
+# Comma-separated scales to run, e.g. BENCH_SCALES=small,medium,large
+BENCH_SCALES = os.getenv("BENCH_SCALES", "small,medium").split(",")
+
+USER_ID = 1
+
+
+@pytest.fixture(scope="session", params=BENCH_SCALES)
+def database(request, tmp_path_factory):
+    path = tmp_path_factory.mktemp("bench") / f"{request.param}.db"
+    return request.param, generate_database(str(path), SCALES[request.param])
+
+
+@pytest.fixture
+def db_path(database):
+    _, path = database
+    with patch("sql.DB_PATH", path):
+        yield path
+
+
+@pytest.fixture
+def run(benchmark):
+    """Benchmarks a coroutine function on a private event loop."""
+    loop = asyncio.new_event_loop()
+
+    def run_benchmark(func, *args):
+        return benchmark(lambda: loop.run_until_complete(func(*args)))
+
+    yield run_benchmark
+    loop.close()
@@ -0,0 +1,189 @@
+"""Deterministic synthetic databases for benchmarks.
+
+    python -m benchmarks.datagen bench.db --users 1000 --expenses 2000
+
+Dates are relative to today, so month-scoped queries always find rows; on a
+given day the same seed and scale always produce the same database.
+"""
+
+import argparse
+import asyncio
+import random
+import sqlite3
+from datetime import date, timedelta
+from typing import NamedTuple
+
+import sql
+from constants import EMOJI_TO_CATEGORY
+
+# Expenses store the category button label, e.g. "🍎 Groceries".
+CATEGORIES = list(EMOJI_TO_CATEGORY)
+
+SUBSCRIPTION_NAMES = [
+    "Netflix",
+    "Spotify",
+    "YouTube Premium",
+    "iCloud",
+    "Gym",
+    "Phone",
+    "Internet",
+    "Disney+",
+]
+
+# Daily rates per FX_BASE_CURRENCY unit, so currency switches have data.
+FX_CURRENCIES = {"USD": 1.1, "GBP": 0.85}
+
+
+class Scale(NamedTuple):
+    users: int
+    expenses: int
+    savings: int
+    subscriptions: int
+    years: int
+
+
+SCALES = {
+    "small": Scale(users=10, expenses=200, savings=20, subscriptions=3, years=1),
+    "medium": Scale(users=100, expenses=2_000, savings=100, subscriptions=5, years=2),
+    "large": Scale(users=1_000, expenses=2_000, savings=100, subscriptions=8, years=3),
+}
+
+
+def _random_date(rng: random.Random, start: date, days: int) -> str:
+    return (start + timedelta(days=rng.randrange(days))).isoformat()
+
+
+def generate_rows(scale: Scale, seed: int = 0, today: date | None = None):
+    """Returns ``(expenses, savings, subscriptions)`` rows for ``scale``.
+
+    Every user also gets expenses in the current month, so month-scoped
+    queries always have something to aggregate. Amounts are entered in
+    DEFAULT_CURRENCY, like rows the bot writes for a new user.
+    """
+    rng = random.Random(seed)
+    currency = sql.DEFAULT_CURRENCY
+    today = today or date.today()
+    start = today - timedelta(days=365 * scale.years)
+    days = (today - start).days + 1
+    month_start = today.replace(day=1)
+    month_days = (today - month_start).days + 1
+
+    expenses = []
+    savings = []
+    subscriptions = []
+
+    for user_id in range(1, scale.users + 1):
+        weights = [rng.random() for _ in CATEGORIES]
+
+        for index in range(scale.expenses):
+            category = rng.choices(CATEGORIES, weights)[0]
+            amount = round(rng.lognormvariate(2.5, 1.0), 2)
+            if index % 10 == 0:
+                expense_date = _random_date(rng, month_start, month_days)
+            else:
+                expense_date = _random_date(rng, start, days)
+            expenses.append((user_id, category, amount, expense_date, currency, amount))
+
+        for _ in range(scale.savings):
+            amount = round(rng.lognormvariate(2.0, 0.8), 2)
+            saving_date = _random_date(rng, start, days)
+            savings.append((user_id, amount, saving_date, currency, amount))
+
+        for name in rng.sample(SUBSCRIPTION_NAMES, scale.subscriptions):
+            amount = round(rng.uniform(2, 60), 2)
+            count = rng.randint(1, 12 * scale.years)
+            is_active = int(rng.random() < 0.8)
+            subscriptions.append(
+                (
+                    user_id,
+                    name,
+                    amount,
+                    count,
+                    is_active,
+                    _random_date(rng, month_start, month_days),
+                    currency,
+                    amount,
+                )
+            )
+
+    return expenses, savings, subscriptions
+
+
+def generate_fx_rates(scale: Scale, seed: int = 0, today: date | None = None):
+    """Returns ``(currency, date, rate)`` rows for every day in ``scale.years``."""
+    rng = random.Random(seed)
+    today = today or date.today()
+    start = today - timedelta(days=365 * scale.years)
+
+    rates = []
+    for currency, rate in FX_CURRENCIES.items():
+        for offset in range((today - start).days + 1):
+            rate *= 1 + rng.uniform(-0.005, 0.005)
+            day = (start + timedelta(days=offset)).isoformat()
+            rates.append((currency, day, round(rate, 6)))
+
+    return rates
+
+
+def generate_database(path: str, scale: Scale, seed: int = 0) -> str:
+    """Creates the bot's schema at ``path`` and fills it with ``scale`` rows."""
+    previous_path = sql.DB_PATH
+    sql.DB_PATH = path
+    try:
+        asyncio.run(sql.connect_database())
+    finally:
+        sql.DB_PATH = previous_path
+
+    expenses, savings, subscriptions = generate_rows(scale, seed)
+
+    with sqlite3.connect(path) as db:
+        db.executemany(
+            "INSERT INTO expenses "
+            "(user_id, category, amount, date, currency, original_amount) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            expenses,
+        )
+        db.executemany(
+            "INSERT INTO savings (user_id, amount, date, currency, original_amount) "
+            "VALUES (?, ?, ?, ?, ?)",
+            savings,
+        )
+        db.executemany(
+            "INSERT INTO subscriptions "
+            "(user_id, name, amount, count, is_active, date, currency, original_amount) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            subscriptions,
+        )
+        db.executemany(
+            "INSERT INTO fx_rates (currency, date, rate) VALUES (?, ?, ?)",
+            generate_fx_rates(scale, seed),
+        )
+
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--expenses", type=int)
+    parser.add_argument("--savings", type=int)
+    parser.add_argument("--subscriptions", type=int)
+    parser.add_argument("--years", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    overrides = {
+        field: getattr(args, field)
+        for field in Scale._fields
+        if getattr(args, field) is not None
+    }
+    scale = SCALES[args.scale]._replace(**overrides)
+
+    generate_database(args.path, scale, args.seed)
+    print(f"Wrote {scale} to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""End-to-end load test of the real dispatcher without network access.
+
+    python -m benchmarks.loadtest --users 2000 --concurrency 200
+
+Synthetic users send updates through ``main.create_dispatcher()``; a fake
+Bot session records outgoing API calls instead of sending them. Prints
+throughput, latency percentiles per handler and event loop lag.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Any, AsyncGenerator, Awaitable, Callable, Optional
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import Chat, Message, TelegramObject, Update
+
+import sql
+import storage
+from benchmarks.datagen import Scale, generate_database
+from constants import EMOJI_TO_CATEGORY
+
+FLOWS = {
+    "expense": 3,
+    "quick_expense": 3,
+    "statistics": 2,
+    "subscriptions": 1,
+    "report": 1,
+}
+
+# The API call each run of a flow ends with when it succeeds. Handlers such as
+# ``reports`` log and swallow their errors, so these are counted, not raised.
+EXPECTED_CALLS = {
+    "statistics": "SendPhoto",
+    "report": "SendDocument",
+}
+
+
+class FakeSession(BaseSession):
+    """Records every API call and answers it without touching the network."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls: Counter = Counter()
+        self._message_ids = iter(range(1, 1 << 62))
+
+    async def make_request(
+        self,
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+        timeout: Optional[int] = None,
+    ) -> TelegramType:
+        self.calls[type(method).__name__] += 1
+
+        if method.__returning__ is Message:
+            return Message(
+                message_id=next(self._message_ids),
+                date=datetime.now(),
+                chat=Chat(id=method.chat_id, type="private"),
+            )
+        return True
+
+    async def stream_content(
+        self, *args: Any, **kwargs: Any
+    ) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+    async def close(self):
+        pass
+
+
+class LatencyRecorder(BaseMiddleware):
+    """Keeps every handler duration, so exact percentiles can be computed."""
+
+    def __init__(self):
+        self.samples: defaultdict[str, list[float]] = defaultdict(list)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            self.samples[data["handler"].callback.__name__].append(
+                time.perf_counter() - start
+            )
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: list[float] = []
+
+    async def run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(time.perf_counter() - start - self.interval)
+
+
+class SyntheticUser:
+    def __init__(self, user_id: int, bot: Bot, rng: random.Random):
+        self.user_id = user_id
+        self.bot = bot
+        self.rng = rng
+        self.updates = 0
+
+    def _message(self, text: str) -> dict:
+        return {
+            "message_id": self.rng.randrange(1 << 30),
+            "date": int(time.time()),
+            "chat": {"id": self.user_id, "type": "private"},
+            "from": {"id": self.user_id, "is_bot": False, "first_name": "Load"},
+            "text": text,
+        }
+
+    def message(self, text: str) -> Update:
+        return self._update({"message": self._message(text)})
+
+    def callback(self, data: str) -> Update:
+        return self._update(
+            {
+                "callback_query": {
+                    "id": str(self.rng.randrange(1 << 30)),
+                    "from": {"id": self.user_id, "is_bot": False, "first_name": "Load"},
+                    "chat_instance": str(self.user_id),
+                    "message": self._message("📊"),
+                    "data": data,
+                }
+            }
+        )
+
+    def _update(self, payload: dict) -> Update:
+        self.updates += 1
+        payload["update_id"] = self.user_id * 1000 + self.updates
+        return Update.model_validate(payload, context={"bot": self.bot})
+
+    def flow(self, name: str) -> list[Update]:
+        if name == "expense":
+            category = self.rng.choice(list(EMOJI_TO_CATEGORY))
+            amount = f"{self.rng.lognormvariate(2.5, 1.0):.2f}"
+            return [self.message(category), self.message(amount)]
+        if name == "quick_expense":
+            category = self.rng.choice(list(EMOJI_TO_CATEGORY))
+            amount = f"{self.rng.lognormvariate(2.5, 1.0):.2f}"
+            return [self.message(f"{amount} {category}")]
+        if name == "statistics":
+            return [self.message("📊 Statistics")]
+        if name == "subscriptions":
+            return [self.message("📝 Subscriptions")]
+        return [self.callback(self.rng.choice(["report:month", "report:all_time"]))]
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    return {
+        "count": len(samples),
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p95_ms": percentile(samples, 0.95) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+        "max_ms": max(samples) * 1000,
+    }
+
+
+async def run_load_test(
+    users: int = 1000,
+    flows_per_user: int = 3,
+    concurrency: int = 100,
+    seed: int = 0,
+    dispatcher_factory: Optional[Callable[[], Dispatcher]] = None,
+) -> dict[str, Any]:
+    """Replays ``flows_per_user`` random flows for every synthetic user.
+
+    Expects ``sql.DB_PATH`` to point at a prepared database.
+    """
+    if dispatcher_factory is None:
+        from main import create_dispatcher
+
+        dispatcher_factory = create_dispatcher
+
+    rng = random.Random(seed)
+    session = FakeSession()
+    bot = Bot(token="42:LOADTEST", session=session)
+    dp = dispatcher_factory()
+
+    recorder = LatencyRecorder()
+    dp.message.middleware(recorder)
+    dp.callback_query.middleware(recorder)
+
+    lag = LoopLagMonitor()
+    lag_task = asyncio.create_task(lag.run())
+
+    semaphore = asyncio.Semaphore(concurrency)
+    errors: Counter = Counter()
+    flows_run: Counter = Counter()
+    processed = 0
+
+    async def run_user(user: SyntheticUser, flows: list[str]):
+        nonlocal processed
+        async with semaphore:
+            for flow in flows:
+                flows_run[flow] += 1
+                for update in user.flow(flow):
+                    try:
+                        await dp.feed_update(bot, update)
+                    except Exception as e:
+                        errors[f"{flow}: {type(e).__name__}"] += 1
+                    processed += 1
+
+    names = list(FLOWS)
+    weights = list(FLOWS.values())
+    jobs = [
+        run_user(
+            SyntheticUser(user_id, bot, random.Random(rng.random())),
+            rng.choices(names, weights, k=flows_per_user),
+        )
+        for user_id in range(1, users + 1)
+    ]
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*jobs)
+    finally:
+        elapsed = time.perf_counter() - start
+        lag_task.cancel()
+        await dp.storage.close()
+
+    expected_calls: Counter = Counter()
+    for flow, count in flows_run.items():
+        if flow in EXPECTED_CALLS:
+            expected_calls[EXPECTED_CALLS[flow]] += count
+
+    return {
+        "users": users,
+        "updates": processed,
+        "seconds": elapsed,
+        "updates_per_second": processed / elapsed,
+        "handlers": {
+            name: summarize(samples)
+            for name, samples in sorted(recorder.samples.items())
+        },
+        "loop_lag": summarize(lag.samples or [0.0]),
+        "api_calls": dict(session.calls),
+        "errors": dict(errors),
+        "flows": dict(flows_run),
+        # Expected calls that were never made, e.g. reports that failed.
+        "missing_calls": {
+            method: count - session.calls[method]
+            for method, count in expected_calls.items()
+            if session.calls[method] < count
+        },
+    }
+
+
+def print_report(report: dict[str, Any]):
+    print(
+        f"{report['updates']} updates from {report['users']} users in "
+        f"{report['seconds']:.1f}s ({report['updates_per_second']:.0f} updates/s)\n"
+    )
+    print(f"{'handler':<32}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    rows = list(report["handlers"].items()) + [("event loop lag", report["loop_lag"])]
+    for name, stats in rows:
+        print(
+            f"{name:<32}{stats['count']:>8}{stats['p50_ms']:>10.1f}"
+            f"{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}"
+        )
+    print(f"\nAPI calls: {report['api_calls']}")
+    if report["errors"]:
+        print(f"Errors: {report['errors']}")
+    if report["missing_calls"]:
+        print(f"Missing API calls: {report['missing_calls']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--flows", type=int, default=3, help="flows per user")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--history", type=int, default=200, help="expenses per user")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+    # Per-update INFO logging would dominate the measurements.
+    logging.basicConfig(level=logging.WARNING)
+    json_path = os.path.abspath(args.json) if args.json else None
+    cwd = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "loadtest.db")
+        generate_database(
+            path,
+            Scale(
+                users=args.users,
+                expenses=args.history,
+                savings=args.history // 10,
+                subscriptions=3,
+                years=1,
+            ),
+            args.seed,
+        )
+        sql.DB_PATH = path
+        storage.DB_PATH = path
+        # Reports are written relative to the working directory.
+        os.chdir(directory)
+
+        try:
+            report = asyncio.run(
+                run_load_test(args.users, args.flows, args.concurrency, args.seed)
+            )
+        finally:
+            os.chdir(cwd)
+
+    print_report(report)
+
+    if json_path:
+        with open(json_path, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
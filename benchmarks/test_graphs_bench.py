@@ -0,0 +1,21 @@
+import asyncio
+import os
+
+import pytest
+
+from benchmarks.conftest import USER_ID
+from graphs import call_graph_creator
+from sql import get_all_categories_and_values
+
+
+@pytest.fixture
+def graph_values(db_path):
+    return asyncio.run(get_all_categories_and_values(USER_ID))
+
+
+def test_call_graph_creator(run, graph_values, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    path = run(call_graph_creator, graph_values)
+
+    os.remove(path)
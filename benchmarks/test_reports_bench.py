@@ -0,0 +1,11 @@
+import pytest
+
+from benchmarks.conftest import USER_ID
+from sql import create_report
+
+
+@pytest.mark.parametrize("is_all_time_report", [False, True], ids=["month", "all_time"])
+def test_create_report(is_all_time_report, run, db_path, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    run(create_report, USER_ID, is_all_time_report)
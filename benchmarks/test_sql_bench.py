@@ -0,0 +1,146 @@
+from datetime import date, timedelta
+
+import pytest
+
+import sql
+from benchmarks.conftest import USER_ID
+from sql import (
+    add_expense,
+    add_expenses,
+    add_new_subscription,
+    add_saving,
+    connect_database,
+    delete_expense,
+    disable_month_subscription,
+    enable_month_subscription,
+    get_all_categories_and_values,
+    get_budget_progress,
+    get_budgets,
+    get_category_stats,
+    get_daily_category_totals,
+    get_daily_expenses,
+    get_dataframes,
+    get_exchange_rate,
+    get_expense,
+    get_expenses_page,
+    get_month_subscriptions_expenses,
+    get_month_total_expenses,
+    get_monthly_category_totals,
+    get_recent_expenses,
+    get_recent_months,
+    get_savings,
+    get_subscriptions_breakdown,
+    get_subscriptions_page,
+    get_user_settings,
+    get_user_timezones,
+    get_year_expenses,
+    iter_month_summaries,
+    remove_budget,
+    renew_active_subscriptions,
+    set_budget,
+    set_user_currency,
+    set_user_timezone,
+    update_expense_amount,
+)
+
+
+async def consume_month_summaries():
+    return [chunk async for chunk in iter_month_summaries()]
+
+
+async def load_user_settings():
+    """Reads the settings from SQLite rather than the per-process cache."""
+    sql._user_settings.pop(USER_ID, None)
+    return await get_user_settings(USER_ID)
+
+
+async def add_and_undo_expense():
+    expense_id = await add_expense(USER_ID, "🍎 Groceries", 12.5)
+    await delete_expense(USER_ID, expense_id)
+
+
+async def set_and_remove_budget():
+    await set_budget(USER_ID, "🚗 Transport", 100.0)
+    await remove_budget(USER_ID, "🚗 Transport")
+
+
+async def switch_currency():
+    """Converts the user's history to USD and back, like two /currency calls."""
+    await set_user_currency(USER_ID, "USD")
+    await set_user_currency(USER_ID, "EUR")
+
+
+READS = {
+    "get_all_categories_and_values": (get_all_categories_and_values, USER_ID),
+    "get_budget_progress": (get_budget_progress, USER_ID, "🍎 Groceries"),
+    "get_budgets": (get_budgets, USER_ID),
+    "get_category_stats": (get_category_stats, USER_ID, "🍎 Groceries"),
+    "get_monthly_category_totals": (
+        get_monthly_category_totals,
+        USER_ID,
+        get_recent_months(12),
+    ),
+    "get_daily_expenses": (get_daily_expenses, USER_ID, date.today().year),
+    "get_daily_category_totals": (
+        get_daily_category_totals,
+        USER_ID,
+        f"{get_recent_months(4)[0]}-01",
+        f"{get_recent_months(1)[0]}-01",
+    ),
+    "get_year_expenses": (get_year_expenses, USER_ID),
+    "get_recent_expenses": (get_recent_expenses, USER_ID),
+    "get_expense": (get_expense, USER_ID, 1),
+    "get_expenses_page": (get_expenses_page, USER_ID),
+    "get_expenses_page_deep": (
+        get_expenses_page,
+        USER_ID,
+        None,
+        None,
+        ((date.today() - timedelta(days=365)).isoformat(), 1 << 62),
+    ),
+    "get_subscriptions_breakdown": (get_subscriptions_breakdown, USER_ID, 1, True),
+    "get_subscriptions_page": (get_subscriptions_page, USER_ID, True, True),
+    "get_month_subscriptions_expenses": (get_month_subscriptions_expenses, USER_ID),
+    "get_month_total_expenses": (get_month_total_expenses, USER_ID),
+    "get_month_savings": (get_savings, USER_ID, True),
+    "get_year_savings": (get_savings, USER_ID, False),
+    "get_dataframes_month": (get_dataframes, USER_ID, False),
+    "get_dataframes_all_time": (get_dataframes, USER_ID, True),
+    "iter_month_summaries": (consume_month_summaries,),
+    "get_exchange_rate": (get_exchange_rate, "USD", "GBP"),
+    "get_user_settings": (load_user_settings,),
+    "get_user_timezones": (get_user_timezones,),
+}
+
+WRITES = {
+    "connect_database": (connect_database,),
+    "add_expense": (add_expense, USER_ID, "🍎 Groceries", 12.5),
+    "add_expenses": (
+        add_expenses,
+        USER_ID,
+        [("🍎 Groceries", 12.5, "EUR", 12.5), ("🚗 Transport", 2.8, "USD", 3.0)],
+    ),
+    "add_saving": (add_saving, USER_ID, 5.0),
+    "add_new_subscription": (add_new_subscription, USER_ID, "Bench", 9.99),
+    "disable_month_subscription": (disable_month_subscription, USER_ID, 1),
+    "enable_month_subscription": (enable_month_subscription, USER_ID, 1),
+    "renew_active_subscriptions": (renew_active_subscriptions,),
+    "set_user_currency": (switch_currency,),
+    "delete_expense": (add_and_undo_expense,),
+    "remove_budget": (set_and_remove_budget,),
+    "set_user_timezone": (set_user_timezone, USER_ID, "Europe/Berlin"),
+    "set_budget": (set_budget, USER_ID, "🍎 Groceries", 300.0),
+    "update_expense_amount": (update_expense_amount, USER_ID, 1, 12.5),
+}
+
+
+@pytest.mark.parametrize("name", READS)
+def test_read(name, run, db_path):
+    func, *args = READS[name]
+    run(func, *args)
+
+
+@pytest.mark.parametrize("name", WRITES)
+def test_write(name, run, db_path):
+    func, *args = WRITES[name]
+    run(func, *args)
@@ -30,7 +30,9 @@ CATEGORY_MAP = {
 }
 
 COLUMN_NAMES = {
-    "amount": "Amount (€)",
+    "amount": "Amount ({symbol})",
+    "currency": "Currency",
+    "original_amount": "Entered amount",
     "category": "Category",
     "date": "Date",
     "name": "Name",
@@ -39,4 +41,30 @@ COLUMN_NAMES = {
 }
 
 MIN_CATEGORY_PERCENTAGE = 2.0
+TREND_PERIODS = (3, 6, 12)
+SUBSCRIPTIONS_PAGE_SIZE = 9
+HISTORY_PAGE_SIZE = 10
+BUDGET_THRESHOLDS = (50, 80, 100)
+ANOMALY_MIN_COUNT = 10
+ANOMALY_RATIO = 3.0
+ANOMALY_Z_SCORE = 3.0
+HISTORY_PERIODS = {"a": "All time", "y": "This year", "m": "This month"}
 NO_DATA_GRAPH_VALUE = 0.001
+
+# Rates in the fx_rates table are units of a currency per one FX_BASE_CURRENCY.
+FX_BASE_CURRENCY = "EUR"
+CURRENCY_SYMBOLS = {
+    "EUR": "€",
+    "USD": "$",
+    "GBP": "£",
+    "JPY": "¥",
+    "CHF": "Fr",
+    "PLN": "zł",
+    "CZK": "Kč",
+    "SEK": "kr",
+    "UAH": "₴",
+    "TRY": "₺",
+    "INR": "₹",
+    "CAD": "C$",
+    "AUD": "A$",
+}
@@ -0,0 +1,157 @@
+import calendar
+from collections import OrderedDict
+from datetime import datetime
+from typing import TYPE_CHECKING, NamedTuple
+
+from singleflight import single_flight
+from sql import get_current_date, get_daily_category_totals, get_recent_months
+
+if TYPE_CHECKING:
+    import numpy as np
+
+HISTORY_MONTHS = 6
+MAX_CACHED_MODELS = 10_000
+
+
+class ForecastModel(NamedTuple):
+    """How a user's spending is spread over past months, per category."""
+
+    categories: dict[str, int]
+    # Average share of a month's spending made by the end of each day, (C, 31).
+    shape: "np.ndarray"
+    # Average monthly total and number of past months with spending, (C,).
+    average: "np.ndarray"
+    months: "np.ndarray"
+
+
+def build_model(
+    rows: list[tuple[str, int, str, float]], months: list[str]
+) -> ForecastModel:
+    """Builds a model from ``(month, day, category, total)`` rows."""
+    import numpy as np
+
+    if not rows:
+        return ForecastModel({}, np.zeros((0, 31)), np.zeros(0), np.zeros(0))
+
+    row_months, row_days, row_categories, row_totals = zip(*rows)
+    labels, category_index = np.unique(np.asarray(row_categories), return_inverse=True)
+    month_index = np.searchsorted(np.asarray(months), np.asarray(row_months))
+
+    daily = np.zeros((len(labels), len(months), 31))
+    np.add.at(
+        daily,
+        (category_index, month_index, np.asarray(row_days) - 1),
+        np.asarray(row_totals, dtype=float),
+    )
+
+    monthly = daily.sum(axis=2)
+    active = monthly > 0
+    seen = active.sum(axis=1)
+
+    cumulative = np.cumsum(daily, axis=2)
+    share = np.divide(
+        cumulative,
+        monthly[:, :, None],
+        out=np.zeros_like(cumulative),
+        where=active[:, :, None],
+    )
+    shape = share.sum(axis=1) / np.maximum(seen, 1)[:, None]
+
+    return ForecastModel(
+        {label: index for index, label in enumerate(labels.tolist())},
+        shape,
+        monthly.sum(axis=1) / np.maximum(seen, 1),
+        seen,
+    )
+
+
+def project(
+    model: ForecastModel, spent: dict[str, float], day: int, days_in_month: int
+) -> dict[str, float]:
+    """Projects month-end totals per category from spending up to ``day``.
+
+    Blends the current run rate with what the category's past months still
+    spent after ``day``; the more months of history, the more the latter
+    counts. Categories without history fall back to the run rate alone.
+    """
+    import numpy as np
+
+    categories = list(model.categories)
+    categories += [category for category in spent if category not in model.categories]
+    known = len(model.categories)
+
+    current = np.array([spent.get(category, 0.0) for category in categories])
+    shape = np.zeros(len(categories))
+    shape[:known] = model.shape[:, day - 1]
+    average = np.zeros(len(categories))
+    average[:known] = model.average
+    months = np.zeros(len(categories))
+    months[:known] = model.months
+
+    run_rate = current * days_in_month / day
+    historical = current + average * (1 - shape)
+    weight = months / (months + 1)
+
+    projection = np.maximum(weight * historical + (1 - weight) * run_rate, current)
+
+    return dict(zip(categories, projection.tolist()))
+
+
+class ForecastCache:
+    """Keeps one model per user for the current month.
+
+    Past months do not change, so a model is built once and reused until the
+    month rolls over; this month's spending is passed in on every call.
+    """
+
+    def __init__(self, max_size: int = MAX_CACHED_MODELS):
+        self.max_size = max_size
+        self._models: OrderedDict[int, tuple[str, ForecastModel]] = OrderedDict()
+
+    async def get(self, user_id: int, months: list[str]) -> ForecastModel:
+        month = months[-1]
+        cached = self._models.get(user_id)
+        if cached is not None and cached[0] == month:
+            self._models.move_to_end(user_id)
+            return cached[1]
+
+        model = await single_flight.do(
+            (user_id, "forecast_model", month), self._load, user_id, months
+        )
+        self._models[user_id] = (month, model)
+        self._models.move_to_end(user_id)
+        if len(self._models) > self.max_size:
+            self._models.popitem(last=False)
+
+        return model
+
+    @staticmethod
+    async def _load(user_id: int, months: list[str]) -> ForecastModel:
+        history = months[:-1]
+        rows = await get_daily_category_totals(
+            user_id, f"{history[0]}-01", f"{months[-1]}-01"
+        )
+        return build_model(rows, history)
+
+    def forget(self, user_id: int):
+        self._models.pop(user_id, None)
+
+
+forecast_cache = ForecastCache()
+
+
+async def forecast_month(
+    user_id: int, spent: dict[str, float], subscriptions: float = 0.0
+) -> tuple[float, dict[str, float]]:
+    """Returns the projected month-end total and per-category projections.
+
+    Active subscriptions are already charged for the month, so they are
+    added as they are rather than extrapolated.
+    """
+    today = datetime.strptime(get_current_date(), "%Y-%m-%d")
+    days_in_month = calendar.monthrange(today.year, today.month)[1]
+
+    model = await forecast_cache.get(user_id, get_recent_months(HISTORY_MONTHS + 1))
+    projection = project(model, spent, today.day, days_in_month)
+
+    return sum(projection.values()) + subscriptions, projection
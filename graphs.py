@@ -4,21 +4,41 @@ import os
 import re
 import uuid
 from concurrent.futures import ThreadPoolExecutor
-
-import matplotlib as mpl
-import matplotlib.pyplot as plt
-import numpy as np
+from datetime import date
+from functools import lru_cache
+from typing import TYPE_CHECKING
 
 from constants import CATEGORY_MAP, MIN_CATEGORY_PERCENTAGE, NO_DATA_GRAPH_VALUE
+from metrics import GRAPH_RENDER_LATENCY, timed
+
+if TYPE_CHECKING:
+    import numpy as np
 
 logger = logging.getLogger(__name__)
 
-mpl.use("Agg")
+RENDER_WORKERS = 3
+
+_executor = ThreadPoolExecutor(max_workers=RENDER_WORKERS)
+
+
+@lru_cache(maxsize=None)
+def _matplotlib():
+    # matplotlib is only imported by the renderer threads, so processes that
+    # never draw a chart do not pay for it at startup. Charts are built as
+    # Figure objects rather than through pyplot, whose global figure state
+    # is not safe to use from several renderer threads at once.
+    import matplotlib as mpl
+
+    mpl.use("Agg")
+
+    import matplotlib.figure
 
-_executor = ThreadPoolExecutor(max_workers=3)
+    return mpl
 
 
 def transform_to_1d_list(x):
+    import numpy as np
+
     if np.isscalar(x):
         return [float(x)]
     arr = np.asarray(x).ravel()
@@ -41,9 +61,12 @@ def _remove_emoji(text: str) -> str:
     return text.strip()
 
 
+@timed(GRAPH_RENDER_LATENCY)
 def create_graph_sync(
-    categories: list[str], values: list[float], graph_name: str
+    categories: list[str], values: list[float], graph_name: str, symbol: str = "€"
 ) -> str:
+    mpl = _matplotlib()
+
     graph_path = f"graphs/{graph_name}"
     os.makedirs("graphs", exist_ok=True)
 
@@ -59,11 +82,12 @@ def create_graph_sync(
             else:
                 cats = cats + [""] * (len(vals) - len(cats))
 
-        fig = plt.figure(figsize=(10, 8))
+        fig = mpl.figure.Figure(figsize=(10, 8))
+        ax = fig.add_subplot()
 
-        colors = plt.cm.Set3(range(len(vals)))
+        colors = mpl.colormaps["Set3"](range(len(vals)))
 
-        wedges, texts, autotexts = plt.pie(
+        wedges, texts, autotexts = ax.pie(
             vals,
             labels=None,
             autopct="%1.1f%%",
@@ -78,8 +102,8 @@ def create_graph_sync(
             autotext.set_weight("bold")
             autotext.set_fontsize("10")
 
-        legend_labels = [f"{cat}: {val:.2f}€" for cat, val in zip(cats, vals)]
-        plt.legend(
+        legend_labels = [f"{cat}: {val:.2f}{symbol}" for cat, val in zip(cats, vals)]
+        ax.legend(
             wedges,
             legend_labels,
             title="Categories",
@@ -90,8 +114,7 @@ def create_graph_sync(
             frameon=False,
         )
 
-        plt.savefig(graph_path, dpi=200, bbox_inches="tight")
-        plt.close(fig)
+        fig.savefig(graph_path, dpi=200, bbox_inches="tight")
 
         return graph_path
 
@@ -100,7 +123,9 @@ def create_graph_sync(
         raise
 
 
-async def create_graph_async(categories: list[str], values: list[float]) -> str:
+async def create_graph_async(
+    categories: list[str], values: list[float], symbol: str = "€"
+) -> str:
     graph_name = f"graph_{uuid.uuid4().hex[:8]}.png"
 
     logger.info(f"Starting async graph creation: {graph_name}")
@@ -108,7 +133,7 @@ async def create_graph_async(categories: list[str], values: list[float]) -> str:
     try:
         loop = asyncio.get_running_loop()
         graph_path = await loop.run_in_executor(
-            _executor, create_graph_sync, categories, values, graph_name
+            _executor, create_graph_sync, categories, values, graph_name, symbol
         )
         logger.info(f"Async graph creation completed: {graph_name}")
 
@@ -119,7 +144,33 @@ async def create_graph_async(categories: list[str], values: list[float]) -> str:
         raise
 
 
-async def call_graph_creator(all_values):
+def _warm_up_sync(graph_name: str):
+    graph_path = create_graph_sync(["No Data"], [NO_DATA_GRAPH_VALUE], graph_name)
+    os.remove(graph_path)
+
+
+async def warm_up_renderer():
+    logger.info("Warming up graph renderer.")
+
+    try:
+        loop = asyncio.get_running_loop()
+        # One concurrent job per worker, so every renderer thread gets started
+        # and matplotlib builds its font cache before the first real chart.
+        await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    _executor, _warm_up_sync, f"warmup_{uuid.uuid4().hex[:8]}.png"
+                )
+                for _ in range(RENDER_WORKERS)
+            )
+        )
+        logger.info("Graph renderer warm-up completed.")
+
+    except Exception as e:
+        logger.error(f"Error in warm_up_renderer: {e}")
+
+
+async def call_graph_creator(all_values, symbol: str = "€"):
     categories = []
     values = []
     misc_total: float = 0
@@ -131,7 +182,7 @@ async def call_graph_creator(all_values):
         if total_sum == 0:
             categories = ["No Data"]
             values = [NO_DATA_GRAPH_VALUE]
-            result = await create_graph_async(categories, values)
+            result = await create_graph_async(categories, values, symbol)
             return result
 
         for category, value in all_values:
@@ -150,7 +201,7 @@ async def call_graph_creator(all_values):
             else:
                 values[categories.index("Miscellaneous")] += misc_total
 
-        result = await create_graph_async(categories, values)
+        result = await create_graph_async(categories, values, symbol)
         logger.info("Graph creator completed.")
 
         return result
@@ -158,3 +209,249 @@ async def call_graph_creator(all_values):
     except Exception as e:
         logger.error(f"Error in call_graph_creator: {e}")
         raise
+
+
+def build_trend_matrix(
+    rows: list[tuple[str, str, float]], months: list[str]
+) -> tuple[list[str], "np.ndarray"]:
+    import numpy as np
+
+    if not rows:
+        return [], np.zeros((len(months), 0))
+
+    row_months, row_categories, row_totals = zip(*rows)
+
+    month_index = np.searchsorted(np.asarray(months), np.asarray(row_months))
+    labels, category_index = np.unique(np.asarray(row_categories), return_inverse=True)
+
+    matrix = np.zeros((len(months), len(labels)))
+    matrix[month_index, category_index] = np.asarray(row_totals, dtype=float)
+
+    names = np.array(
+        [_remove_emoji(CATEGORY_MAP.get(label, label)) for label in labels]
+    )
+
+    return fold_small_categories(names, matrix)
+
+
+def fold_small_categories(
+    categories: "np.ndarray", matrix: "np.ndarray"
+) -> tuple[list[str], "np.ndarray"]:
+    import numpy as np
+
+    column_totals = matrix.sum(axis=0)
+    total_sum = column_totals.sum()
+
+    if total_sum == 0:
+        return [], matrix[:, :0]
+
+    keep = (column_totals / total_sum) * 100 > MIN_CATEGORY_PERCENTAGE
+    misc = matrix[:, ~keep].sum(axis=1)
+
+    kept_categories = categories[keep]
+    kept = matrix[:, keep]
+
+    if misc.any():
+        misc_column = np.flatnonzero(kept_categories == "Miscellaneous")
+        if misc_column.size:
+            kept[:, misc_column[0]] += misc
+        else:
+            kept_categories = np.append(kept_categories, "Miscellaneous")
+            kept = np.column_stack([kept, misc])
+
+    order = np.argsort(-kept.sum(axis=0), kind="stable")
+
+    return kept_categories[order].tolist(), kept[:, order]
+
+
+@timed(GRAPH_RENDER_LATENCY)
+def create_trends_graph_sync(
+    months: list[str],
+    categories: list[str],
+    matrix: "np.ndarray",
+    graph_name: str,
+    symbol: str = "€",
+) -> str:
+    import numpy as np
+
+    mpl = _matplotlib()
+
+    graph_path = f"graphs/{graph_name}"
+    os.makedirs("graphs", exist_ok=True)
+
+    logger.info(f"Creating trends graph: {graph_name} with {len(months)} months")
+
+    try:
+        fig = mpl.figure.Figure(figsize=(10, 8))
+        ax = fig.add_subplot()
+
+        positions = np.arange(len(months))
+        bottoms = np.zeros(len(months))
+        colors = mpl.colormaps["Set3"](range(len(categories)))
+
+        for column, category in enumerate(categories):
+            ax.bar(
+                positions,
+                matrix[:, column],
+                bottom=bottoms,
+                color=colors[column],
+                label=category,
+            )
+            bottoms += matrix[:, column]
+
+        for position, total in zip(positions, bottoms):
+            if total > 0:
+                ax.annotate(
+                    f"{total:.0f}{symbol}",
+                    (position, total),
+                    ha="center",
+                    va="bottom",
+                    fontsize=10,
+                    fontweight="bold",
+                )
+
+        ax.set_xticks(positions)
+        ax.set_xticklabels(months, rotation=45 if len(months) > 6 else 0)
+        ax.set_ylabel(f"Spent ({symbol})")
+        ax.spines[["top", "right"]].set_visible(False)
+
+        if categories:
+            ax.legend(
+                title="Categories",
+                loc="upper center",
+                bbox_to_anchor=(0.5, -0.1),
+                ncol=3,
+                fontsize=10,
+                frameon=False,
+            )
+        else:
+            ax.text(
+                0.5, 0.5, "No Data", ha="center", va="center", transform=ax.transAxes
+            )
+
+        fig.savefig(graph_path, dpi=200, bbox_inches="tight")
+
+        return graph_path
+
+    except Exception as e:
+        logger.error(f"Error creating trends graph: {e}")
+        raise
+
+
+async def call_trends_creator(
+    rows: list[tuple[str, str, float]], months: list[str], symbol: str = "€"
+):
+    graph_name = f"trends_{uuid.uuid4().hex[:8]}.png"
+
+    logger.info(f"Calling trends creator: {graph_name}")
+    try:
+        categories, matrix = build_trend_matrix(rows, months)
+
+        loop = asyncio.get_running_loop()
+        graph_path = await loop.run_in_executor(
+            _executor,
+            create_trends_graph_sync,
+            months,
+            categories,
+            matrix,
+            graph_name,
+            symbol,
+        )
+        logger.info("Trends creator completed.")
+
+        return graph_path
+
+    except Exception as e:
+        logger.error(f"Error in call_trends_creator: {e}", exc_info=True)
+        raise
+
+
+def build_heatmap_grid(rows: list[tuple[int, float]], year: int) -> "np.ndarray":
+    import numpy as np
+
+    first_day = date(year, 1, 1)
+    days_in_year = (date(year + 1, 1, 1) - first_day).days
+
+    data = np.asarray(rows, dtype=float).reshape(-1, 2)
+    daily = np.bincount(
+        data[:, 0].astype(np.intp), weights=data[:, 1], minlength=days_in_year
+    )[:days_in_year]
+
+    offset = first_day.weekday()
+    weeks = -(-(offset + days_in_year) // 7)
+
+    grid = np.full(weeks * 7, np.nan)
+    grid[offset : offset + days_in_year] = daily
+
+    return grid.reshape(weeks, 7).T
+
+
+@timed(GRAPH_RENDER_LATENCY)
+def create_heatmap_sync(
+    rows: list[tuple[int, float]], year: int, graph_name: str, symbol: str = "€"
+) -> str:
+    import numpy as np
+
+    mpl = _matplotlib()
+
+    graph_path = f"graphs/{graph_name}"
+    os.makedirs("graphs", exist_ok=True)
+
+    logger.info(f"Creating heatmap: {graph_name} with {len(rows)} expenses")
+
+    try:
+        grid = build_heatmap_grid(rows, year)
+        offset = date(year, 1, 1).weekday()
+
+        fig = mpl.figure.Figure(figsize=(14, 3.5))
+        ax = fig.add_subplot()
+
+        image = ax.imshow(
+            np.ma.masked_invalid(grid), cmap="YlOrRd", aspect="equal", vmin=0
+        )
+
+        month_starts = [
+            date(year, month, 1).timetuple().tm_yday for month in range(1, 13)
+        ]
+        ax.set_xticks([(offset + day - 1) // 7 for day in month_starts])
+        ax.set_xticklabels(
+            [date(year, month, 1).strftime("%b") for month in range(1, 13)]
+        )
+        ax.set_yticks(range(7))
+        ax.set_yticklabels(["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"])
+        ax.tick_params(length=0)
+        ax.set_title(f"Daily spending in {year}")
+
+        for spine in ax.spines.values():
+            spine.set_visible(False)
+
+        colorbar = fig.colorbar(image, ax=ax, fraction=0.02, pad=0.02)
+        colorbar.set_label(symbol)
+
+        fig.savefig(graph_path, dpi=200, bbox_inches="tight")
+
+        return graph_path
+
+    except Exception as e:
+        logger.error(f"Error creating heatmap: {e}")
+        raise
+
+
+async def call_heatmap_creator(
+    rows: list[tuple[int, float]], year: int, symbol: str = "€"
+):
+    graph_name = f"heatmap_{uuid.uuid4().hex[:8]}.png"
+
+    logger.info(f"Calling heatmap creator: {graph_name}")
+    try:
+        loop = asyncio.get_running_loop()
+        graph_path = await loop.run_in_executor(
+            _executor, create_heatmap_sync, rows, year, graph_name, symbol
+        )
+        logger.info("Heatmap creator completed.")
+
+        return graph_path
+
+    except Exception as e:
+        logger.error(f"Error in call_heatmap_creator: {e}", exc_info=True)
+        raise
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from aiogram.types import (
     InlineKeyboardButton,
     InlineKeyboardMarkup,
@@ -5,10 +7,16 @@ from aiogram.types import (
     ReplyKeyboardMarkup,
 )
 
+from constants import EMOJI_TO_CATEGORY, HISTORY_PERIODS, TREND_PERIODS
+
 main_menu = ReplyKeyboardMarkup(
     keyboard=[
         [
             KeyboardButton(text="📊 Statistics"),
+            KeyboardButton(text="📈 Trends"),
+            KeyboardButton(text="🧾 History"),
+        ],
+        [
             KeyboardButton(text="📝 Subscriptions"),
             KeyboardButton(text="📉 Saved"),
         ],
@@ -55,17 +63,20 @@ category_subscriptions_keyboard = InlineKeyboardMarkup(
 
 
 async def subscriptions_keyboard(
-    subscriptions_names: list[str], is_active: bool
+    subscriptions: list[tuple[int, str]],
+    is_active: bool,
+    previous_cursor: Optional[int] = None,
+    next_cursor: Optional[int] = None,
 ) -> InlineKeyboardMarkup:
     callback = "sub_select:" if is_active else "sub_enable:"
     keyboard = InlineKeyboardMarkup(inline_keyboard=[])
     row = []
 
-    for i, subscriptions_name in enumerate(subscriptions_names, start=1):
+    for i, (subscription_id, subscription_name) in enumerate(subscriptions, start=1):
         row.append(
             InlineKeyboardButton(
-                text=subscriptions_name,
-                callback_data=f"{callback}{subscriptions_name}",
+                text=subscription_name,
+                callback_data=f"{callback}{subscription_id}",
             )
         )
         if i % 3 == 0:
@@ -74,6 +85,25 @@ async def subscriptions_keyboard(
     if row:
         keyboard.inline_keyboard.append(row)
 
+    # Page cursors are subscription IDs: "sub_page:<active>:<direction>:<id>".
+    row = []
+    if previous_cursor is not None:
+        row.append(
+            InlineKeyboardButton(
+                text="◀️",
+                callback_data=f"sub_page:{int(is_active)}:p:{previous_cursor}",
+            )
+        )
+    if next_cursor is not None:
+        row.append(
+            InlineKeyboardButton(
+                text="▶️",
+                callback_data=f"sub_page:{int(is_active)}:n:{next_cursor}",
+            )
+        )
+    if row:
+        keyboard.inline_keyboard.append(row)
+
     row = []
     row.append(
         InlineKeyboardButton(text="⬅️ Back", callback_data="back_to:subscriptions")
@@ -83,6 +113,113 @@ async def subscriptions_keyboard(
     return keyboard
 
 
+async def history_keyboard(
+    category: str,
+    period: str,
+    previous_cursor: Optional[tuple[str, int]] = None,
+    next_cursor: Optional[tuple[str, int]] = None,
+) -> InlineKeyboardMarkup:
+    # "hist:<category index or ->:<period>:<direction>:<date>:<id>"
+    prefix = f"hist:{category}:{period}"
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[])
+
+    row = []
+    if previous_cursor is not None:
+        date, expense_id = previous_cursor
+        row.append(
+            InlineKeyboardButton(
+                text="◀️ Newer", callback_data=f"{prefix}:p:{date}:{expense_id}"
+            )
+        )
+    if next_cursor is not None:
+        date, expense_id = next_cursor
+        row.append(
+            InlineKeyboardButton(
+                text="Older ▶️", callback_data=f"{prefix}:n:{date}:{expense_id}"
+            )
+        )
+    if row:
+        keyboard.inline_keyboard.append(row)
+
+    keyboard.inline_keyboard.append(
+        [
+            InlineKeyboardButton(
+                text=f"{'• ' if key == period else ''}{name}",
+                callback_data=f"hist:{category}:{key}:n::",
+            )
+            for key, name in HISTORY_PERIODS.items()
+        ]
+    )
+    keyboard.inline_keyboard.append(
+        [
+            InlineKeyboardButton(
+                text="🏷 Category", callback_data=f"hist_categories:{period}"
+            ),
+            InlineKeyboardButton(text="✏️ Edit recent", callback_data="exp_recent"),
+        ]
+    )
+
+    return keyboard
+
+
+async def history_categories_keyboard(period: str) -> InlineKeyboardMarkup:
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[])
+    row = []
+
+    for index, label in enumerate(EMOJI_TO_CATEGORY):
+        row.append(
+            InlineKeyboardButton(text=label, callback_data=f"hist:{index}:{period}:n::")
+        )
+        if len(row) == 3:
+            keyboard.inline_keyboard.append(row)
+            row = []
+    if row:
+        keyboard.inline_keyboard.append(row)
+
+    keyboard.inline_keyboard.append(
+        [
+            InlineKeyboardButton(
+                text="All categories", callback_data=f"hist:-:{period}:n::"
+            )
+        ]
+    )
+
+    return keyboard
+
+
+async def expense_actions_keyboard(expense_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="↩️ Undo", callback_data=f"exp_undo:{expense_id}"
+                ),
+                InlineKeyboardButton(
+                    text="✏️ Edit", callback_data=f"exp_edit:{expense_id}"
+                ),
+            ]
+        ]
+    )
+
+
+async def recent_expenses_keyboard(
+    expenses: list[tuple[int, str, float, str]], symbol: str = "€"
+) -> InlineKeyboardMarkup:
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[])
+
+    for expense_id, category, amount, date in expenses:
+        keyboard.inline_keyboard.append(
+            [
+                InlineKeyboardButton(
+                    text=f"{date[8:10]}.{date[5:7]} · {category} · {amount:.2f}{symbol}",
+                    callback_data=f"exp_select:{expense_id}",
+                )
+            ]
+        )
+
+    return keyboard
+
+
 reports_keyboard = InlineKeyboardMarkup(
     inline_keyboard=[
         [
@@ -99,6 +236,19 @@ reports_keyboard = InlineKeyboardMarkup(
 )
 
 
+trends_keyboard = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [
+            InlineKeyboardButton(
+                text=f"{months} months", callback_data=f"trends:{months}"
+            )
+            for months in TREND_PERIODS
+        ],
+        [InlineKeyboardButton(text="🗓 Year heatmap", callback_data="heatmap:year")],
+    ]
+)
+
+
 saving_options = InlineKeyboardMarkup(
     inline_keyboard=[
         [InlineKeyboardButton(text="➕ Add savings", callback_data="add_saving")]
@@ -1,36 +1,115 @@
+import difflib
+import html
 import logging
+import math
 import os
-
-from aiogram import F, Router
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Awaitable, Callable
+from zoneinfo import ZoneInfo
+
+from aiogram import BaseMiddleware, F, Router
+from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
-from aiogram.fsm.state import State, StatesGroup
-from aiogram.types import CallbackQuery, FSInputFile, Message
+from aiogram.fsm.state import State, StatesGroup, default_state
+from aiogram.types import (
+    BufferedInputFile,
+    CallbackQuery,
+    InlineKeyboardMarkup,
+    Message,
+    TelegramObject,
+)
 
-from constants import EMOJI_TO_CATEGORY
-from graphs import call_graph_creator
+from constants import (
+    ANOMALY_MIN_COUNT,
+    ANOMALY_RATIO,
+    ANOMALY_Z_SCORE,
+    BUDGET_THRESHOLDS,
+    CATEGORY_MAP,
+    CURRENCY_SYMBOLS,
+    EMOJI_TO_CATEGORY,
+    HISTORY_PAGE_SIZE,
+    HISTORY_PERIODS,
+    SUBSCRIPTIONS_PAGE_SIZE,
+    TREND_PERIODS,
+)
+from forecast import forecast_cache, forecast_month
+from graphs import call_graph_creator, call_heatmap_creator, call_trends_creator
 from keyboard import (
     category_subscriptions_keyboard,
+    expense_actions_keyboard,
+    history_categories_keyboard,
+    history_keyboard,
+    recent_expenses_keyboard,
     reports_keyboard,
     saving_options,
     subscriptions_keyboard,
+    trends_keyboard,
 )
+from singleflight import single_flight
 from sql import (
+    DEFAULT_TIMEZONE,
     add_expense,
+    add_expenses,
     add_new_subscription,
     add_saving,
     create_report,
+    currency_symbol,
+    current_currency,
+    current_periods,
+    delete_expense,
     disable_month_subscription,
     enable_month_subscription,
     get_all_categories_and_values,
+    get_budget_progress,
+    get_budgets,
+    get_category_stats,
+    get_current_date,
+    get_daily_expenses,
+    get_exchange_rate,
+    get_expense,
+    get_expenses_page,
     get_month_subscriptions_expenses,
     get_month_total_expenses,
+    get_monthly_category_totals,
+    get_periods,
+    get_recent_expenses,
+    get_recent_months,
     get_savings,
+    get_slowest_queries,
     get_subscriptions_breakdown,
+    get_subscriptions_page,
+    get_user_settings,
     get_year_expenses,
+    remove_budget,
+    request_currency,
+    request_periods,
+    set_budget,
+    set_user_currency,
+    set_user_timezone,
+    update_expense_amount,
 )
 
 logger = logging.getLogger(__name__)
 
+
+def parse_admin_ids(value: str) -> set[int]:
+    """Parses comma-separated user IDs, skipping and logging invalid ones."""
+    admin_ids = set()
+    for user_id in value.split(","):
+        user_id = user_id.strip()
+        if not user_id:
+            continue
+        if not user_id.lstrip("-").isdigit():
+            logger.warning(f"Ignoring invalid ADMIN_IDS entry: {user_id!r}")
+            continue
+        admin_ids.add(int(user_id))
+    return admin_ids
+
+
+ADMIN_IDS = parse_admin_ids(os.getenv("ADMIN_IDS", ""))
+
 router = Router()
 
 
@@ -39,6 +118,7 @@ class SpendInput(StatesGroup):
     waiting_for_amount = State()
     waiting_for_subscription_name = State()
     waiting_for_subscription_amount = State()
+    waiting_for_new_amount = State()
 
 
 class SaveInput(StatesGroup):
@@ -52,16 +132,52 @@ class Choose(StatesGroup):
     send_document = State()
 
 
+class UserSettingsMiddleware(BaseMiddleware):
+    """Resolves the user's periods and home currency once per update.
+
+    Queries read the day, month and year boundaries from
+    ``sql.request_periods`` instead of SQLite's 'now', which is always UTC;
+    amounts are written and shown in ``sql.request_currency``.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        settings = await get_user_settings(user.id)
+        periods_token = request_periods.set(get_periods(settings.timezone))
+        currency_token = request_currency.set(settings.currency)
+        try:
+            return await handler(event, data)
+        finally:
+            request_currency.reset(currency_token)
+            request_periods.reset(periods_token)
+
+
 def remove_temp_files(path: str):
     if os.path.exists(path):
         os.remove(path)
 
 
+def read_temp_file(path: str) -> bytes:
+    with open(path, "rb") as file:
+        content = file.read()
+
+    remove_temp_files(path)
+    return content
+
+
 def parse_amount(text: str) -> float | None:
     try:
         amount = float(text.replace(",", "."))
 
-        if amount <= 0:
+        if amount <= 0 or not math.isfinite(amount):
             return None
 
         return amount
@@ -70,6 +186,297 @@ def parse_amount(text: str) -> float | None:
         return None
 
 
+SYMBOL_TO_CURRENCY = {symbol: code for code, symbol in CURRENCY_SYMBOLS.items()}
+MONEY_PATTERN = re.compile(r"(\D*?)([\d.,]+)(\D*)")
+
+
+def currency_code(text: str) -> str | None:
+    """Returns the ISO code for "usd", "USD" or "$", or None."""
+    text = text.strip()
+    code = text.upper()
+    if code in CURRENCY_SYMBOLS:
+        return code
+
+    return SYMBOL_TO_CURRENCY.get(text)
+
+
+def parse_money(text: str) -> tuple[float, str | None] | None:
+    """Parses "12.50", "$12.50", "12.50€" or "12.50 usd" into (amount, currency).
+
+    The currency is None when none was given.
+    """
+    match = MONEY_PATTERN.fullmatch(text.strip())
+    if match is None:
+        return None
+
+    prefix, number, suffix = match.groups()
+    currency = None
+    if prefix or suffix:
+        if prefix and suffix:
+            return None
+        currency = currency_code(prefix or suffix)
+        if currency is None:
+            return None
+
+    amount = parse_amount(number)
+    return (amount, currency) if amount is not None else None
+
+
+def take_amount(parts: list[str]) -> tuple[float, str | None, list[str]] | None:
+    """Takes the amount, and a currency code on either side of it, from the
+    start of ``parts``; returns the amount, currency and remaining parts."""
+    money = parse_money(parts[0])
+
+    if money is None:
+        code = currency_code(parts[0])
+        money = parse_money(parts[1]) if code and len(parts) > 2 else None
+        if money is None or money[1] is not None:
+            return None
+        return money[0], code, parts[2:]
+
+    amount, currency = money
+    if currency is None and len(parts) > 2:
+        currency = currency_code(parts[1])
+        if currency is not None:
+            return amount, currency, parts[2:]
+
+    return amount, currency, parts[1:]
+
+
+def normalize_category_name(text: str) -> str:
+    return " ".join(re.sub(r"[^\w\s&]|_", " ", text.lower()).split())
+
+
+def build_category_index() -> dict[str, str]:
+    """Maps every normalized spelling of a category to its button label."""
+    index = {}
+
+    for label, key in EMOJI_TO_CATEGORY.items():
+        for alias in (label, key, CATEGORY_MAP[key]):
+            index[normalize_category_name(alias)] = label
+
+    return index
+
+
+CATEGORY_INDEX = build_category_index()
+CATEGORY_ALIASES = list(CATEGORY_INDEX)
+
+
+@lru_cache(maxsize=1024)
+def match_category(text: str) -> str | None:
+    name = normalize_category_name(text)
+    if not name:
+        return None
+
+    label = CATEGORY_INDEX.get(name)
+    if label is not None:
+        return label
+
+    prefixed = {
+        CATEGORY_INDEX[alias] for alias in CATEGORY_ALIASES if alias.startswith(name)
+    }
+    if len(prefixed) == 1 and len(name) >= 3:
+        return prefixed.pop()
+
+    matches = difflib.get_close_matches(name, CATEGORY_ALIASES, n=1, cutoff=0.75)
+    return CATEGORY_INDEX[matches[0]] if matches else None
+
+
+def parse_quick_entry(text: str) -> tuple[str, float, str | None] | None:
+    """Parses "12.50 groceries", "groceries $12.50" or "12.50 usd groceries"
+    into (label, amount, currency); currency is None when none was given."""
+    parts = text.split()
+    if len(parts) < 2:
+        return None
+
+    taken = take_amount(parts)
+    if taken is not None:
+        amount, currency, name = taken
+    else:
+        taken = take_amount(parts[::-1])
+        if taken is None:
+            return None
+        amount, currency, name = taken
+        name = name[::-1]
+
+    category = match_category(" ".join(name))
+    return (category, amount, currency) if category else None
+
+
+def split_batch_entry(text: str) -> list[str]:
+    return [line.strip() for line in re.split(r"\n| / ", text) if line.strip()]
+
+
+def batch_entry_filter(message: Message) -> dict | bool:
+    lines = split_batch_entry(message.text or "")
+    if len(lines) < 2 or not any(parse_quick_entry(line) for line in lines):
+        return False
+
+    return {"lines": lines}
+
+
+def quick_entry_filter(message: Message) -> dict | bool:
+    entry = parse_quick_entry(message.text or "")
+    return {"entry": entry} if entry else False
+
+
+def money(amount: float, currency: str | None = None) -> str:
+    """Formats an amount in ``currency``, the home currency by default."""
+    return f"{amount:.2f}{currency_symbol(currency)}"
+
+
+def entered_as(amount: float, original_amount: float, currency: str) -> str:
+    """Formats "12.50€" plus what was entered, if that was another currency."""
+    if currency == current_currency():
+        return money(amount)
+
+    return f"{money(amount)} ({money(original_amount, currency)})"
+
+
+async def convert_entries(
+    message: Message, entries: list[tuple[str, float, str | None]]
+) -> list[tuple[str, float, str, float]] | None:
+    """Converts parsed ``(category, amount, currency)`` entries to the home
+    currency, looking up each currency's rate once.
+
+    Returns ``(category, amount, currency, original_amount)`` rows, or None
+    after telling the user which currencies have no rate.
+    """
+    home = current_currency()
+    rates = {home: 1.0}
+    for currency in {currency or home for _, _, currency in entries} - {home}:
+        rates[currency] = await get_exchange_rate(currency, home)
+
+    missing = sorted(currency for currency, rate in rates.items() if rate is None)
+    if missing:
+        await message.answer(
+            f"❗ Nothing was added. I have no exchange rate for {', '.join(missing)}"
+        )
+        return None
+
+    return [
+        (category, round(amount * rates[currency or home], 2), currency or home, amount)
+        for category, amount, currency in entries
+    ]
+
+
+def crossed_budget_threshold(total: float, amount: float, budget: float) -> int | None:
+    """Returns the highest threshold (in %) that adding ``amount`` crossed."""
+    previous = total - amount
+    crossed = [
+        threshold
+        for threshold in BUDGET_THRESHOLDS
+        if previous < budget * threshold / 100 <= total
+    ]
+    return crossed[-1] if crossed else None
+
+
+async def budget_alert(user_id: int, category: str, amount: float) -> str | None:
+    # Reads one rollup row, which the insert trigger has already updated.
+    progress = await get_budget_progress(user_id, category)
+    if progress is None:
+        return None
+
+    total, budget = progress
+    threshold = crossed_budget_threshold(total, amount, budget)
+    if threshold is None:
+        return None
+
+    spent = f"<code>{money(total)}</code> of <code>{money(budget)}</code>"
+    if threshold >= 100:
+        return f"🚨 <b>{category} is over budget!</b>\n\n{spent} spent this month"
+    return f"⚠️ <b>{threshold}% of your {category} budget used</b>\n\n{spent}"
+
+
+def remove_samples(
+    count: int, mean: float, m2: float, amounts: list[float]
+) -> tuple[int, float, float]:
+    """Reverses Welford updates, giving the stats from before ``amounts``."""
+    for amount in amounts:
+        if count <= 1:
+            return 0, 0.0, 0.0
+        previous = (count * mean - amount) / (count - 1)
+        m2 = max(0.0, m2 - (amount - mean) * (amount - previous))
+        count, mean = count - 1, previous
+
+    return count, mean, m2
+
+
+def is_anomaly(count: int, mean: float, m2: float, amount: float) -> bool:
+    if count < ANOMALY_MIN_COUNT or mean <= 0:
+        return False
+
+    deviation = math.sqrt(m2 / (count - 1))
+    return amount >= ANOMALY_RATIO * mean and amount - mean >= (
+        ANOMALY_Z_SCORE * deviation
+    )
+
+
+async def anomaly_alerts(
+    user_id: int, category: str, amounts: list[float]
+) -> list[str]:
+    # The insert trigger already counted these amounts, so they are taken out
+    # again to compare each one against the history before it.
+    stats = await get_category_stats(user_id, category)
+    if stats is None:
+        return []
+
+    count, mean, m2 = remove_samples(*stats, amounts)
+
+    return [
+        f"🧐 <b>Unusual expense</b>\n\n<code>{money(amount)}</code> for "
+        f"<b>{category}</b> is {amount / mean:.0f}× your usual "
+        f"<code>{money(mean)}</code>"
+        for amount in amounts
+        if is_anomaly(count, mean, m2, amount)
+    ]
+
+
+async def send_expense_alerts(message: Message, entries: list[tuple[str, float]]):
+    """Sends budget and unusual-expense alerts for just-added expenses."""
+    user_id = message.from_user.id
+    amounts: dict[str, list[float]] = {}
+    for category, amount in entries:
+        amounts.setdefault(category, []).append(amount)
+
+    for category, category_amounts in amounts.items():
+        alerts = await anomaly_alerts(user_id, category, category_amounts)
+        alert = await budget_alert(user_id, category, sum(category_amounts))
+        if alert:
+            alerts.append(alert)
+
+        for alert in alerts:
+            await message.answer(alert, parse_mode="HTML")
+
+
+def format_month_summary(
+    rows: list[tuple[str, float, float]], currency: str | None = None
+) -> str:
+    total = sum(current for _, current, _ in rows)
+    previous_total = sum(previous for _, _, previous in rows)
+
+    lines = []
+    for category, current, previous in rows:
+        if not current:
+            continue
+
+        name = CATEGORY_MAP.get(category, category)
+        line = f"  - <b>{name}</b>: <code>{money(current, currency)}</code>"
+        if previous:
+            line += f" ({(current - previous) / previous * 100:+.0f}%)"
+        lines.append(line)
+
+    if not lines:
+        lines.append("  No expenses last month.")
+
+    summary = "🗓 <b>Your month in review:</b>\n\n" + "\n".join(lines) + "\n\n"
+    summary += f"💸 Spent: <code>{money(total, currency)}</code>"
+    if previous_total:
+        summary += f" (previous month: <code>{money(previous_total, currency)}</code>)"
+
+    return summary
+
+
 @router.callback_query(F.data.startswith("back_to:"))
 async def go_back(callback: CallbackQuery, state: FSMContext):
     await state.clear()
@@ -79,10 +486,25 @@ async def go_back(callback: CallbackQuery, state: FSMContext):
         await subscriptions(callback, callback.from_user.id)
 
 
-@router.message(F.text == "📊 Statistics")
-async def choose_category_for_stats(message: Message):
-    user_id = message.from_user.id
+def format_forecast(
+    total: float, projections: dict[str, float], subscriptions: float
+) -> str:
+    lines = [
+        f"  - {category}: <code>{money(amount)}</code>"
+        for category, amount in sorted(
+            projections.items(), key=lambda item: item[1], reverse=True
+        )
+        if amount >= 0.01
+    ]
+    if subscriptions > 0:
+        lines.append(f"  - Subscriptions: <code>{money(subscriptions)}</code>")
 
+    return "\n".join(
+        ["🔮 <b>By Month End:</b>", f"Projected: <code>{money(total)}</code>", *lines]
+    )
+
+
+async def build_statistics(user_id: int) -> tuple[bytes, str]:
     total_expenses = await get_month_total_expenses(user_id)
     total_savings = await get_savings(user_id, is_month_saving=True)
     total_year_expenses = await get_year_expenses(user_id)
@@ -90,24 +512,39 @@ async def choose_category_for_stats(message: Message):
 
     data = await get_all_categories_and_values(user_id)
     month_subscriptions = await get_month_subscriptions_expenses(user_id)
+    projected_total, projections = await forecast_month(
+        user_id, dict(data), month_subscriptions
+    )
 
     if month_subscriptions > 0:
         data.append(("subscriptions", month_subscriptions))
 
-    graph = await call_graph_creator(data)
-    photo = FSInputFile(graph)
+    graph = await call_graph_creator(data, currency_symbol().strip())
 
     caption = (
         "📊 <b>Your Statistics:</b>\n\n"
         f"💸 <b>This Month:</b>\n"
-        f"Spent: <code>{total_expenses:.2f}€</code>\n"
-        f"Saved: <code>{total_savings:.2f}€</code>\n\n"
+        f"Spent: <code>{money(total_expenses)}</code>\n"
+        f"Saved: <code>{money(total_savings)}</code>\n\n"
+        f"{format_forecast(projected_total, projections, month_subscriptions)}\n\n"
         f"📅 <b>This Year:</b>\n"
-        f"Spent: <code>{total_year_expenses:.2f}€</code>\n"
-        f"Saved: <code>{total_year_savings:.2f}€</code>\n\n"
+        f"Spent: <code>{money(total_year_expenses)}</code>\n"
+        f"Saved: <code>{money(total_year_savings)}</code>\n\n"
         f"📄 Download reports below 👇"
     )
 
+    return read_temp_file(graph), caption
+
+
+@router.message(F.text == "📊 Statistics")
+async def choose_category_for_stats(message: Message):
+    user_id = message.from_user.id
+
+    graph, caption = await single_flight.do(
+        (user_id, "statistics", ()), build_statistics, user_id
+    )
+    photo = BufferedInputFile(graph, filename="statistics.png")
+
     await message.answer_photo(
         photo=photo,
         caption=caption,
@@ -115,14 +552,232 @@ async def choose_category_for_stats(message: Message):
         parse_mode="HTML",
     )
 
-    remove_temp_files(graph)
+
+@router.message(F.text == "📈 Trends")
+async def trends_menu(message: Message):
+    await message.answer(
+        "📈 <b>Your Trends:</b>\n\nChoose a period 👇",
+        reply_markup=trends_keyboard,
+        parse_mode="HTML",
+    )
+
+
+async def build_trends(user_id: int, months: int) -> bytes:
+    recent_months = get_recent_months(months)
+    rows = await get_monthly_category_totals(user_id, recent_months)
+    graph = await call_trends_creator(rows, recent_months, currency_symbol().strip())
+
+    return read_temp_file(graph)
+
+
+@router.callback_query(F.data.startswith("trends:"))
+async def trends(callback: CallbackQuery, state: FSMContext):
+    user_id = callback.from_user.id
+    value = callback.data.split("trends:")[1]
+    months = int(value) if value.isdigit() else None
+
+    if months not in TREND_PERIODS:
+        await callback.answer()
+        return
+
+    graph = await single_flight.do(
+        (user_id, "trends", months), build_trends, user_id, months
+    )
+    photo = BufferedInputFile(graph, filename="trends.png")
+
+    await callback.answer()
+    await callback.message.answer_photo(
+        photo=photo,
+        caption=f"📈 <b>Spending over the last {months} months</b>",
+        parse_mode="HTML",
+    )
+
+
+async def build_heatmap(user_id: int, year: int) -> bytes:
+    rows = await get_daily_expenses(user_id, year)
+    graph = await call_heatmap_creator(rows, year, currency_symbol().strip())
+
+    return read_temp_file(graph)
+
+
+@router.callback_query(F.data == "heatmap:year")
+async def heatmap(callback: CallbackQuery, state: FSMContext):
+    user_id = callback.from_user.id
+    year = int(get_current_date()[:4])
+
+    graph = await single_flight.do(
+        (user_id, "heatmap", year), build_heatmap, user_id, year
+    )
+    photo = BufferedInputFile(graph, filename="heatmap.png")
+
+    await callback.answer()
+    await callback.message.answer_photo(
+        photo=photo,
+        caption=f"🗓 <b>Your spending in {year}</b>",
+        parse_mode="HTML",
+    )
+
+
+HISTORY_CATEGORIES = list(EMOJI_TO_CATEGORY)
+
+
+def history_start_date(period: str) -> str | None:
+    today = get_current_date()
+    if period == "m":
+        return today[:8] + "01"
+    if period == "y":
+        return today[:5] + "01-01"
+    return None
+
+
+async def build_history(
+    user_id: int,
+    category: str = "-",
+    period: str = "a",
+    cursor: tuple[str, int] | None = None,
+    backwards: bool = False,
+) -> tuple[str, InlineKeyboardMarkup]:
+    rows = await get_expenses_page(
+        user_id,
+        None if category == "-" else HISTORY_CATEGORIES[int(category)],
+        history_start_date(period),
+        cursor,
+        backwards,
+        HISTORY_PAGE_SIZE + 1,
+    )
+    has_more = len(rows) > HISTORY_PAGE_SIZE
+    rows = rows[:HISTORY_PAGE_SIZE]
+
+    if backwards:
+        rows.reverse()
+        has_previous, has_next = has_more, True
+    else:
+        has_previous, has_next = cursor is not None, has_more
+
+    title = "🧾 <b>Your expenses</b>"
+    filters = [HISTORY_PERIODS[period]]
+    if category != "-":
+        filters.append(HISTORY_CATEGORIES[int(category)])
+    title += f" ({', '.join(filters)})"
+
+    if rows:
+        lines = [
+            f"{date[8:10]}.{date[5:7]} · {html.escape(name)} · "
+            f"<code>{money(amount)}</code>"
+            for _, name, amount, date in rows
+        ]
+        text = f"{title}:\n\n" + "\n".join(lines)
+    else:
+        text = f"{title}:\n\nNo expenses yet"
+
+    keyboard = await history_keyboard(
+        category,
+        period,
+        previous_cursor=(rows[0][3], rows[0][0]) if rows and has_previous else None,
+        next_cursor=(rows[-1][3], rows[-1][0]) if rows and has_next else None,
+    )
+    return text, keyboard
+
+
+@router.message(F.text == "🧾 History")
+async def history(message: Message):
+    text, keyboard = await build_history(message.from_user.id)
+
+    await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+@router.callback_query(F.data.startswith("hist:"))
+async def history_page(callback: CallbackQuery):
+    # "hist:<category index or ->:<period>:<direction>:<date>:<id>"
+    _, category, period, direction, date, expense_id = callback.data.split(":")
+
+    if period not in HISTORY_PERIODS or not (
+        category == "-"
+        or category.isdigit()
+        and int(category) < len(HISTORY_CATEGORIES)
+    ):
+        await callback.answer()
+        return
+
+    text, keyboard = await build_history(
+        callback.from_user.id,
+        category,
+        period,
+        (date, int(expense_id)) if date else None,
+        direction == "p",
+    )
+
+    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("hist_categories:"))
+async def history_categories(callback: CallbackQuery):
+    period = callback.data.split("hist_categories:")[1]
+
+    await callback.message.edit_reply_markup(
+        reply_markup=await history_categories_keyboard(period)
+    )
+    await callback.answer()
+
+
+async def build_subscriptions_keyboard(
+    user_id: int, is_active: bool, cursor_id: int = 0, backwards: bool = False
+) -> tuple[list, InlineKeyboardMarkup]:
+    # Active subscriptions are listed for the current month only.
+    rows = await get_subscriptions_page(
+        user_id,
+        is_active,
+        is_active,
+        cursor_id,
+        backwards,
+        SUBSCRIPTIONS_PAGE_SIZE + 1,
+    )
+    has_more = len(rows) > SUBSCRIPTIONS_PAGE_SIZE
+    rows = rows[:SUBSCRIPTIONS_PAGE_SIZE]
+
+    if backwards:
+        rows.reverse()
+        has_previous, has_next = has_more, True
+    else:
+        has_previous, has_next = cursor_id > 0, has_more
+
+    keyboard = await subscriptions_keyboard(
+        rows,
+        is_active,
+        previous_cursor=rows[0][0] if rows and has_previous else None,
+        next_cursor=rows[-1][0] if rows and has_next else None,
+    )
+    return rows, keyboard
+
+
+@router.callback_query(F.data.startswith("sub_page:"))
+async def subscriptions_page(callback: CallbackQuery):
+    _, is_active, direction, cursor_id = callback.data.split(":")
+
+    _, keyboard = await build_subscriptions_keyboard(
+        callback.from_user.id, is_active == "1", int(cursor_id), direction == "p"
+    )
+
+    await callback.message.edit_reply_markup(reply_markup=keyboard)
+    await callback.answer()
 
 
 @router.callback_query(F.data.startswith("sub_enable:"))
 async def enable_subscription(callback: CallbackQuery, state: FSMContext):
-    name = callback.data.split("sub_enable:")[1]
-    await enable_month_subscription(callback.from_user.id, name)
+    value = callback.data.split("sub_enable:")[1]
+    # Keyboards sent before subscriptions had IDs carry the name instead.
+    if not value.isdigit():
+        await callback.answer()
+        return
+
+    name = await enable_month_subscription(callback.from_user.id, int(value))
     await state.clear()
+
+    if name is None:
+        await callback.answer("❗ Subscription not found")
+        return
+
     await callback.answer(f"✅ Subscription {name} activated!")
     await callback.message.delete()
 
@@ -130,13 +785,10 @@ async def enable_subscription(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data == "add_subscription")
 async def add_subscription(callback: CallbackQuery, state: FSMContext):
     is_active = False
-    time_filter = False
 
-    rows = await get_subscriptions_breakdown(
-        callback.from_user.id, is_active, time_filter
+    rows, keyboard = await build_subscriptions_keyboard(
+        callback.from_user.id, is_active
     )
-    names: list[str] = [name for name, _ in rows]
-    keyboard = await subscriptions_keyboard(names, is_active)
     message = (
         "💬 <b>Enter subscription name</b>\n\nOr select an inactive one below 👇"
         if rows
@@ -174,7 +826,7 @@ async def subscription_price(message: Message, state: FSMContext):
     subscription_name = data.get("subscription_name")
     await add_new_subscription(message.from_user.id, subscription_name, amount)
     await message.answer(
-        f"✅ <b>Added</b>\n\n{subscription_name}\n<code>{amount:.2f}€</code> per month",
+        f"✅ <b>Added</b>\n\n{subscription_name}\n<code>{money(amount)}</code> per month",
         parse_mode="HTML",
     )
 
@@ -184,13 +836,8 @@ async def subscription_price(message: Message, state: FSMContext):
 @router.callback_query(F.data == "disable_subscriptions_list")
 async def disable_subscription_list(callback: CallbackQuery, state: FSMContext):
     is_active = True
-    time_filter = True
 
-    rows = await get_subscriptions_breakdown(
-        callback.from_user.id, is_active, time_filter
-    )
-    names: list[str] = [name for name, _ in rows]
-    keyboard = await subscriptions_keyboard(names, is_active)
+    _, keyboard = await build_subscriptions_keyboard(callback.from_user.id, is_active)
 
     await callback.message.edit_text(
         "📝 <b>Select a subscription to disable:</b>",
@@ -203,9 +850,17 @@ async def disable_subscription_list(callback: CallbackQuery, state: FSMContext):
 
 @router.callback_query(F.data.startswith("sub_select:"))
 async def disable_subscription(callback: CallbackQuery, state: FSMContext):
-    name = callback.data.split("sub_select:")[1]
+    value = callback.data.split("sub_select:")[1]
+    # Keyboards sent before subscriptions had IDs carry the name instead.
+    if not value.isdigit():
+        await callback.answer()
+        return
+
+    name = await disable_month_subscription(callback.from_user.id, int(value))
+    if name is None:
+        await callback.answer("❗ Subscription not found")
+        return
 
-    await disable_month_subscription(callback.from_user.id, name)
     await callback.answer(f"🗑 Subscription {name} disabled!")
     await callback.message.delete()
 
@@ -221,7 +876,7 @@ async def subscriptions(target, user_id: int):
 
     rows = await get_subscriptions_breakdown(user_id, is_active, time_filter)
     total = await get_month_subscriptions_expenses(user_id)
-    lines = [f"-  {name}: {amount:.2f}€" for name, amount in rows]
+    lines = [f"-  {name}: {money(amount)}" for name, amount in rows]
 
     message_obj = target.message if hasattr(target, "message") else target
 
@@ -237,12 +892,12 @@ async def subscriptions(target, user_id: int):
 
     lines = []
     for name, amount in rows:
-        lines.append(f"  - <b>{name}</b>: <code>{amount:.2f}€</code>")
+        lines.append(f"  - <b>{name}</b>: <code>{money(amount)}</code>")
 
     total_message = (
         "📝 <b>Your subscriptions:</b>\n\n" + "\n".join(lines) + "\n\n"
-        f"💰 Monthly: <code>{total:.2f}€</code>\n"
-        f"📅 Yearly: <code>{total * 12:.2f}€</code>"
+        f"💰 Monthly: <code>{money(total)}</code>\n"
+        f"📅 Yearly: <code>{money(total * 12)}</code>"
     )
 
     await message_obj.answer(
@@ -261,8 +916,8 @@ async def savings(message: Message):
     keyboard = saving_options
     savings_message = (
         "📉 <b>Your Savings:</b>\n\n"
-        f"💰 This month: <code>{month_savings:.2f}€</code>\n"
-        f"📅 Saved this year: <code>{year_savings:.2f}€</code>\n\n"
+        f"💰 This month: <code>{money(month_savings)}</code>\n"
+        f"📅 Saved this year: <code>{money(year_savings)}</code>\n\n"
     )
 
     await message.answer(savings_message, reply_markup=keyboard, parse_mode="HTML")
@@ -283,7 +938,7 @@ async def save_saving_input(message: Message, state: FSMContext):
     await add_saving(message.from_user.id, amount)
     total = await get_savings(message.from_user.id, is_month_saving=True)
     await message.answer(
-        f"✅ <b>Added</b>\n\nTotal saved this month: <code>{total:.2f}€</code>",
+        f"✅ <b>Added</b>\n\nTotal saved this month: <code>{money(total)}</code>",
         parse_mode="HTML",
     )
 
@@ -299,22 +954,134 @@ async def ask_spend_amount(message: Message, state: FSMContext):
 
 @router.message(SpendInput.waiting_for_amount)
 async def spend_input_amount(message: Message, state: FSMContext):
-    amount = parse_amount(message.text)
-    if amount is None:
+    entered = parse_money(message.text)
+    if entered is None:
         await message.answer("❗ Please enter a number, e.g.: 5.50")
         return
     data = await state.get_data()
     category = data.get("category")
 
-    await add_expense(message.from_user.id, category, amount)
+    rows = await convert_entries(message, [(category, *entered)])
+    if rows is None:
+        return
+    category, amount, currency, original_amount = rows[0]
+
+    expense_id = await add_expense(
+        message.from_user.id, category, amount, currency, original_amount
+    )
     await message.answer(
-        f"✅ <b>Added!</b>\n\n💰 <code>{amount:.2f}€</code> for <b>{category}</b>",
+        f"✅ <b>Added!</b>\n\n💰 <code>{entered_as(amount, original_amount, currency)}</code> "
+        f"for <b>{category}</b>",
+        reply_markup=await expense_actions_keyboard(expense_id),
         parse_mode="HTML",
     )
+    await send_expense_alerts(message, [(category, amount)])
 
     await state.clear()
 
 
+def forget_forecast_history(user_id: int, expense_date: str):
+    """Drops the cached forecast model if a past month's expense changed.
+
+    The model is built from completed months only, so edits to this month's
+    expenses leave it valid.
+    """
+    if expense_date < current_periods().month_start:
+        forecast_cache.forget(user_id)
+
+
+@router.callback_query(F.data.startswith("exp_undo:"))
+async def undo_expense(callback: CallbackQuery, state: FSMContext):
+    expense_id = int(callback.data.split("exp_undo:")[1])
+    expense = await delete_expense(callback.from_user.id, expense_id)
+    await state.clear()
+
+    if expense is None:
+        await callback.answer("❗ Expense not found")
+        return
+
+    category, amount, expense_date = expense
+    forget_forecast_history(callback.from_user.id, expense_date)
+    await callback.message.edit_text(
+        f"↩️ <b>Removed</b>\n\n<s>{money(amount)} for {category}</s>",
+        parse_mode="HTML",
+    )
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("exp_edit:"))
+async def edit_expense(callback: CallbackQuery, state: FSMContext):
+    expense_id = int(callback.data.split("exp_edit:")[1])
+
+    await state.set_state(SpendInput.waiting_for_new_amount)
+    await state.update_data(expense_id=expense_id)
+    await callback.message.answer("✏️ Enter the correct amount:")
+    await callback.answer()
+
+
+@router.message(SpendInput.waiting_for_new_amount)
+async def edit_expense_amount(message: Message, state: FSMContext):
+    amount = parse_amount(message.text)
+    if amount is None:
+        await message.answer("❗ Please enter a number, e.g.: 5.50")
+        return
+    data = await state.get_data()
+    expense_id = data.get("expense_id")
+    await state.clear()
+
+    expense = await update_expense_amount(message.from_user.id, expense_id, amount)
+    if expense is None:
+        await message.answer("❗ Expense not found")
+        return
+
+    category, amount, expense_date = expense
+    forget_forecast_history(message.from_user.id, expense_date)
+    await message.answer(
+        f"✅ <b>Updated!</b>\n\n💰 <code>{money(amount)}</code> for <b>{category}</b>",
+        reply_markup=await expense_actions_keyboard(expense_id),
+        parse_mode="HTML",
+    )
+
+
+@router.callback_query(F.data == "exp_recent")
+async def recent_expenses(callback: CallbackQuery):
+    rows = await get_recent_expenses(callback.from_user.id)
+
+    if not rows:
+        await callback.answer("No expenses yet")
+        return
+
+    await callback.message.answer(
+        "✏️ <b>Select an expense to edit:</b>",
+        reply_markup=await recent_expenses_keyboard(rows, currency_symbol()),
+        parse_mode="HTML",
+    )
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("exp_select:"))
+async def select_expense(callback: CallbackQuery):
+    expense_id = int(callback.data.split("exp_select:")[1])
+    expense = await get_expense(callback.from_user.id, expense_id)
+
+    if expense is None:
+        await callback.answer("❗ Expense not found")
+        return
+
+    category, amount, date = expense
+    await callback.message.edit_text(
+        f"🧾 <b>{category}</b>\n\n💰 <code>{money(amount)}</code> on {date}",
+        reply_markup=await expense_actions_keyboard(expense_id),
+        parse_mode="HTML",
+    )
+    await callback.answer()
+
+
+async def build_report(user_id: int, is_all_time_report: bool) -> tuple[bytes, str]:
+    report_path = await create_report(user_id, is_all_time_report)
+    return read_temp_file(report_path), os.path.basename(report_path)
+
+
 @router.callback_query(F.data.startswith("report:"))
 async def reports(callback: CallbackQuery, state: FSMContext):
     user_id = callback.from_user.id
@@ -325,12 +1092,259 @@ async def reports(callback: CallbackQuery, state: FSMContext):
         is_all_time_report = False
 
     try:
-        report_path = await create_report(user_id, is_all_time_report)
-        document = FSInputFile(report_path)
+        report, filename = await single_flight.do(
+            (user_id, "report", is_all_time_report),
+            build_report,
+            user_id,
+            is_all_time_report,
+        )
+        document = BufferedInputFile(report, filename=filename)
 
         await callback.answer("📄 Monthly report sent!")
         await callback.message.answer_document(document=document)
-        remove_temp_files(report_path)
 
     except Exception as e:
         logger.error(f"Error in reports: {e}")
+
+
+@router.message(F.text.startswith("/slowlog"), F.from_user.id.in_(ADMIN_IDS))
+async def slowlog(message: Message):
+    parts = message.text.split()
+    limit = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 5
+
+    rows = get_slowest_queries(limit)
+
+    if not rows:
+        await message.answer("🐢 No slow queries recorded yet.")
+        return
+
+    lines = []
+    for position, (statement, stats) in enumerate(rows, start=1):
+        average = stats["total_ms"] / stats["count"]
+        lines.append(
+            f"<b>{position}.</b> max <code>{stats['max_ms']:.1f}ms</code>, "
+            f"avg <code>{average:.1f}ms</code>, {stats['count']}×\n"
+            f"<code>{html.escape(statement[:300])}</code>"
+        )
+
+    await message.answer(
+        "🐢 <b>Slowest queries:</b>\n\n" + "\n\n".join(lines), parse_mode="HTML"
+    )
+
+
+@router.message(F.text.startswith("/budget"))
+async def budget(message: Message):
+    """``/budget``, ``/budget groceries 300`` or ``/budget groceries off``."""
+    user_id = message.from_user.id
+    parts = message.text.split()[1:]
+
+    if len(parts) >= 2 and parts[-1].lower() in ("off", "0"):
+        category = match_category(" ".join(parts[:-1]))
+        if category is None or not await remove_budget(user_id, category):
+            await message.answer("❗ No such budget")
+            return
+        await message.answer(
+            f"🗑 Budget for <b>{category}</b> removed", parse_mode="HTML"
+        )
+        return
+
+    if parts:
+        entry = parse_quick_entry(" ".join(parts))
+        if entry is None:
+            await message.answer(
+                "❗ Use <code>/budget groceries 300</code>, or "
+                "<code>/budget groceries off</code> to remove it",
+                parse_mode="HTML",
+            )
+            return
+        rows = await convert_entries(message, [entry])
+        if rows is None:
+            return
+        category, amount, _, _ = rows[0]
+        await set_budget(user_id, category, amount)
+        await message.answer(
+            f"✅ <b>Budget set!</b>\n\n<b>{category}</b>: "
+            f"<code>{money(amount)}</code> per month",
+            parse_mode="HTML",
+        )
+        return
+
+    rows = await get_budgets(user_id)
+    if not rows:
+        await message.answer(
+            "🎯 You have no budgets yet.\n\n"
+            "Set one with <code>/budget groceries 300</code>",
+            parse_mode="HTML",
+        )
+        return
+
+    lines = [
+        f"  - <b>{category}</b>: <code>{money(spent)}</code> of "
+        f"<code>{money(amount)}</code> ({spent / amount:.0%})"
+        for category, amount, spent in rows
+    ]
+    await message.answer(
+        "🎯 <b>Your budgets this month:</b>\n\n" + "\n".join(lines),
+        parse_mode="HTML",
+    )
+
+
+def parse_timezone(text: str) -> str | None:
+    """Accepts an IANA name like "Europe/Berlin" or an offset like "+10"."""
+    text = text.strip()
+
+    match = re.fullmatch(r"(?:UTC|GMT)?\s*([+-])(\d{1,2})", text, re.IGNORECASE)
+    if match:
+        sign, hours = match.groups()
+        if int(hours) == 0:
+            return "UTC"
+        # The Etc zones use POSIX signs, which are inverted.
+        text = f"Etc/GMT{'-' if sign == '+' else '+'}{int(hours)}"
+    elif text.upper() in ("UTC", "GMT"):
+        return "UTC"
+
+    try:
+        ZoneInfo(text)
+    except (KeyError, ValueError, OSError):
+        return None
+    return text
+
+
+@router.message(F.text.startswith("/timezone"))
+async def user_timezone(message: Message):
+    user_id = message.from_user.id
+    parts = message.text.split(maxsplit=1)
+
+    if len(parts) == 1:
+        current = (await get_user_settings(user_id)).timezone or DEFAULT_TIMEZONE
+        await message.answer(
+            f"🕒 Your time zone is <b>{current}</b>\n\n"
+            "Change it with <code>/timezone Europe/Berlin</code> "
+            "or <code>/timezone +10</code>",
+            parse_mode="HTML",
+        )
+        return
+
+    zone = parse_timezone(parts[1])
+    if zone is None:
+        await message.answer(
+            "❗ Unknown time zone. Use a name like <code>Europe/Berlin</code> "
+            "or an offset like <code>+10</code>",
+            parse_mode="HTML",
+        )
+        return
+
+    await set_user_timezone(user_id, zone)
+    now = datetime.now(ZoneInfo(zone))
+    await message.answer(
+        f"✅ <b>Time zone set to {zone}</b>\n\n"
+        f"It's {now:%H:%M} on {now:%d %B} there",
+        parse_mode="HTML",
+    )
+
+
+@router.message(F.text.startswith("/currency"))
+async def user_currency(message: Message):
+    user_id = message.from_user.id
+    parts = message.text.split(maxsplit=1)
+
+    if len(parts) == 1:
+        await message.answer(
+            f"💱 Your home currency is <b>{current_currency()}</b>\n\n"
+            "Change it with <code>/currency USD</code>. "
+            f"Supported: {', '.join(CURRENCY_SYMBOLS)}\n\n"
+            "Expenses in another currency are converted when you add them, "
+            "e.g. <code>12.50 usd groceries</code> or <code>$12.50 groceries</code>",
+            parse_mode="HTML",
+        )
+        return
+
+    currency = currency_code(parts[1])
+    if currency is None:
+        await message.answer(
+            f"❗ Unknown currency. Supported: {', '.join(CURRENCY_SYMBOLS)}"
+        )
+        return
+
+    missing = await set_user_currency(user_id, currency)
+    if missing:
+        await message.answer(
+            f"❗ Nothing was changed. I have no exchange rate for {', '.join(missing)}"
+        )
+        return
+
+    forecast_cache.forget(user_id)
+    await message.answer(
+        f"✅ <b>Home currency set to {currency}</b>\n\n"
+        "Your expenses, savings, subscriptions and budgets were converted "
+        "at the rate of the day they were added",
+        parse_mode="HTML",
+    )
+
+
+@router.message(StateFilter(default_state), F.text, batch_entry_filter)
+async def batch_entry(message: Message, lines: list[str]):
+    entries = []
+    invalid = []
+
+    for line in lines:
+        entry = parse_quick_entry(line)
+        if entry is None:
+            invalid.append(line)
+        else:
+            entries.append(entry)
+
+    if invalid:
+        await message.answer(
+            "❗ Nothing was added. I couldn't read these lines:\n"
+            + "\n".join(f"  - <code>{html.escape(line)}</code>" for line in invalid)
+            + "\n\nUse one expense per line, e.g.: <code>groceries 23.10</code>",
+            parse_mode="HTML",
+        )
+        return
+
+    rows = await convert_entries(message, entries)
+    if rows is None:
+        return
+    await add_expenses(message.from_user.id, rows)
+
+    subtotals: dict[str, float] = {}
+    for category, amount, _, _ in rows:
+        subtotals[category] = subtotals.get(category, 0) + amount
+
+    lines = [
+        f"  - <b>{category}</b>: <code>{money(amount)}</code>"
+        for category, amount in sorted(
+            subtotals.items(), key=lambda item: item[1], reverse=True
+        )
+    ]
+    total = sum(subtotals.values())
+
+    await message.answer(
+        f"✅ <b>Added {len(entries)} expenses!</b>\n\n"
+        + "\n".join(lines)
+        + f"\n\n💰 Total: <code>{money(total)}</code>",
+        parse_mode="HTML",
+    )
+    await send_expense_alerts(
+        message, [(category, amount) for category, amount, _, _ in rows]
+    )
+
+
+@router.message(StateFilter(default_state), F.text, quick_entry_filter)
+async def quick_entry(message: Message, entry: tuple[str, float, str | None]):
+    rows = await convert_entries(message, [entry])
+    if rows is None:
+        return
+    category, amount, currency, original_amount = rows[0]
+
+    expense_id = await add_expense(
+        message.from_user.id, category, amount, currency, original_amount
+    )
+    await message.answer(
+        f"✅ <b>Added!</b>\n\n💰 <code>{entered_as(amount, original_amount, currency)}</code> "
+        f"for <b>{category}</b>",
+        reply_markup=await expense_actions_keyboard(expense_id),
+        parse_mode="HTML",
+    )
+    await send_expense_alerts(message, [(category, amount)])
@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from metrics import Counter, Histogram, registry
+
+logger = logging.getLogger(__name__)
+
+EVENT_LOOP_LAG = registry.register(
+    Histogram(
+        "event_loop_lag_seconds",
+        "Delay of event loop callbacks past their scheduled time.",
+        "thread",
+    )
+)
+EVENT_LOOP_STALLS = registry.register(
+    Counter("event_loop_stalls_total", "Times the loop was blocked too long.", "thread")
+)
+
+
+class LoopWatchdog:
+    """Detects blocking calls on the event loop.
+
+    A heartbeat task measures how late the loop wakes it up. A separate thread
+    watches the heartbeat; when it stops for longer than ``threshold`` seconds
+    the loop is blocked, and the loop thread's current stack is logged so the
+    blocking call site shows up in the logs while it is still running.
+    """
+
+    def __init__(self, threshold: float = 0.25, interval: float = 0.05):
+        self.threshold = threshold
+        self.interval = interval
+        self._thread_id: Optional[int] = None
+        self._thread_name = ""
+        self._last_beat = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self._monitor: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        current = threading.current_thread()
+        self._thread_id = current.ident
+        self._thread_name = current.name
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+
+        self._task = asyncio.create_task(self._heartbeat())
+        self._monitor = threading.Thread(
+            target=self._watch, name="loop-watchdog", daemon=True
+        )
+        self._monitor.start()
+
+    async def stop(self):
+        self._stopped.set()
+
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+        if self._monitor:
+            self._monitor.join()
+
+    async def _heartbeat(self):
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._last_beat = now = time.monotonic()
+            EVENT_LOOP_LAG.observe(self._thread_name, now - start - self.interval)
+
+    def _watch(self):
+        reported_beat = None
+
+        while not self._stopped.wait(self.interval):
+            last_beat = self._last_beat
+            stalled_for = time.monotonic() - last_beat - self.interval
+
+            if stalled_for < self.threshold or last_beat == reported_beat:
+                continue
+
+            # Report each stall once, however long it lasts.
+            reported_beat = last_beat
+            EVENT_LOOP_STALLS.inc(self._thread_name)
+
+            frame = sys._current_frames().get(self._thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else "unavailable"
+            logger.warning(
+                f"Event loop blocked for {stalled_for * 1000:.0f}ms. "
+                f"Loop thread stack:\n{stack}"
+            )
@@ -1,24 +1,70 @@
 import asyncio
 import logging
+import multiprocessing
 import os
+import socket
+from datetime import datetime
+from typing import Optional
+from zoneinfo import ZoneInfo
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
 from aiogram.types import Message
+from aiohttp import web
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from dotenv import load_dotenv
 
+from graphs import warm_up_renderer
 from keyboard import main_menu
+from logic import UserSettingsMiddleware, format_month_summary
 from logic import router as logic_router
-from sql import connect_database, renew_active_subscriptions
+from loopwatch import LoopWatchdog
+from metrics import HandlerMetricsMiddleware, registry, start_metrics_server
+from outbound import OutboundScheduler, broadcast_lane
+from sql import (
+    DEFAULT_TIMEZONE,
+    connect_database,
+    get_user_timezones,
+    iter_month_summaries,
+    renew_active_subscriptions,
+)
+from storage import FSMFlushMiddleware, SQLiteStorage
+from webhook import create_webhook_app
+from workers import (
+    STREAM_LIMIT,
+    IngressDispatcher,
+    consume_updates,
+    restart_dead_workers,
+)
 
 load_dotenv()
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or None
+WEBHOOK_MAX_IN_FLIGHT = int(os.getenv("WEBHOOK_MAX_IN_FLIGHT", "100"))
+
+WORKERS = int(os.getenv("WORKERS", "1"))
+
+OUTBOUND_GLOBAL_RATE = float(os.getenv("OUTBOUND_GLOBAL_RATE", "30"))
+
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+LOOP_LAG_THRESHOLD_MS = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "250"))
+
+SUMMARY_CONCURRENCY = 10
+# Local hour on the 1st of the month when users get last month's summary.
+SUMMARY_HOUR = 10
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -26,21 +72,126 @@ scheduler = AsyncIOScheduler()
 
 
 async def renew_subscriptions():
-    logger.info("Running monthly subscription renewal.")
+    logger.info("Running subscription renewal.")
 
     try:
         await renew_active_subscriptions()
-        logger.info("Monthly renewal completed")
+        logger.info("Subscription renewal completed")
 
     except Exception as e:
         logger.error(f"Error during renewal: {e}")
 
 
-async def start_bot():
-    await connect_database()
+async def send_month_summary(
+    bot: Bot,
+    semaphore: asyncio.Semaphore,
+    user_id: int,
+    currency: Optional[str],
+    rows: list,
+) -> bool:
+    async with semaphore:
+        try:
+            await bot.send_message(user_id, format_month_summary(rows, currency))
+            return True
+
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            logger.info(f"Skipping month summary for {user_id}: {e}")
+            return False
+
+        except Exception as e:
+            # One failed send must not stop the broadcast for everyone else.
+            logger.error(f"Error sending month summary to {user_id}: {e}")
+            return False
+
+
+def is_summary_due(timezone: Optional[str]) -> bool:
+    now = datetime.now(ZoneInfo(timezone or DEFAULT_TIMEZONE))
+    return now.day == 1 and now.hour == SUMMARY_HOUR
+
+
+async def send_month_summaries(bot: Bot):
+    """Sends summaries to every time zone where the month has just started.
+
+    Runs hourly, so each user gets theirs at SUMMARY_HOUR local time.
+    """
+    semaphore = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+    sent = 0
+
+    try:
+        timezones = [None, *await get_user_timezones()]
+        due = [timezone for timezone in timezones if is_summary_due(timezone)]
+        if not due:
+            return
+
+        logger.info("Sending month summaries.")
+        with broadcast_lane():
+            for timezone in due:
+                async for chunk in iter_month_summaries(timezone):
+                    results = await asyncio.gather(
+                        *(
+                            send_month_summary(bot, semaphore, user_id, currency, rows)
+                            for user_id, currency, rows in chunk
+                        )
+                    )
+                    sent += sum(results)
+
+        logger.info(f"Month summaries sent to {sent} users.")
+
+    except Exception as e:
+        logger.error(f"Error sending month summaries: {e}")
 
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    app = create_webhook_app(
+        dp, bot, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_MAX_IN_FLIGHT
+    )
+
+    await dp.emit_startup(bot=bot)
+    await bot.set_webhook(
+        f"{WEBHOOK_URL}{WEBHOOK_PATH}",
+        secret_token=WEBHOOK_SECRET,
+        max_connections=min(WEBHOOK_MAX_IN_FLIGHT, 100),
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+    logger.info(f"Webhook server listening on {WEBHOOK_HOST}:{WEBHOOK_PORT}.")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        await dp.emit_shutdown(bot=bot)
+        await bot.session.close()
+
+
+async def run_polling(dp: Dispatcher, bot: Bot):
+    # A webhook left by an earlier webhook deploy makes getUpdates fail with
+    # a conflict, so polling starts by removing it.
+    await bot.delete_webhook()
+    await dp.start_polling(bot)
+
+
+def create_bot() -> Bot:
     bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-    dp = Dispatcher(storage=MemoryStorage())
+    # Each worker process gets an equal share of Telegram's global limit.
+    outbound = OutboundScheduler(global_rate=OUTBOUND_GLOBAL_RATE / WORKERS)
+    bot.session.middleware(outbound)
+    registry.add_collector(outbound.collect_metrics)
+
+    return bot
+
+
+def create_dispatcher() -> Dispatcher:
+    storage = SQLiteStorage()
+    dp = Dispatcher(storage=storage)
+    dp.update.outer_middleware(FSMFlushMiddleware(storage))
+    dp.message.middleware(HandlerMetricsMiddleware())
+    dp.callback_query.middleware(HandlerMetricsMiddleware())
+    dp.message.middleware(UserSettingsMiddleware())
+    dp.callback_query.middleware(UserSettingsMiddleware())
 
     @dp.message(lambda message: message.text == "/start")
     async def command_start(message: Message):
@@ -51,22 +202,168 @@ async def start_bot():
 
     dp.include_router(logic_router)
 
+    return dp
+
+
+async def start_metrics(offset: int = 0) -> Optional[web.AppRunner]:
+    if not METRICS_PORT:
+        return None
+
+    port = METRICS_PORT + offset
+    runner = await start_metrics_server(METRICS_HOST, port)
+    logger.info(f"Metrics available at http://{METRICS_HOST}:{port}/metrics")
+
+    return runner
+
+
+def start_scheduler(bot: Bot):
     scheduler.add_job(
         renew_subscriptions,
-        trigger=CronTrigger(day=1, hour=1, minute=1),
+        # Hourly, so every time zone renews soon after its month starts.
+        trigger=CronTrigger(minute=1),
         id="subscriptions_renewal",
         replace_existing=True,
     )
+    scheduler.add_job(
+        send_month_summaries,
+        # Hourly, so every time zone gets its summary at SUMMARY_HOUR local time.
+        trigger=CronTrigger(minute=1),
+        args=(bot,),
+        id="month_summary",
+        replace_existing=True,
+    )
     scheduler.start()
 
-    logger.info("Bot started.")
     logger.info("Scheduler initialized.")
 
+
+async def start_bot():
+    await connect_database()
+
+    bot = create_bot()
+    dp = create_dispatcher()
+    start_scheduler(bot)
+
+    logger.info("Bot started.")
+
+    watchdog = LoopWatchdog(threshold=LOOP_LAG_THRESHOLD_MS / 1000)
+    watchdog.start()
+    warm_up_task = asyncio.create_task(warm_up_renderer())
+    metrics_runner = await start_metrics()
+
     try:
-        await dp.start_polling(bot)
+        if BOT_MODE == "webhook":
+            await run_webhook(dp, bot)
+        else:
+            await run_polling(dp, bot)
     finally:
+        warm_up_task.cancel()
+        await watchdog.stop()
         scheduler.shutdown()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+
+
+async def serve_worker(index: int, sock: socket.socket):
+    bot = create_bot()
+    dp = create_dispatcher()
+
+    # Exactly one worker owns the scheduler, so jobs never run twice.
+    if index == 0:
+        start_scheduler(bot)
+
+    watchdog = LoopWatchdog(threshold=LOOP_LAG_THRESHOLD_MS / 1000)
+    watchdog.start()
+    warm_up_task = asyncio.create_task(warm_up_renderer())
+    metrics_runner = await start_metrics(offset=index)
+    reader, writer = await asyncio.open_connection(sock=sock, limit=STREAM_LIMIT)
+
+    logger.info(f"Worker {index} started.")
+    await dp.emit_startup(bot=bot)
+
+    try:
+        await consume_updates(dp, bot, reader)
+    finally:
+        warm_up_task.cancel()
+        await watchdog.stop()
+        writer.close()
+        await dp.emit_shutdown(bot=bot)
+        await bot.session.close()
+        if index == 0:
+            scheduler.shutdown()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+
+    logger.info(f"Worker {index} stopped.")
+
+
+def run_worker(index: int, sock: socket.socket):
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve_worker(index, sock))
+
+
+def spawn_worker(index: int) -> tuple[multiprocessing.Process, socket.socket]:
+    """Starts worker ``index`` and returns it with the ingress end of its socket."""
+    ingress_sock, worker_sock = socket.socketpair()
+    process = multiprocessing.get_context("spawn").Process(
+        target=run_worker, args=(index, worker_sock), name=f"worker-{index}"
+    )
+    process.start()
+    worker_sock.close()
+
+    return process, ingress_sock
+
+
+async def run_ingress(
+    sockets: list[socket.socket], processes: list[multiprocessing.Process]
+):
+    writers = []
+    for sock in sockets:
+        _, writer = await asyncio.open_connection(sock=sock, limit=STREAM_LIMIT)
+        writers.append(writer)
+
+    bot = create_bot()
+    dp = IngressDispatcher(writers)
+    dp.include_router(logic_router)
+    watcher = asyncio.create_task(restart_dead_workers(dp, processes, spawn_worker))
+
+    logger.info(f"Ingress started with {len(writers)} workers.")
+
+    try:
+        if BOT_MODE == "webhook":
+            await run_webhook(dp, bot)
+        else:
+            await run_polling(dp, bot)
+    finally:
+        watcher.cancel()
+        for writer in dp.writers:
+            writer.close()
+
+
+def start_supervisor(workers: int):
+    asyncio.run(connect_database())
+
+    processes = []
+    sockets = []
+
+    for index in range(workers):
+        process, ingress_sock = spawn_worker(index)
+        processes.append(process)
+        sockets.append(ingress_sock)
+
+    try:
+        asyncio.run(run_ingress(sockets, processes))
+    finally:
+        for sock in sockets:
+            sock.close()
+        for process in processes:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
 
 
 if __name__ == "__main__":
-    asyncio.run(start_bot())
+    if WORKERS > 1:
+        start_supervisor(WORKERS)
+    else:
+        asyncio.run(start_bot())
@@ -0,0 +1,257 @@
+import bisect
+import inspect
+import threading
+import time
+from functools import wraps
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from aiohttp import web
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, label: str):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.values: dict[str, Any] = {}
+
+    def set(self, label_value: str, value: float):
+        self.values[label_value] = value
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for label_value, value in sorted(self.values.items()):
+            lines.append(
+                f'{self.name}{{{self.label}="{label_value}"}} {_format_value(value)}'
+            )
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, label_value: str, amount: float = 1):
+        self.values[label_value] = self.values.get(label_value, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram; ``observe`` is a bisect and two additions.
+
+    Charts are drawn in executor threads, so updates take a lock.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label: str,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, label)
+        self.buckets = buckets
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+
+        with self._lock:
+            series = self.values.get(label_value)
+            if series is None:
+                series = self.values[label_value] = [
+                    [0] * (len(self.buckets) + 1),
+                    0.0,
+                ]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+        with self._lock:
+            snapshot = [
+                (label_value, list(counts), total)
+                for label_value, (counts, total) in sorted(self.values.items())
+            ]
+
+        for label_value, counts, total in snapshot:
+            label = f'{self.label}="{label_value}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {_format_value(total)}")
+            lines.append(f"{self.name}_count{{{label}}} {cumulative}")
+
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[_Metric] = []
+        self.collectors: list[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> Any:
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]):
+        """Registers a callback that refreshes metrics right before a scrape."""
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self.collectors:
+            collector()
+
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HANDLER_LATENCY = registry.register(
+    Histogram("handler_duration_seconds", "Time spent in update handlers.", "handler")
+)
+DB_QUERY_LATENCY = registry.register(
+    Histogram("db_query_duration_seconds", "Time spent in sql.py calls.", "function")
+)
+GRAPH_RENDER_LATENCY = registry.register(
+    Histogram("graph_render_duration_seconds", "Time spent drawing charts.", "function")
+)
+REPORT_BUILD_LATENCY = registry.register(
+    Histogram(
+        "report_build_duration_seconds", "Time spent building XLSX reports.", "function"
+    )
+)
+
+
+def timed(histogram: Histogram):
+    """Records how long every call of the decorated function takes.
+
+    For async generators only the time spent inside the generator counts, not
+    the time its consumer spends between items.
+    """
+
+    def decorator(func):
+        name = func.__name__
+
+        if inspect.isasyncgenfunction(func):
+
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                generator = func(*args, **kwargs)
+                elapsed = 0.0
+                try:
+                    while True:
+                        start = time.perf_counter()
+                        try:
+                            item = await generator.__anext__()
+                        except StopAsyncIteration:
+                            return
+                        finally:
+                            elapsed += time.perf_counter() - start
+                        yield item
+                finally:
+                    await generator.aclose()
+                    histogram.observe(name, elapsed)
+
+        elif inspect.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    histogram.observe(name, time.perf_counter() - start)
+
+        else:
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    histogram.observe(name, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner middleware recording latency per handler function name."""
+
+    def __init__(self, histogram: Histogram = HANDLER_LATENCY):
+        self.histogram = histogram
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            handler_object = data.get("handler")
+            name = handler_object.callback.__name__ if handler_object else "unknown"
+            self.histogram.observe(name, time.perf_counter() - start)
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(
+        text=registry.render(), content_type="text/plain", charset="utf-8"
+    )
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+
+    return runner
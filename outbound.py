@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Union
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from metrics import Counter as MetricCounter
+from metrics import Gauge, registry
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BROADCAST = "broadcast"
+
+MAX_CHAT_BUCKETS = 10_000
+
+OUTBOUND_EVENTS = registry.register(
+    MetricCounter(
+        "outbound_events_total", "Sent, throttled and retried calls.", "event"
+    )
+)
+OUTBOUND_QUEUE_DEPTH = registry.register(
+    Gauge("outbound_queue_depth", "Sends waiting for a token.", "lane")
+)
+
+_lane: ContextVar[str] = ContextVar("outbound_lane", default=INTERACTIVE)
+
+
+@contextmanager
+def broadcast_lane():
+    """Sends made inside this block yield to interactive replies."""
+    token = _lane.set(BROADCAST)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+def is_rate_limited(method: TelegramMethod) -> bool:
+    """Whether ``method`` counts against Telegram's message limits.
+
+    Edits and deletes count like sends; pagers and undo edit in place.
+    """
+    return type(method).__name__.startswith(
+        ("Send", "Copy", "Forward", "EditMessage", "DeleteMessage")
+    )
+
+
+class OutboundScheduler(BaseRequestMiddleware):
+    """Rate limits outgoing messages before they reach Telegram.
+
+    Every sent, edited or deleted message takes a token from a global bucket
+    and from its chat's bucket. Broadcast sends wait while interactive replies
+    are queued, and a ``retry_after`` from Telegram pauses all sends before
+    the call is retried.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 30,
+        chat_rate: float = 1,
+        chat_burst: float = 3,
+        max_retries: int = 3,
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.chat_buckets: dict[Union[int, str], TokenBucket] = {}
+        self.paused_until = 0.0
+        self.waiting: Counter = Counter()
+        self.stats: Counter = Counter()
+
+    @property
+    def queue_depth(self) -> dict[str, int]:
+        return {
+            INTERACTIVE: self.waiting[INTERACTIVE],
+            BROADCAST: self.waiting[BROADCAST],
+        }
+
+    def collect_metrics(self):
+        for event, count in self.stats.items():
+            OUTBOUND_EVENTS.set(event, count)
+        for lane, depth in self.queue_depth.items():
+            OUTBOUND_QUEUE_DEPTH.set(lane, depth)
+
+    def _get_chat_bucket(self, chat_id: Union[int, str], now: float) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+
+        if bucket is None:
+            if len(self.chat_buckets) >= MAX_CHAT_BUCKETS:
+                self.chat_buckets = {
+                    key: value
+                    for key, value in self.chat_buckets.items()
+                    if not value.is_full(now)
+                }
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self.chat_buckets[chat_id] = bucket
+
+        return bucket
+
+    async def _acquire(self, lane: str, chat_id: Optional[Union[int, str]]):
+        self.waiting[lane] += 1
+
+        try:
+            while True:
+                now = time.monotonic()
+
+                if now < self.paused_until:
+                    delay = self.paused_until - now
+                elif lane == BROADCAST and self.waiting[INTERACTIVE]:
+                    delay = 1 / self.global_bucket.rate
+                else:
+                    chat_bucket = self._get_chat_bucket(chat_id, now)
+                    delay = max(self.global_bucket.delay(now), chat_bucket.delay(now))
+                    if delay <= 0:
+                        self.global_bucket.consume()
+                        chat_bucket.consume()
+                        return
+
+                self.stats["throttled"] += 1
+                await asyncio.sleep(delay)
+
+        finally:
+            self.waiting[lane] -= 1
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        limited = is_rate_limited(method)
+        lane = _lane.get()
+
+        for attempt in range(self.max_retries + 1):
+            if limited:
+                await self._acquire(lane, getattr(method, "chat_id", None))
+
+            try:
+                response = await make_request(bot, method)
+                self.stats[f"sent_{lane}"] += 1
+                return response
+
+            except TelegramRetryAfter as e:
+                self.stats["retry_after"] += 1
+                if attempt == self.max_retries:
+                    raise
+
+                logger.info(
+                    f"Telegram asked to retry {type(method).__name__} "
+                    f"after {e.retry_after}s."
+                )
+                self.paused_until = max(
+                    self.paused_until, time.monotonic() + e.retry_after
+                )
+                if not limited:
+                    await asyncio.sleep(e.retry_after)
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+from collections import Counter
+from typing import Any, Awaitable, Callable, Hashable
+
+from metrics import Counter as MetricCounter
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+SINGLE_FLIGHT_CALLS = registry.register(
+    MetricCounter("single_flight_calls_total", "Coalescable calls made.", "operation")
+)
+SINGLE_FLIGHT_COALESCED = registry.register(
+    MetricCounter(
+        "single_flight_coalesced_total",
+        "Calls that joined one already in flight.",
+        "operation",
+    )
+)
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share the same key.
+
+    The first caller for a key starts the computation in its own task; every
+    caller that arrives while it is still in flight awaits the same result (or
+    exception) instead of starting its own. A caller that is cancelled only
+    stops waiting, and the task is cancelled once no caller is left.
+    """
+
+    def __init__(self):
+        # Key -> the computation's task and how many callers await it.
+        self._in_flight: dict[Hashable, list] = {}
+        self.calls: Counter = Counter()
+        self.coalesced: Counter = Counter()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def collect_metrics(self):
+        for operation, count in self.calls.items():
+            SINGLE_FLIGHT_CALLS.set(operation, count)
+        for operation, count in self.coalesced.items():
+            SINGLE_FLIGHT_COALESCED.set(operation, count)
+
+    async def do(
+        self,
+        key: tuple[Any, str, Hashable],
+        func: Callable[..., Awaitable[Any]],
+        *args,
+        **kwargs,
+    ) -> Any:
+        operation = key[1]
+        self.calls[operation] += 1
+
+        entry = self._in_flight.get(key)
+        if entry is not None:
+            self.coalesced[operation] += 1
+            logger.info(f"Coalesced {operation} call for user {key[0]}")
+        else:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            entry = self._in_flight[key] = [task, 0]
+            task.add_done_callback(lambda _: self._forget(key, entry))
+
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+
+        except asyncio.CancelledError:
+            entry[1] -= 1
+            if entry[1] == 0:
+                task.cancel()
+            raise
+
+    def _forget(self, key: Hashable, entry: list):
+        if self._in_flight.get(key) is entry:
+            del self._in_flight[key]
+
+
+single_flight = SingleFlight()
+registry.add_collector(single_flight.collect_metrics)
@@ -1,13 +1,19 @@
+import csv
 import logging
 import os
 import sqlite3
-from datetime import datetime
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Any, Literal, NamedTuple, Optional
+from zoneinfo import ZoneInfo
 
 import aiosqlite
-import pandas as pd
 from dotenv import load_dotenv
 
-from constants import COLUMN_NAMES
+from constants import COLUMN_NAMES, CURRENCY_SYMBOLS, FX_BASE_CURRENCY
+from metrics import DB_QUERY_LATENCY, REPORT_BUILD_LATENCY, timed
 
 logger = logging.getLogger(__name__)
 
@@ -15,30 +21,243 @@ load_dotenv()
 
 DB_PATH = os.getenv("DB_PATH")
 
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "100"))
+
+DEFAULT_TIMEZONE = os.getenv("DEFAULT_TIMEZONE", "UTC")
+DEFAULT_CURRENCY = os.getenv("DEFAULT_CURRENCY", "EUR")
+FX_RATES_PATH = os.getenv("FX_RATES_PATH")
+
+# Per-statement stats for queries over the threshold, and their cached plans.
+slow_queries: dict[str, dict[str, Any]] = {}
+_query_plans: dict[str, str] = {}
+
+
+class UserSettings(NamedTuple):
+    """A user's saved settings; None means the server default."""
+
+    timezone: Optional[str] = None
+    currency: Optional[str] = None
+
+
+MAX_CACHED_SETTINGS = 10_000
+
+# Least recently used first; see _cache_user_settings.
+_user_settings: OrderedDict[int, UserSettings] = OrderedDict()
+
+
+def _cache_user_settings(user_id: int, settings: UserSettings) -> UserSettings:
+    _user_settings[user_id] = settings
+    _user_settings.move_to_end(user_id)
+    if len(_user_settings) > MAX_CACHED_SETTINGS:
+        _user_settings.popitem(last=False)
+    return settings
+
+
+class Periods(NamedTuple):
+    """A user's current date and the ``[start, end)`` of their month and year."""
+
+    today: str
+    month_start: str
+    month_end: str
+    year_start: str
+    year_end: str
+
+
+def get_periods(timezone: Optional[str] = None) -> Periods:
+    today = datetime.now(ZoneInfo(timezone or DEFAULT_TIMEZONE)).date()
+    month_start = today.replace(day=1)
+    month_end = (month_start + timedelta(days=32)).replace(day=1)
+
+    return Periods(
+        today.isoformat(),
+        month_start.isoformat(),
+        month_end.isoformat(),
+        f"{today.year:04d}-01-01",
+        f"{today.year + 1:04d}-01-01",
+    )
+
+
+# Set once per update to the user's periods; jobs outside an update fall back
+# to DEFAULT_TIMEZONE.
+request_periods: ContextVar[Optional[Periods]] = ContextVar(
+    "request_periods", default=None
+)
+
+
+def current_periods() -> Periods:
+    return request_periods.get() or get_periods()
+
 
 def get_current_date():
-    return datetime.now().strftime("%Y-%m-%d")
+    return current_periods().today
+
+
+# Set once per update to the user's home currency, like request_periods.
+request_currency: ContextVar[Optional[str]] = ContextVar(
+    "request_currency", default=None
+)
+
+
+def current_currency() -> str:
+    return request_currency.get() or DEFAULT_CURRENCY
+
+
+def currency_symbol(currency: Optional[str] = None) -> str:
+    """Returns the suffix amounts are shown with, e.g. "€" or " NOK"."""
+    currency = currency or current_currency()
+    return CURRENCY_SYMBOLS.get(currency, f" {currency}")
+
+
+def _rate(currency: str, date: str) -> str:
+    """SQL for units of ``currency`` per FX_BASE_CURRENCY on ``date``.
+
+    Both arguments are SQL expressions. Takes the latest rate on or before
+    the date, or the earliest one for dates before the rates start; NULL if
+    the currency has no rates at all.
+    """
+    return f"""
+        CASE WHEN {currency} = '{FX_BASE_CURRENCY}' THEN 1.0 ELSE COALESCE(
+            (SELECT rate FROM fx_rates
+                WHERE fx_rates.currency = {currency} AND fx_rates.date <= {date}
+                ORDER BY fx_rates.date DESC LIMIT 1),
+            (SELECT rate FROM fx_rates WHERE fx_rates.currency = {currency}
+                ORDER BY fx_rates.date LIMIT 1)
+        ) END
+    """
 
 
+def get_recent_months(months: int) -> list[str]:
+    today = datetime.strptime(get_current_date(), "%Y-%m-%d")
+    month_index = today.year * 12 + today.month - 1
+
+    return [
+        f"{index // 12:04d}-{index % 12 + 1:02d}"
+        for index in range(month_index - months + 1, month_index + 1)
+    ]
+
+
+def _normalize_statement(sql: str) -> str:
+    return " ".join(sql.split())
+
+
+async def _explain_query_plan(statement: str, parameters: tuple | dict) -> str:
+    plan = _query_plans.get(statement)
+
+    if plan is None:
+        try:
+            async with aiosqlite.connect(DB_PATH) as db:
+                cursor = await db.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+                plan = "\n".join(row[3] for row in await cursor.fetchall())
+        except Exception as e:
+            plan = f"unavailable: {e}"
+
+        _query_plans[statement] = plan
+
+    return plan
+
+
+async def _execute(
+    target,
+    sql: str,
+    parameters: tuple | dict = (),
+    fetch: Optional[Literal["one", "all"]] = None,
+):
+    """Runs ``target.execute`` and reports the statement if it is slow.
+
+    ``target`` is a connection or a cursor. With ``fetch`` the rows are read
+    inside the timing and returned instead of the cursor. Slow statements are
+    logged with their parameter types (never values), duration and query plan.
+    """
+    start = time.perf_counter()
+    result = await target.execute(sql, parameters)
+    if fetch == "one":
+        result = await result.fetchone()
+    elif fetch == "all":
+        result = await result.fetchall()
+    await _report_if_slow(sql, parameters, time.perf_counter() - start)
+    return result
+
+
+async def _executemany(target, sql: str, rows: list[tuple]):
+    """``target.executemany`` with the same slow statement reporting."""
+    start = time.perf_counter()
+    result = await target.executemany(sql, rows)
+    await _report_if_slow(sql, rows[0] if rows else (), time.perf_counter() - start)
+    return result
+
+
+async def _read_sql(connection: sqlite3.Connection, sql: str, parameters: tuple):
+    """``pd.read_sql`` with the same slow statement reporting."""
+    import pandas as pd
+
+    start = time.perf_counter()
+    frame = pd.read_sql(sql, connection, params=parameters)
+    await _report_if_slow(sql, parameters, time.perf_counter() - start)
+    return frame
+
+
+async def _report_if_slow(sql: str, parameters: tuple | dict, seconds: float):
+    duration_ms = seconds * 1000
+    if duration_ms < SLOW_QUERY_THRESHOLD_MS:
+        return
+
+    statement = _normalize_statement(sql)
+    values = parameters.values() if isinstance(parameters, dict) else parameters
+    shapes = ", ".join(type(value).__name__ for value in values)
+    plan = await _explain_query_plan(statement, parameters)
+
+    stats = slow_queries.setdefault(
+        statement, {"count": 0, "total_ms": 0.0, "max_ms": 0.0}
+    )
+    stats["count"] += 1
+    stats["total_ms"] += duration_ms
+    stats["max_ms"] = max(stats["max_ms"], duration_ms)
+
+    logger.warning(
+        f"Slow query ({duration_ms:.1f}ms): {statement} "
+        f"params=({shapes})\nQuery plan:\n{plan}"
+    )
+
+
+def get_slowest_queries(limit: int) -> list[tuple[str, dict[str, Any]]]:
+    return sorted(
+        slow_queries.items(), key=lambda item: item[1]["max_ms"], reverse=True
+    )[:limit]
+
+
+@timed(DB_QUERY_LATENCY)
 async def connect_database():
     logger.info("Connecting to database.")
     try:
         async with aiosqlite.connect(DB_PATH) as db:
+            await db.execute("PRAGMA journal_mode=WAL")
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS expenses (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     user_id INTEGER,
                     category TEXT,
                     amount REAL,
-                    date TEXT
+                    date TEXT,
+                    currency TEXT,
+                    original_amount REAL
                 )
             """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_expenses_user_date
+                ON expenses (user_id, date)
+            """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_expenses_user_id
+                ON expenses (user_id, id DESC)
+            """)
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS savings (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     user_id INTEGER,
                     amount REAL,
-                    date TEXT
+                    date TEXT,
+                    currency TEXT,
+                    original_amount REAL
                 )
             """)
             await db.execute("""
@@ -49,9 +268,56 @@ async def connect_database():
                     amount REAL,
                     count INTEGER,
                     is_active BOOLEAN,
-                    date TEXT
+                    date TEXT,
+                    currency TEXT,
+                    original_amount REAL
+                )
+            """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_subscriptions_user_active_id
+                ON subscriptions (user_id, is_active, id)
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS budgets (
+                    user_id INTEGER,
+                    category TEXT,
+                    amount REAL,
+                    PRIMARY KEY (user_id, category)
+                )
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS user_settings (
+                    user_id INTEGER PRIMARY KEY,
+                    timezone TEXT,
+                    currency TEXT
+                )
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS fx_rates (
+                    currency TEXT,
+                    date TEXT,
+                    rate REAL,
+                    PRIMARY KEY (currency, date)
+                ) WITHOUT ROWID
+            """)
+            await add_missing_columns(db, "user_settings", {"currency": "TEXT"})
+            for table in ("expenses", "savings", "subscriptions"):
+                if await add_missing_columns(
+                    db, table, {"currency": "TEXT", "original_amount": "REAL"}
+                ):
+                    await backfill_currency(db, table)
+            await create_expense_rollups(db)
+            await create_category_stats(db)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS fsm_state (
+                    key TEXT PRIMARY KEY,
+                    state TEXT,
+                    data TEXT
                 )
             """)
+            if FX_RATES_PATH and os.path.exists(FX_RATES_PATH):
+                count = await load_fx_rates(db, FX_RATES_PATH)
+                logger.info(f"Loaded {count} exchange rates from {FX_RATES_PATH}.")
             await db.commit()
             logger.info("Connecting to database complete.")
 
@@ -60,211 +326,1003 @@ async def connect_database():
         raise
 
 
-async def add_expense(user_id: int, category: str, amount: float):
+async def add_missing_columns(
+    db: aiosqlite.Connection, table: str, columns: dict[str, str]
+):
+    """Adds the ``{name: type}`` columns that a database from an older version lacks.
+
+    Returns the names of the columns that were added.
+    """
+    cursor = await db.execute(f"PRAGMA table_info({table})")
+    existing = {row[1] for row in await cursor.fetchall()}
+
+    added = []
+    for name, column_type in columns.items():
+        if name not in existing:
+            await db.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+            added.append(name)
+    return added
+
+
+async def backfill_currency(db: aiosqlite.Connection, table: str):
+    """Fills ``currency`` and ``original_amount`` of rows from an older version.
+
+    Those rows were entered in the owner's home currency, so reports and
+    conversions never see NULLs next to the rows added since.
+    """
+    await db.execute(
+        f"""
+        UPDATE {table}
+        SET currency = COALESCE(
+                currency,
+                (SELECT currency FROM user_settings
+                    WHERE user_settings.user_id = {table}.user_id),
+                ?
+            ),
+            original_amount = COALESCE(original_amount, amount)
+        WHERE currency IS NULL OR original_amount IS NULL
+        """,
+        (DEFAULT_CURRENCY,),
+    )
+
+
+async def load_fx_rates(db: aiosqlite.Connection, path: str) -> int:
+    """Loads a ``date,currency,rate`` CSV file into ``fx_rates``.
+
+    Rates are units of the currency per one FX_BASE_CURRENCY, the way the ECB
+    publishes its reference rates; rows for a known day replace the old rate.
+    """
+    with open(path, newline="") as file:
+        rows = [
+            (row["currency"].strip().upper(), row["date"].strip(), float(row["rate"]))
+            for row in csv.DictReader(file)
+        ]
+
+    await db.executemany(
+        "INSERT OR REPLACE INTO fx_rates (currency, date, rate) VALUES (?, ?, ?)",
+        rows,
+    )
+    return len(rows)
+
+
+async def create_expense_rollups(db: aiosqlite.Connection):
+    """Creates per-(user, month, category) totals kept up to date by triggers.
+
+    The first run backfills the table from existing expenses; after that every
+    insert, update and delete adjusts a single row instead of re-aggregating.
+    """
+    cursor = await db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'expense_rollups'"
+    )
+    exists = await cursor.fetchone() is not None
+
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS expense_rollups (
+            user_id INTEGER,
+            month TEXT,
+            category TEXT,
+            total REAL,
+            PRIMARY KEY (user_id, month, category)
+        ) WITHOUT ROWID
+    """)
+    await db.execute("""
+        CREATE TRIGGER IF NOT EXISTS expenses_rollup_insert
+        AFTER INSERT ON expenses
+        BEGIN
+            INSERT INTO expense_rollups (user_id, month, category, total)
+            VALUES (NEW.user_id, substr(NEW.date, 1, 7), NEW.category, NEW.amount)
+            ON CONFLICT (user_id, month, category)
+            DO UPDATE SET total = total + excluded.total;
+        END
+    """)
+    await db.execute("""
+        CREATE TRIGGER IF NOT EXISTS expenses_rollup_delete
+        AFTER DELETE ON expenses
+        BEGIN
+            UPDATE expense_rollups SET total = total - OLD.amount
+            WHERE user_id = OLD.user_id
+                AND month = substr(OLD.date, 1, 7)
+                AND category = OLD.category;
+        END
+    """)
+    await db.execute("""
+        CREATE TRIGGER IF NOT EXISTS expenses_rollup_update
+        AFTER UPDATE OF user_id, category, amount, date ON expenses
+        BEGIN
+            UPDATE expense_rollups SET total = total - OLD.amount
+            WHERE user_id = OLD.user_id
+                AND month = substr(OLD.date, 1, 7)
+                AND category = OLD.category;
+            INSERT INTO expense_rollups (user_id, month, category, total)
+            VALUES (NEW.user_id, substr(NEW.date, 1, 7), NEW.category, NEW.amount)
+            ON CONFLICT (user_id, month, category)
+            DO UPDATE SET total = total + excluded.total;
+        END
+    """)
+
+    if not exists:
+        await db.execute("""
+            INSERT INTO expense_rollups (user_id, month, category, total)
+            SELECT user_id, substr(date, 1, 7), category, SUM(amount)
+            FROM expenses
+            GROUP BY user_id, substr(date, 1, 7), category
+        """)
+
+
+async def create_category_stats(db: aiosqlite.Connection):
+    """Creates per-(user, category) amount statistics kept up to date by triggers.
+
+    Rows hold the count, mean and sum of squared deviations (``m2``) of every
+    expense, updated with Welford's algorithm, so the variance is available
+    without scanning history. Deletes run the update in reverse.
+    """
+    cursor = await db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'category_stats'"
+    )
+    exists = await cursor.fetchone() is not None
+
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS category_stats (
+            user_id INTEGER,
+            category TEXT,
+            count INTEGER,
+            mean REAL,
+            m2 REAL,
+            PRIMARY KEY (user_id, category)
+        ) WITHOUT ROWID
+    """)
+    add = """
+        INSERT INTO category_stats (user_id, category, count, mean, m2)
+        VALUES (NEW.user_id, NEW.category, 1, NEW.amount, 0)
+        ON CONFLICT (user_id, category) DO UPDATE SET
+            count = count + 1,
+            mean = mean + (excluded.mean - mean) / (count + 1),
+            m2 = m2 + (excluded.mean - mean)
+                * (excluded.mean - mean - (excluded.mean - mean) / (count + 1));
+    """
+    remove = """
+        UPDATE category_stats SET
+            count = count - 1,
+            mean = CASE WHEN count > 1
+                THEN (count * mean - OLD.amount) / (count - 1) ELSE 0 END,
+            m2 = CASE WHEN count > 1 THEN max(0, m2 - (OLD.amount - mean)
+                * (OLD.amount - (count * mean - OLD.amount) / (count - 1)))
+                ELSE 0 END
+        WHERE user_id = OLD.user_id AND category = OLD.category;
+    """
+    await db.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS expenses_stats_insert
+        AFTER INSERT ON expenses
+        BEGIN {add} END
+    """)
+    await db.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS expenses_stats_delete
+        AFTER DELETE ON expenses
+        BEGIN {remove} END
+    """)
+    await db.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS expenses_stats_update
+        AFTER UPDATE OF user_id, category, amount ON expenses
+        BEGIN {remove} {add} END
+    """)
+
+    if not exists:
+        await db.execute("""
+            INSERT INTO category_stats (user_id, category, count, mean, m2)
+            SELECT user_id, category, COUNT(*), AVG(amount),
+                max(0, SUM(amount * amount) - SUM(amount) * SUM(amount) / COUNT(*))
+            FROM expenses
+            GROUP BY user_id, category
+        """)
+
+
+@timed(DB_QUERY_LATENCY)
+async def get_user_settings(user_id: int) -> UserSettings:
+    """Returns the user's settings.
+
+    Settings are cached per process for the MAX_CACHED_SETTINGS most recent
+    users; a user's updates always reach the same worker, so the cache never
+    goes stale.
+    """
+    if user_id in _user_settings:
+        _user_settings.move_to_end(user_id)
+        return _user_settings[user_id]
+
+    async with aiosqlite.connect(DB_PATH) as db:
+        row = await _execute(
+            db,
+            "SELECT timezone, currency FROM user_settings WHERE user_id = ?",
+            (user_id,),
+            fetch="one",
+        )
+
+    if user_id in _user_settings:
+        # Another call for the same user finished first and may be newer.
+        return _user_settings[user_id]
+    return _cache_user_settings(user_id, UserSettings(*row) if row else UserSettings())
+
+
+@timed(DB_QUERY_LATENCY)
+async def set_user_timezone(user_id: int, timezone: str):
+    settings = await get_user_settings(user_id)
+
+    async with aiosqlite.connect(DB_PATH) as db:
+        await _execute(
+            db,
+            "INSERT INTO user_settings (user_id, timezone) VALUES (?, ?) "
+            "ON CONFLICT (user_id) DO UPDATE SET timezone = excluded.timezone",
+            (user_id, timezone),
+        )
+        await db.commit()
+
+    _cache_user_settings(user_id, settings._replace(timezone=timezone))
+
+
+@timed(DB_QUERY_LATENCY)
+async def get_exchange_rate(
+    source: str, target: str, date: Optional[str] = None
+) -> Optional[float]:
+    """Returns how many ``target`` units one ``source`` unit bought on ``date``."""
+    async with aiosqlite.connect(DB_PATH) as db:
+        row = await _execute(
+            db,
+            f"SELECT {_rate(':target', ':date')} / {_rate(':source', ':date')}",
+            {"source": source, "target": target, "date": date or get_current_date()},
+            fetch="one",
+        )
+
+    return row[0]
+
+
+@timed(DB_QUERY_LATENCY)
+async def set_user_currency(user_id: int, currency: str) -> list[str]:
+    """Makes ``currency`` the user's home currency and converts their history.
+
+    Amounts are recomputed in SQLite from what was entered, at the rate of
+    each row's date; budgets use today's rate. Returns the currencies that
+    have no rates, in which case nothing is changed.
+    """
+    settings = await get_user_settings(user_id)
+    previous = settings.currency or DEFAULT_CURRENCY
+    parameters = {
+        "user_id": user_id,
+        "currency": currency,
+        "previous": previous,
+        "today": get_current_date(),
+    }
+
+    async with aiosqlite.connect(DB_PATH) as db:
+        rows = await _execute(
+            db,
+            f"""
+            SELECT code FROM (
+                SELECT COALESCE(currency, :previous) AS code
+                FROM expenses WHERE user_id = :user_id
+                UNION SELECT COALESCE(currency, :previous)
+                FROM savings WHERE user_id = :user_id
+                UNION SELECT COALESCE(currency, :previous)
+                FROM subscriptions WHERE user_id = :user_id
+                UNION SELECT :previous
+                UNION SELECT :currency
+            )
+            WHERE code != '{FX_BASE_CURRENCY}'
+                AND code NOT IN (SELECT currency FROM fx_rates)
+            ORDER BY code
+            """,
+            parameters,
+            fetch="all",
+        )
+        missing = [row[0] for row in rows]
+        if missing:
+            return missing
+
+        if currency != previous:
+            # The right-hand sides all see the row as it was before the update.
+            for table in ("expenses", "savings", "subscriptions"):
+                entered = f"COALESCE({table}.currency, :previous)"
+                await _execute(
+                    db,
+                    f"""
+                    UPDATE {table} SET
+                        amount = round(
+                            COALESCE(original_amount, amount)
+                            * {_rate(":currency", f"{table}.date")}
+                            / {_rate(entered, f"{table}.date")},
+                            2
+                        ),
+                        original_amount = COALESCE(original_amount, amount),
+                        currency = COALESCE(currency, :previous)
+                    WHERE user_id = :user_id
+                    """,
+                    parameters,
+                )
+            await _execute(
+                db,
+                f"""
+                UPDATE budgets SET amount = round(
+                    amount * {_rate(":currency", ":today")}
+                    / {_rate(":previous", ":today")},
+                    2
+                )
+                WHERE user_id = :user_id
+                """,
+                parameters,
+            )
+
+        await _execute(
+            db,
+            "INSERT INTO user_settings (user_id, currency) VALUES (?, ?) "
+            "ON CONFLICT (user_id) DO UPDATE SET currency = excluded.currency",
+            (user_id, currency),
+        )
+        await db.commit()
+
+    _cache_user_settings(user_id, settings._replace(currency=currency))
+    return []
+
+
+@timed(DB_QUERY_LATENCY)
+async def add_expense(
+    user_id: int,
+    category: str,
+    amount: float,
+    currency: Optional[str] = None,
+    original_amount: Optional[float] = None,
+) -> int:
+    """Inserts an expense and returns its ID.
+
+    ``amount`` is in the home currency; ``original_amount`` is what was
+    entered in ``currency``, if that was a different one.
+    """
     async with aiosqlite.connect(DB_PATH) as db:
         date = get_current_date()
-        await db.execute(
-            "INSERT INTO expenses (user_id, category, amount,  date) VALUES (?, ?, ?, ?)",
-            (user_id, category, amount, date),
+        cursor = await _execute(
+            db,
+            "INSERT INTO expenses "
+            "(user_id, category, amount, date, currency, original_amount) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                user_id,
+                category,
+                amount,
+                date,
+                currency or current_currency(),
+                amount if original_amount is None else original_amount,
+            ),
+        )
+        await db.commit()
+        return cursor.lastrowid
+
+
+@timed(DB_QUERY_LATENCY)
+async def get_budget_progress(
+    user_id: int, category: str
+) -> Optional[tuple[float, float]]:
+    """Returns this month's ``(total, budget)`` for a budgeted category."""
+    async with aiosqlite.connect(DB_PATH) as db:
+        return await _execute(
+            db,
+            "SELECT COALESCE(r.total, 0), b.amount FROM budgets b "
+            "LEFT JOIN expense_rollups r ON r.user_id = b.user_id "
+            "AND r.month = ? AND r.category = b.category "
+            "WHERE b.user_id = ? AND b.category = ?",
+            (get_current_date()[:7], user_id, category),
+            fetch="one",
+        )
+
+
+@timed(DB_QUERY_LATENCY)
+async def get_category_stats(
+    user_id: int, category: str
+) -> Optional[tuple[int, float, float]]:
+    """Returns the ``(count, mean, m2)`` of a user's expenses in a category."""
+    async with aiosqlite.connect(DB_PATH) as db:
+        return await _execute(
+            db,
+            "SELECT count, mean, m2 FROM category_stats "
+            "WHERE user_id = ? AND category = ?",
+            (user_id, category),
+            fetch="one",
+        )
+
+
+@timed(DB_QUERY_LATENCY)
+async def get_budgets(user_id: int):
+    """Returns ``(category, budget, spent this month)`` for every budget."""
+    async with aiosqlite.connect(DB_PATH) as db:
+        return await _execute(
+            db,
+            "SELECT b.category, b.amount, COALESCE(r.total, 0) FROM budgets b "
+            "LEFT JOIN expense_rollups r ON r.user_id = b.user_id "
+            "AND r.month = ? AND r.category = b.category "
+            "WHERE b.user_id = ? ORDER BY b.category",
+            (get_current_date()[:7], user_id),
+            fetch="all",
+        )
+
+
+@timed(DB_QUERY_LATENCY)
+async def set_budget(user_id: int, category: str, amount: float):
+    async with aiosqlite.connect(DB_PATH) as db:
+        await _execute(
+            db,
+            "INSERT INTO budgets (user_id, category, amount) VALUES (?, ?, ?) "
+            "ON CONFLICT (user_id, category) DO UPDATE SET amount = excluded.amount",
+            (user_id, category, amount),
+        )
+        await db.commit()
+
+
+@timed(DB_QUERY_LATENCY)
+async def remove_budget(user_id: int, category: str) -> bool:
+    async with aiosqlite.connect(DB_PATH) as db:
+        cursor = await _execute(
+            db,
+            "DELETE FROM budgets WHERE user_id = ? AND category = ?",
+            (user_id, category),
         )
         await db.commit()
+        return cursor.rowcount > 0
 
 
+@timed(DB_QUERY_LATENCY)
+async def get_recent_expenses(user_id: int, limit: int = 5):
+    """Returns the last ``limit`` added ``(id, category, amount, date)`` rows."""
+    async with aiosqlite.connect(DB_PATH) as db:
+        return await _execute(
+            db,
+            "SELECT id, category, amount, date FROM expenses WHERE user_id = ? "
+            "ORDER BY id DESC LIMIT ?",
+            (user_id, limit),
+            fetch="all",
+        )
+
+
+@timed(DB_QUERY_LATENCY)
+async def get_expense(user_id: int, expense_id: int):
+    async with aiosqlite.connect(DB_PATH) as db:
+        return await _execute(
+            db,
+            "SELECT category, amount, date FROM expenses WHERE id = ? AND user_id = ?",
+            (expense_id, user_id),
+            fetch="one",
+        )
+
+
+@timed(DB_QUERY_LATENCY)
+async def update_expense_amount(user_id: int, expense_id: int, amount: float):
+    """Changes an expense's amount and returns its ``(category, amount, date)``."""
+    async with aiosqlite.connect(DB_PATH) as db:
+        row = await _execute(
+            db,
+            "UPDATE expenses SET amount = ?, original_amount = ?, currency = ? "
+            "WHERE id = ? AND user_id = ? RETURNING category, amount, date",
+            (amount, amount, current_currency(), expense_id, user_id),
+            fetch="one",
+        )
+        await db.commit()
+        return row
+
+
+@timed(DB_QUERY_LATENCY)
+async def delete_expense(user_id: int, expense_id: int):
+    """Deletes an expense and returns its ``(category, amount, date)``."""
+    async with aiosqlite.connect(DB_PATH) as db:
+        row = await _execute(
+            db,
+            "DELETE FROM expenses WHERE id = ? AND user_id = ? "
+            "RETURNING category, amount, date",
+            (expense_id, user_id),
+            fetch="one",
+        )
+        await db.commit()
+        return row
+
+
+@timed(DB_QUERY_LATENCY)
+async def add_expenses(user_id: int, entries: list[tuple[str, float, str, float]]):
+    """Inserts every ``(category, amount, currency, original_amount)`` entry
+    in a single transaction."""
+    date = get_current_date()
+
+    async with aiosqlite.connect(DB_PATH) as db:
+        await _executemany(
+            db,
+            "INSERT INTO expenses "
+            "(user_id, category, amount, date, currency, original_amount) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (user_id, category, amount, date, currency, original_amount)
+                for category, amount, currency, original_amount in entries
+            ],
+        )
+        await db.commit()
+
+
+@timed(DB_QUERY_LATENCY)
 async def add_new_subscription(user_id: int, name: str, amount: float):
     async with aiosqlite.connect(DB_PATH) as db:
         date = get_current_date()
-        await db.execute(
-            "INSERT INTO subscriptions (user_id, name, amount, count, is_active, date) VALUES (?, ?, ?, ?, ?, ?)",
-            (user_id, name, amount, 1, 1, date),
+        await _execute(
+            db,
+            "INSERT INTO subscriptions (user_id, name, amount, count, is_active, date, "
+            "currency, original_amount) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (user_id, name, amount, 1, 1, date, current_currency(), amount),
         )
         await db.commit()
 
 
-async def disable_month_subscription(user_id: int, name: str):
+@timed(DB_QUERY_LATENCY)
+async def disable_month_subscription(
+    user_id: int, subscription_id: int
+) -> Optional[str]:
+    """Deactivates a subscription by ID and returns its name."""
     async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "UPDATE subscriptions SET is_active = ? WHERE user_id = ? AND name = ?",
-            (0, user_id, name),
+        row = await _execute(
+            db,
+            "UPDATE subscriptions SET is_active = ? WHERE id = ? AND user_id = ? "
+            "RETURNING name",
+            (0, subscription_id, user_id),
+            fetch="one",
         )
         await db.commit()
+        return row[0] if row else None
 
 
-async def enable_month_subscription(user_id: int, name: str):
+@timed(DB_QUERY_LATENCY)
+async def enable_month_subscription(
+    user_id: int, subscription_id: int
+) -> Optional[str]:
+    """Reactivates a subscription by ID and returns its name."""
     async with aiosqlite.connect(DB_PATH) as db:
-        current_date = get_current_date()
-        await db.execute(
+        periods = current_periods()
+        row = await _execute(
+            db,
             """
             UPDATE subscriptions
             SET is_active = 1,
-                count = CASE
-                    WHEN strftime('%Y-%m', date) < strftime('%Y-%m', 'now') THEN count + 1
-                    ELSE count
-                END,
-                date = CASE
-                    WHEN strftime('%Y-%m', date) < strftime('%Y-%m', 'now') THEN ?
-                    ELSE date
-                END
-            WHERE user_id = ? AND name = ?
+                count = CASE WHEN date < ? THEN count + 1 ELSE count END,
+                date = CASE WHEN date < ? THEN ? ELSE date END
+            WHERE id = ? AND user_id = ?
+            RETURNING name
             """,
-            (current_date, user_id, name),
+            (
+                periods.month_start,
+                periods.month_start,
+                periods.today,
+                subscription_id,
+                user_id,
+            ),
+            fetch="one",
         )
         await db.commit()
+        return row[0] if row else None
 
 
+@timed(DB_QUERY_LATENCY)
 async def add_saving(user_id: int, amount: float):
     async with aiosqlite.connect(DB_PATH) as db:
         date = get_current_date()
-        await db.execute(
-            "INSERT INTO savings (user_id, amount, date) VALUES (?, ?, ?)",
-            (user_id, amount, date),
+        await _execute(
+            db,
+            "INSERT INTO savings (user_id, amount, date, currency, original_amount) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (user_id, amount, date, current_currency(), amount),
         )
         await db.commit()
 
 
+@timed(DB_QUERY_LATENCY)
 async def get_all_categories_and_values(user_id: int):
+    periods = current_periods()
     async with aiosqlite.connect(DB_PATH) as db:
         cursor = await db.cursor()
-        await cursor.execute(
+        return await _execute(
+            cursor,
             """
             SELECT category, SUM(amount) as total
             FROM expenses
-            WHERE user_id = ? AND strftime('%Y-%m', date) = strftime('%Y-%m', 'now')
+            WHERE user_id = ? AND date >= ? AND date < ?
             GROUP BY category
             ORDER BY total DESC
             """,
-            (user_id,),
+            (user_id, periods.month_start, periods.month_end),
+            fetch="all",
         )
-        return await cursor.fetchall()
 
 
+@timed(DB_QUERY_LATENCY)
+async def get_monthly_category_totals(user_id: int, months: list[str]):
+    year, month = map(int, months[-1].split("-"))
+    end = f"{year + month // 12:04d}-{month % 12 + 1:02d}-01"
+
+    async with aiosqlite.connect(DB_PATH) as db:
+        cursor = await db.cursor()
+        return await _execute(
+            cursor,
+            """
+            SELECT strftime('%Y-%m', date) AS month, category, SUM(amount) AS total
+            FROM expenses
+            WHERE user_id = ? AND date >= ? AND date < ?
+            GROUP BY user_id, month, category
+            """,
+            (user_id, f"{months[0]}-01", end),
+            fetch="all",
+        )
+
+
+@timed(DB_QUERY_LATENCY)
+async def get_daily_expenses(user_id: int, year: int):
+    async with aiosqlite.connect(DB_PATH) as db:
+        cursor = await db.cursor()
+        return await _execute(
+            cursor,
+            """
+            SELECT CAST(strftime('%j', date) AS INTEGER) - 1 AS day, amount
+            FROM expenses
+            WHERE user_id = ? AND date >= ? AND date < ?
+            """,
+            (user_id, f"{year:04d}-01-01", f"{year + 1:04d}-01-01"),
+            fetch="all",
+        )
+
+
+@timed(DB_QUERY_LATENCY)
+async def get_expenses_page(
+    user_id: int,
+    category: Optional[str] = None,
+    start_date: Optional[str] = None,
+    cursor: Optional[tuple[str, int]] = None,
+    backwards: bool = False,
+    limit: int = 11,
+):
+    """Returns ``(id, category, amount, date)`` rows, newest first.
+
+    ``cursor`` is the ``(date, id)`` of the row the page starts after; going
+    ``backwards`` rows are newer than the cursor, nearest first. Pages seek on
+    the (user_id, date) index, whose implicit rowid suffix makes the key
+    unique, so a page deep in the history costs the same as the first one.
+    """
+    query = "SELECT id, category, amount, date FROM expenses WHERE user_id = ?"
+    parameters: list = [user_id]
+
+    if category is not None:
+        query += " AND category = ?"
+        parameters.append(category)
+    if start_date is not None:
+        query += " AND date >= ?"
+        parameters.append(start_date)
+    if cursor is not None:
+        query += " AND (date, id) > (?, ?)" if backwards else " AND (date, id) < (?, ?)"
+        parameters.extend(cursor)
+
+    order = "ASC" if backwards else "DESC"
+    query += f" ORDER BY date {order}, id {order} LIMIT ?"
+    parameters.append(limit)
+
+    async with aiosqlite.connect(DB_PATH) as db:
+        return await _execute(db, query, tuple(parameters), fetch="all")
+
+
+@timed(DB_QUERY_LATENCY)
+async def get_daily_category_totals(user_id: int, start_date: str, end_date: str):
+    """Returns ``(month, day, category, total)`` rows in ``[start, end)``."""
+    async with aiosqlite.connect(DB_PATH) as db:
+        return await _execute(
+            db,
+            """
+            SELECT substr(date, 1, 7) AS month,
+                CAST(substr(date, 9, 2) AS INTEGER) AS day,
+                category,
+                SUM(amount)
+            FROM expenses
+            WHERE user_id = ? AND date >= ? AND date < ?
+            GROUP BY month, day, category
+            """,
+            (user_id, start_date, end_date),
+            fetch="all",
+        )
+
+
+@timed(DB_QUERY_LATENCY)
 async def get_year_expenses(user_id: int):
+    periods = current_periods()
     async with aiosqlite.connect(DB_PATH) as db:
         cursor = await db.cursor()
-        await cursor.execute(
+        result = await _execute(
+            cursor,
             """
             SELECT SUM(total_amount) FROM (
                 SELECT SUM(amount) AS total_amount
                 FROM expenses
-                WHERE user_id = ? AND strftime('%Y', date) = strftime('%Y', 'now')
+                WHERE user_id = ? AND date >= ? AND date < ?
                 UNION ALL
                 SELECT SUM(amount*count) AS total_amount
                 FROM subscriptions
-                WHERE user_id = ? AND amount > 0 AND strftime('%Y', date) = strftime('%Y', 'now')
+                WHERE user_id = ? AND amount > 0 AND date >= ? AND date < ?
             )
             """,
             (
                 user_id,
+                periods.year_start,
+                periods.year_end,
                 user_id,
+                periods.year_start,
+                periods.year_end,
             ),
+            fetch="one",
         )
-        result = await cursor.fetchone()
         return result[0] if result[0] else 0.0
 
 
+@timed(DB_QUERY_LATENCY)
 async def get_subscriptions_breakdown(user_id: int, is_active: bool, time_filter: bool):
     async with aiosqlite.connect(DB_PATH) as db:
-        base_query = "SELECT name, SUM(amount) AS total FROM subscriptions WHERE user_id = ? AND is_active = ?"
+        base_query = "SELECT name, SUM(amount) AS total FROM subscriptions WHERE user_id = ? AND is_active = ? "
         grouping = "GROUP BY name ORDER BY total DESC"
-        month_filter = "AND strftime('%Y-%m', date) = strftime('%Y-%m', 'now')"
+        month_filter = "AND date >= ? AND date < ? "
 
         query = base_query
+        parameters: tuple = (user_id, is_active)
 
         if time_filter:
+            periods = current_periods()
             query += month_filter
+            parameters += (periods.month_start, periods.month_end)
         query += grouping
 
-        cursor = await db.execute(query, (user_id, is_active))
-        return await cursor.fetchall()
+        return await _execute(db, query, parameters, fetch="all")
+
+
+@timed(DB_QUERY_LATENCY)
+async def get_subscriptions_page(
+    user_id: int,
+    is_active: bool,
+    time_filter: bool,
+    cursor_id: int = 0,
+    backwards: bool = False,
+    limit: int = 10,
+):
+    """Returns up to ``limit`` ``(id, name)`` rows after (or before) ``cursor_id``.
+
+    Pages are keyed on the subscription ID, so each one is an index range
+    scan no matter how deep the user pages.
+    """
+    query = "SELECT id, name FROM subscriptions WHERE user_id = ? AND is_active = ? "
+    parameters: tuple = (user_id, is_active)
+    if time_filter:
+        periods = current_periods()
+        query += "AND date >= ? AND date < ? "
+        parameters += (periods.month_start, periods.month_end)
+    if backwards:
+        query += "AND id < ? ORDER BY id DESC LIMIT ?"
+    else:
+        query += "AND id > ? ORDER BY id LIMIT ?"
+
+    async with aiosqlite.connect(DB_PATH) as db:
+        return await _execute(db, query, (*parameters, cursor_id, limit), fetch="all")
 
 
+@timed(DB_QUERY_LATENCY)
 async def get_month_subscriptions_expenses(user_id: int):
+    periods = current_periods()
     async with aiosqlite.connect(DB_PATH) as db:
         cursor = await db.cursor()
-        await cursor.execute(
+        result = await _execute(
+            cursor,
             """
         SELECT SUM(amount)
         FROM subscriptions
-        WHERE user_id = ? AND is_active = 1 AND strftime('%Y-%m', date) = strftime('%Y-%m', 'now')
+        WHERE user_id = ? AND is_active = 1 AND date >= ? AND date < ?
         """,
-            (user_id,),
+            (user_id, periods.month_start, periods.month_end),
+            fetch="one",
         )
-        result = await cursor.fetchone()
         return result[0] if result[0] else 0.0
 
 
+@timed(DB_QUERY_LATENCY)
 async def get_month_total_expenses(user_id: int):
+    periods = current_periods()
     async with aiosqlite.connect(DB_PATH) as db:
         cursor = await db.cursor()
-        await cursor.execute(
+        result = await _execute(
+            cursor,
             """
         SELECT SUM(total_amount) FROM (
             SELECT SUM(amount) AS total_amount
             FROM expenses
-            WHERE user_id = ? AND strftime('%Y-%m', date) = strftime('%Y-%m', 'now')
+            WHERE user_id = ? AND date >= ? AND date < ?
             UNION ALL
             SELECT SUM(amount) AS total_amount
             FROM subscriptions
-            WHERE user_id = ? AND strftime('%Y-%m', date) = strftime('%Y-%m', 'now')
+            WHERE user_id = ? AND date >= ? AND date < ?
         )
         """,
-            (user_id, user_id),
+            (
+                user_id,
+                periods.month_start,
+                periods.month_end,
+                user_id,
+                periods.month_start,
+                periods.month_end,
+            ),
+            fetch="one",
         )
-        result = await cursor.fetchone()
         return result[0] if result[0] else 0.0
 
 
+@timed(DB_QUERY_LATENCY)
 async def get_savings(user_id: int, is_month_saving: bool):
     async with aiosqlite.connect(DB_PATH) as db:
         cursor = await db.cursor()
-        body = "SELECT SUM(amount) FROM savings WHERE user_id = ? "
-        month_savings = "AND strftime('%Y-%m', date) = strftime('%Y-%m', 'now')"
-        year_savings = "AND strftime('%Y', date) = strftime('%Y', 'now')"
-
-        query = body + month_savings if is_month_saving else body + year_savings
-        await cursor.execute(query, (user_id,))
+        periods = current_periods()
+        query = (
+            "SELECT SUM(amount) FROM savings "
+            "WHERE user_id = ? AND date >= ? AND date < ?"
+        )
 
-        result = await cursor.fetchone()
+        if is_month_saving:
+            bounds = (periods.month_start, periods.month_end)
+        else:
+            bounds = (periods.year_start, periods.year_end)
+        result = await _execute(cursor, query, (user_id, *bounds), fetch="one")
         return result[0] if result[0] else 0.0
 
 
+@timed(DB_QUERY_LATENCY)
+async def get_user_timezones() -> list[str]:
+    """Returns every time zone a user has chosen, besides DEFAULT_TIMEZONE."""
+    async with aiosqlite.connect(DB_PATH) as db:
+        rows = await _execute(
+            db,
+            "SELECT DISTINCT timezone FROM user_settings WHERE timezone IS NOT NULL",
+            fetch="all",
+        )
+
+    return [row[0] for row in rows]
+
+
+@timed(DB_QUERY_LATENCY)
 async def renew_active_subscriptions():
-    date = get_current_date()
+    """Renews active subscriptions whose owner's month has rolled over.
+
+    Runs once per time zone in use, so each user's subscriptions renew when
+    the month starts for them rather than in UTC.
+    """
+    timezones = await get_user_timezones()
 
     async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
+        periods = get_periods()
+        await _execute(
+            db,
             """
             UPDATE subscriptions
             SET count = count + 1, date = ?
-            WHERE is_active = 1
-            AND strftime('%Y-%m', date) < strftime('%Y-%m', 'now')
+            WHERE is_active = 1 AND date < ?
+            AND user_id NOT IN (
+                SELECT user_id FROM user_settings WHERE timezone IS NOT NULL
+            )
             """,
-            (date,),
+            (periods.today, periods.month_start),
         )
 
+        for timezone in timezones:
+            periods = get_periods(timezone)
+            await _execute(
+                db,
+                """
+                UPDATE subscriptions
+                SET count = count + 1, date = ?
+                WHERE is_active = 1 AND date < ?
+                AND user_id IN (SELECT user_id FROM user_settings WHERE timezone = ?)
+                """,
+                (periods.today, periods.month_start, timezone),
+            )
+
         await db.commit()
 
 
+async def iter_month_summaries(timezone: Optional[str] = None, chunk_size: int = 1000):
+    """Yields chunks of ``(user_id, currency, [(category, current, previous), ...])``.
+
+    Covers the users in ``timezone``, or those without one for None, with
+    months as they fall there. "current" is the month that just ended and
+    "previous" the one before it; "currency" is the user's home currency, or
+    None for DEFAULT_CURRENCY. Every chunk of users costs one grouped query,
+    however many users it holds.
+    """
+    end = get_periods(timezone).month_start
+    current = datetime.strptime(end, "%Y-%m-%d") - timedelta(days=1)
+    current_start = current.strftime("%Y-%m-01")
+    previous = current.replace(day=1) - timedelta(days=1)
+    previous_start = previous.strftime("%Y-%m-01")
+
+    last_user_id = -1
+
+    async with aiosqlite.connect(DB_PATH) as db:
+        while True:
+            start = time.perf_counter()
+            rows = await _execute(
+                db,
+                """
+                WITH chunk AS (
+                    SELECT DISTINCT user_id
+                    FROM expenses
+                    LEFT JOIN user_settings USING (user_id)
+                    WHERE user_id > ? AND date >= ? AND date < ?
+                    AND user_settings.timezone IS ?
+                    ORDER BY user_id
+                    LIMIT ?
+                )
+                SELECT
+                    user_id,
+                    user_settings.currency,
+                    category,
+                    SUM(CASE WHEN date >= ? THEN amount ELSE 0 END) AS current,
+                    SUM(CASE WHEN date < ? THEN amount ELSE 0 END) AS previous
+                FROM expenses
+                JOIN chunk USING (user_id)
+                LEFT JOIN user_settings USING (user_id)
+                WHERE date >= ? AND date < ?
+                GROUP BY user_id, category
+                ORDER BY user_id, current DESC
+                """,
+                (
+                    last_user_id,
+                    previous_start,
+                    end,
+                    timezone,
+                    chunk_size,
+                    current_start,
+                    current_start,
+                    previous_start,
+                    end,
+                ),
+                fetch="all",
+            )
+            # Timed per chunk; the consumer's sends between chunks do not count.
+            DB_QUERY_LATENCY.observe(
+                "iter_month_summaries", time.perf_counter() - start
+            )
+
+            if not rows:
+                return
+
+            summaries = []
+            for user_id, currency, category, current, previous in rows:
+                if not summaries or summaries[-1][0] != user_id:
+                    summaries.append((user_id, currency, []))
+                summaries[-1][2].append((category, current, previous))
+
+            last_user_id = summaries[-1][0]
+            yield summaries
+
+
+@timed(DB_QUERY_LATENCY)
 async def get_dataframes(user_id: int, is_all_time_report: bool):
     try:
         with sqlite3.connect(DB_PATH) as connector:
             select_statement = "SELECT * FROM "
             where_user_id = " WHERE user_id = ?"
 
-            filter_current_month = (
-                "AND strftime('%Y-%m', date) = strftime('%Y-%m', 'now')"
-            )
+            filter_current_month = " AND date >= ? AND date < ?"
+            periods = current_periods()
 
             dataframes = {}
 
             tables = ["expenses", "savings", "subscriptions"]
 
             for table in tables:
-                query = (
-                    select_statement + table + where_user_id
-                    if is_all_time_report
-                    else select_statement + table + where_user_id + filter_current_month
-                )
-                dataframes[table] = pd.read_sql(query, connector, params=(user_id,))
+                if is_all_time_report:
+                    query = select_statement + table + where_user_id
+                    params: tuple = (user_id,)
+                else:
+                    query = (
+                        select_statement + table + where_user_id + filter_current_month
+                    )
+                    params = (user_id, periods.month_start, periods.month_end)
+                dataframes[table] = await _read_sql(connector, query, params)
 
             result = await format_dataframes(dataframes)
             return result
@@ -274,7 +1332,10 @@ async def get_dataframes(user_id: int, is_all_time_report: bool):
         raise
 
 
+@timed(REPORT_BUILD_LATENCY)
 async def format_dataframes(dataframes: dict):
+    import pandas as pd
+
     formatted = {}
 
     for table_name, df in dataframes.items():
@@ -282,13 +1343,21 @@ async def format_dataframes(dataframes: dict):
         if "date" in df.columns:
             df["date"] = pd.to_datetime(df["date"]).dt.strftime("%d %B %Y")
 
-        df = df.rename(columns=COLUMN_NAMES)
+        df = df.rename(
+            columns={
+                column: name.format(symbol=currency_symbol().strip())
+                for column, name in COLUMN_NAMES.items()
+            }
+        )
         formatted[table_name] = df
 
     return formatted
 
 
+@timed(REPORT_BUILD_LATENCY)
 async def create_report(user_id: int, is_all_time_report: bool):
+    import pandas as pd
+
     logger.info("Creating report")
 
     os.makedirs("reports", exist_ok=True)
@@ -0,0 +1,170 @@
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Mapping, Optional
+
+import aiosqlite
+from aiogram import BaseMiddleware
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.types import TelegramObject
+
+from sql import DB_PATH
+
+logger = logging.getLogger(__name__)
+
+MAX_CACHED_RECORDS = 10_000
+
+
+class SQLiteStorage(BaseStorage):
+    """FSM storage backed by the ``fsm_state`` table.
+
+    Records are cached in memory after the first read, so lookups for recent
+    users never touch the database twice; the least recently used clean
+    records are dropped past ``max_size``. Writes only mark a record dirty;
+    ``flush()`` persists every dirty record in one transaction and is called
+    once per update by ``FSMFlushMiddleware``.
+    """
+
+    def __init__(
+        self, db_path: Optional[str] = None, max_size: int = MAX_CACHED_RECORDS
+    ):
+        self.db_path = db_path or DB_PATH
+        self.max_size = max_size
+        self._cache: OrderedDict[str, list] = OrderedDict()
+        self._dirty: set[str] = set()
+        self._flushing: set[str] = set()
+        self._flush_lock = asyncio.Lock()
+
+    @staticmethod
+    def build_key(key: StorageKey) -> str:
+        return ":".join(
+            str(part) if part is not None else ""
+            for part in (
+                key.bot_id,
+                key.chat_id,
+                key.user_id,
+                key.thread_id,
+                key.business_connection_id,
+                key.destiny,
+            )
+        )
+
+    async def _get_record(self, key: StorageKey) -> tuple[str, list]:
+        record_key = self.build_key(key)
+        record = self._cache.get(record_key)
+
+        if record is None:
+            async with aiosqlite.connect(self.db_path) as db:
+                cursor = await db.execute(
+                    "SELECT state, data FROM fsm_state WHERE key = ?", (record_key,)
+                )
+                row = await cursor.fetchone()
+
+            loaded = [row[0], json.loads(row[1])] if row else [None, {}]
+            # A write may have landed while we were reading; it wins.
+            record = self._cache.setdefault(record_key, loaded)
+            self._evict()
+
+        self._cache.move_to_end(record_key)
+        return record_key, record
+
+    def _evict(self):
+        """Drops the least recently used records that have nothing to flush."""
+        unsaved = self._dirty | self._flushing
+        excess = len(self._cache) - self.max_size
+
+        for record_key in list(self._cache):
+            if excess <= 0:
+                break
+            if record_key not in unsaved:
+                del self._cache[record_key]
+                excess -= 1
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record_key, record = await self._get_record(key)
+        record[0] = state.state if isinstance(state, State) else state
+        self._dirty.add(record_key)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        _, record = await self._get_record(key)
+        return record[0]
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(
+                f"Data must be a dict or dict-like object, got {type(data).__name__}"
+            )
+
+        record_key, record = await self._get_record(key)
+        record[1] = data.copy()
+        self._dirty.add(record_key)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        _, record = await self._get_record(key)
+        return record[1].copy()
+
+    async def flush(self):
+        if not self._dirty:
+            return
+
+        async with self._flush_lock:
+            keys, self._dirty = self._dirty, set()
+            self._flushing = keys
+            upserts = []
+            deletes = []
+
+            for record_key in keys:
+                state, data = self._cache[record_key]
+                if state is None and not data:
+                    deletes.append((record_key,))
+                else:
+                    upserts.append((record_key, state, json.dumps(data)))
+
+            try:
+                async with aiosqlite.connect(self.db_path) as db:
+                    if upserts:
+                        await db.executemany(
+                            """
+                            INSERT INTO fsm_state (key, state, data) VALUES (?, ?, ?)
+                            ON CONFLICT(key) DO UPDATE
+                            SET state = excluded.state, data = excluded.data
+                            """,
+                            upserts,
+                        )
+                    if deletes:
+                        await db.executemany(
+                            "DELETE FROM fsm_state WHERE key = ?", deletes
+                        )
+                    await db.commit()
+
+            except Exception as e:
+                self._dirty |= keys
+                logger.error(f"Error in SQLiteStorage.flush: {e}")
+                raise
+
+            finally:
+                self._flushing = set()
+
+    async def close(self) -> None:
+        await self.flush()
+
+
+class FSMFlushMiddleware(BaseMiddleware):
+    """Coalesces every FSM write made while handling an update into one flush."""
+
+    def __init__(self, storage: SQLiteStorage):
+        self.storage = storage
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        try:
+            return await handler(event, data)
+        finally:
+            await self.storage.flush()
@@ -0,0 +1,99 @@
+import time
+from unittest.mock import patch
+
+import pytest
+
+from forecast import ForecastCache, build_model, forecast_month, project
+
+MONTHS = ["2024-01", "2024-02"]
+
+
+class TestModel:
+    def test_shape_is_the_average_share_spent_by_each_day(self):
+        rows = [
+            ("2024-01", 1, "🍎 Groceries", 10.0),
+            ("2024-01", 20, "🍎 Groceries", 30.0),
+            ("2024-02", 10, "🍎 Groceries", 20.0),
+        ]
+
+        model = build_model(rows, MONTHS)
+        row = model.categories["🍎 Groceries"]
+
+        assert model.shape[row, 0] == pytest.approx(0.125)
+        assert model.shape[row, 9] == pytest.approx(0.625)
+        assert model.shape[row, 30] == pytest.approx(1.0)
+        assert model.average[row] == pytest.approx(30.0)
+        assert model.months[row] == 2
+
+    def test_projection_blends_run_rate_with_history(self):
+        rows = [("2024-01", day, "🍎 Groceries", 1.0) for day in range(1, 31)]
+        model = build_model(rows, MONTHS)
+
+        projection = project(model, {"🍎 Groceries": 20.0}, 10, 30)
+
+        # Run rate: 60; history still expects 20 after day 10, so 40.
+        assert projection["🍎 Groceries"] == pytest.approx(0.5 * 40 + 0.5 * 60)
+
+    def test_categories_without_history_use_the_run_rate(self):
+        model = build_model([], MONTHS)
+
+        projection = project(model, {"🎁 Gifts": 10.0}, 5, 30)
+
+        assert projection == {"🎁 Gifts": pytest.approx(60.0)}
+
+    def test_projection_never_drops_below_spent(self):
+        rows = [("2024-01", 1, "🍎 Groceries", 5.0)]
+        model = build_model(rows, MONTHS)
+
+        projection = project(model, {"🍎 Groceries": 50.0}, 28, 28)
+
+        assert projection["🍎 Groceries"] == pytest.approx(50.0)
+
+
+@pytest.mark.asyncio
+class TestForecastCache:
+    async def test_model_is_loaded_once_per_month(self):
+        cache = ForecastCache()
+        rows = [("2024-01", 1, "🍎 Groceries", 5.0)]
+
+        with patch(
+            "forecast.get_daily_category_totals", return_value=rows
+        ) as mock_totals:
+            first = await cache.get(123, ["2024-01", "2024-02"])
+            second = await cache.get(123, ["2024-01", "2024-02"])
+            await cache.get(123, ["2024-02", "2024-03"])
+
+        assert first is second
+        assert mock_totals.call_count == 2
+        mock_totals.assert_any_call(123, "2024-01-01", "2024-02-01")
+
+    async def test_evicts_least_recently_used_models(self):
+        cache = ForecastCache(max_size=1)
+
+        with patch("forecast.get_daily_category_totals", return_value=[]):
+            await cache.get(1, MONTHS)
+            await cache.get(2, MONTHS)
+
+        assert list(cache._models) == [2]
+
+    async def test_cached_forecast_is_under_a_millisecond(self):
+        rows = [
+            (month, day, f"category {index}", 1.0)
+            for month in ["2024-01", "2024-02", "2024-03"]
+            for day in range(1, 29)
+            for index in range(12)
+        ]
+        spent = {f"category {index}": 10.0 for index in range(12)}
+
+        with patch("forecast.get_daily_category_totals", return_value=rows):
+            await forecast_month(123, spent)
+
+            iterations = 1_000
+            start = time.perf_counter()
+            for _ in range(iterations):
+                total, projections = await forecast_month(123, spent, 9.99)
+            elapsed = time.perf_counter() - start
+
+        assert len(projections) == 12
+        assert total > sum(spent.values())
+        assert elapsed / iterations < 1e-3
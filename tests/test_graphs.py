@@ -1,9 +1,22 @@
 from unittest.mock import AsyncMock, MagicMock, patch
 
+import numpy as np
 import pytest
 
 from constants import NO_DATA_GRAPH_VALUE
-from graphs import call_graph_creator, create_graph_async, create_graph_sync
+from graphs import (
+    RENDER_WORKERS,
+    build_heatmap_grid,
+    build_trend_matrix,
+    call_graph_creator,
+    call_heatmap_creator,
+    call_trends_creator,
+    create_graph_async,
+    create_graph_sync,
+    create_heatmap_sync,
+    create_trends_graph_sync,
+    warm_up_renderer,
+)
 
 
 class TestGraphs:
@@ -13,7 +26,7 @@ class TestGraphs:
         graph_name = "test_graph.png"
 
         with patch("graphs.os.makedirs"):
-            with patch("graphs.plt.savefig") as mock_save:
+            with patch("matplotlib.figure.Figure.savefig") as mock_save:
                 result = create_graph_sync(categories, values, graph_name)
                 assert result == f"graphs/{graph_name}"
                 mock_save.assert_called_once()
@@ -24,7 +37,10 @@ class TestGraphs:
         graph_name = "test.png"
 
         with patch("graphs.os.makedirs"):
-            with patch("graphs.plt.figure", side_effect=Exception("Test error")):
+            with patch(
+                "matplotlib.figure.Figure.add_subplot",
+                side_effect=Exception("Test error"),
+            ):
                 with pytest.raises(Exception):
                     create_graph_sync(categories, values, graph_name)
 
@@ -56,6 +72,52 @@ class TestGraphs:
             with pytest.raises(Exception):
                 await create_graph_async(categories, values)
 
+    @pytest.mark.asyncio
+    async def test_warm_up_renderer_renders_on_every_worker(self):
+        with patch("graphs._warm_up_sync") as mock_warm_up:
+            await warm_up_renderer()
+
+            assert mock_warm_up.call_count == RENDER_WORKERS
+
+    @pytest.mark.asyncio
+    async def test_warm_up_renderer_removes_graphs(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+
+        await warm_up_renderer()
+
+        assert list((tmp_path / "graphs").iterdir()) == []
+
+    def test_renderers_do_not_use_pyplot(self, tmp_path, monkeypatch):
+        import matplotlib.pyplot as plt
+
+        monkeypatch.chdir(tmp_path)
+
+        with (
+            patch.object(plt, "figure", side_effect=AssertionError("pyplot")),
+            patch.object(plt, "subplots", side_effect=AssertionError("pyplot")),
+        ):
+            create_graph_sync(["Food"], [10.0], "pie.png")
+            create_trends_graph_sync(
+                ["2026-01"], ["Food"], np.array([[10.0]]), "trends.png"
+            )
+            create_heatmap_sync([(0, 3.0)], 2026, "heatmap.png")
+
+        assert {path.name for path in (tmp_path / "graphs").iterdir()} == {
+            "pie.png",
+            "trends.png",
+            "heatmap.png",
+        }
+
+    @pytest.mark.asyncio
+    async def test_warm_up_renderer_logs_errors(self):
+        with (
+            patch("graphs._warm_up_sync", side_effect=Exception("Test error")),
+            patch("graphs.logger") as mock_logger,
+        ):
+            await warm_up_renderer()
+
+            mock_logger.error.assert_called_once()
+
     @pytest.mark.asyncio
     async def test_call_graph_creator_no_data(self):
         all_values = []
@@ -117,3 +179,122 @@ class TestGraphs:
         with patch("graphs.create_graph_async", side_effect=Exception("Test error")):
             with pytest.raises(Exception):
                 await call_graph_creator(all_values)
+
+
+class TestTrends:
+    months = ["2026-08", "2026-09", "2026-10"]
+
+    def test_build_trend_matrix_pivots_rows(self):
+        rows = [
+            ("2026-08", "food_out", 10.0),
+            ("2026-10", "food_out", 30.0),
+            ("2026-09", "transport", 20.0),
+        ]
+
+        categories, matrix = build_trend_matrix(rows, self.months)
+
+        assert categories == ["Fast Food", "Transport"]
+        assert matrix.tolist() == [[10.0, 0.0], [0.0, 20.0], [30.0, 0.0]]
+
+    def test_build_trend_matrix_folds_small_categories(self):
+        rows = [
+            ("2026-08", "food_out", 50.0),
+            ("2026-09", "transport", 47.0),
+            ("2026-09", "gifts", 1.5),
+            ("2026-10", "debts", 1.5),
+        ]
+
+        categories, matrix = build_trend_matrix(rows, self.months)
+
+        assert categories == ["Fast Food", "Transport", "Miscellaneous"]
+        assert matrix[:, 2].tolist() == [0.0, 1.5, 1.5]
+
+    def test_build_trend_matrix_merges_into_existing_miscellaneous(self):
+        rows = [
+            ("2026-08", "other", 50.0),
+            ("2026-10", "gifts", 1.0),
+        ]
+
+        categories, matrix = build_trend_matrix(rows, self.months)
+
+        assert categories == ["Miscellaneous"]
+        assert matrix[:, 0].tolist() == [50.0, 0.0, 1.0]
+
+    def test_build_trend_matrix_no_data(self):
+        categories, matrix = build_trend_matrix([], self.months)
+
+        assert categories == []
+        assert matrix.shape == (3, 0)
+
+    def test_create_trends_graph_sync_creates_file(self):
+        categories, matrix = build_trend_matrix(
+            [("2026-09", "food_out", 10.0)], self.months
+        )
+
+        with patch("graphs.os.makedirs"):
+            with patch("matplotlib.figure.Figure.savefig") as mock_save:
+                result = create_trends_graph_sync(
+                    self.months, categories, matrix, "trends.png"
+                )
+                assert result == "graphs/trends.png"
+                mock_save.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_call_trends_creator(self):
+        with patch("graphs.asyncio.get_running_loop") as mock_loop:
+            mock_loop.return_value.run_in_executor = AsyncMock(
+                return_value="graphs/trends.png"
+            )
+
+            result = await call_trends_creator(
+                [("2026-09", "food_out", 10.0)], self.months
+            )
+
+            assert result == "graphs/trends.png"
+            call_args = mock_loop.return_value.run_in_executor.call_args[0]
+            assert call_args[3] == ["Fast Food"]
+
+
+class TestHeatmap:
+    def test_build_heatmap_grid_bins_days(self):
+        # 2024 starts on a Monday and is a leap year.
+        rows = [(0, 10.0), (0, 5.0), (1, 2.5), (365, 7.0)]
+
+        grid = build_heatmap_grid(rows, 2024)
+
+        assert grid.shape == (7, 53)
+        assert grid[0, 0] == 15.0
+        assert grid[1, 0] == 2.5
+        assert grid[1, 52] == 7.0
+        assert grid[2, 0] == 0.0
+        assert np.isnan(grid[2, 52])
+
+    def test_build_heatmap_grid_offsets_first_week(self):
+        # 2026 starts on a Thursday.
+        grid = build_heatmap_grid([(0, 3.0)], 2026)
+
+        assert np.isnan(grid[:3, 0]).all()
+        assert grid[3, 0] == 3.0
+
+    def test_build_heatmap_grid_no_data(self):
+        grid = build_heatmap_grid([], 2026)
+
+        assert np.nansum(grid) == 0.0
+
+    def test_create_heatmap_sync_creates_file(self):
+        with patch("graphs.os.makedirs"):
+            with patch("matplotlib.figure.Figure.savefig") as mock_save:
+                result = create_heatmap_sync([(0, 3.0)], 2026, "heatmap.png")
+                assert result == "graphs/heatmap.png"
+                mock_save.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_call_heatmap_creator(self):
+        with patch("graphs.asyncio.get_running_loop") as mock_loop:
+            mock_loop.return_value.run_in_executor = AsyncMock(
+                return_value="graphs/heatmap.png"
+            )
+
+            result = await call_heatmap_creator([(0, 3.0)], 2026)
+
+            assert result == "graphs/heatmap.png"
@@ -1,28 +1,62 @@
+import asyncio
+import statistics
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from aiogram.fsm.context import FSMContext
 
 from logic import (
+    UserSettingsMiddleware,
     add_subscription,
     appear_subscriptions_menu,
     ask_saving_input,
     ask_spend_amount,
+    batch_entry,
+    batch_entry_filter,
+    budget,
+    budget_alert,
     choose_category_for_stats,
+    crossed_budget_threshold,
     disable_subscription,
     disable_subscription_list,
+    edit_expense,
+    edit_expense_amount,
     enable_subscription,
+    format_month_summary,
     go_back,
+    heatmap,
+    history,
+    history_page,
+    is_anomaly,
+    parse_admin_ids,
     parse_amount,
+    parse_money,
+    parse_quick_entry,
+    parse_timezone,
+    quick_entry,
+    quick_entry_filter,
+    read_temp_file,
+    recent_expenses,
+    remove_samples,
     remove_temp_files,
     reports,
     save_saving_input,
     savings,
+    select_expense,
+    send_expense_alerts,
+    slowlog,
     spend_input_amount,
     subscription_name,
     subscription_price,
     subscriptions,
+    subscriptions_page,
+    trends,
+    trends_menu,
+    undo_expense,
+    user_currency,
+    user_timezone,
 )
+from sql import UserSettings, get_periods, request_currency, request_periods
 
 
 @pytest.mark.asyncio
@@ -49,10 +83,13 @@ class TestHandlers:
         state_mock = AsyncMock(spec=FSMContext)
         state_mock.get_data.return_value = {"category": "🍔 Fast Food"}
 
-        with patch("logic.add_expense") as mock_add:
+        with (
+            patch("logic.add_expense") as mock_add,
+            patch("logic.send_expense_alerts"),
+        ):
             await spend_input_amount(message_mock, state_mock)
 
-            mock_add.assert_called_once_with(32432, "🍔 Fast Food", 15.50)
+            mock_add.assert_called_once_with(32432, "🍔 Fast Food", 15.50, "EUR", 15.50)
             message_mock.answer.assert_called_once()
             state_mock.clear.assert_called_once()
 
@@ -78,6 +115,13 @@ class TestHandlers:
     async def test_remove_temp_files_not_exists(self):
         remove_temp_files("nonexistent_file.txt")
 
+    async def test_read_temp_file_removes_file(self, tmp_path):
+        test_file = tmp_path / "test.png"
+        test_file.write_bytes(b"png")
+
+        assert read_temp_file(str(test_file)) == b"png"
+        assert not test_file.exists()
+
     async def test_parse_amount_valid(self):
         assert parse_amount("10.5") == 10.5
         assert parse_amount("0.99") == 0.99
@@ -96,6 +140,45 @@ class TestHandlers:
         assert parse_amount("-0.2") is None
         assert parse_amount("-10") is None
 
+    async def test_parse_amount_not_finite(self):
+        assert parse_amount("inf") is None
+        assert parse_amount("nan") is None
+
+    async def test_parse_quick_entry(self):
+        assert parse_quick_entry("12.50 groceries") == ("🍎 Groceries", 12.5, None)
+        assert parse_quick_entry("fast food 9") == ("🍔 Fast Food", 9.0, None)
+        assert parse_quick_entry("🚗 Transport 2,80") == ("🚗 Transport", 2.8, None)
+        assert parse_quick_entry("3 food_out") == ("🍔 Fast Food", 3.0, None)
+        assert parse_quick_entry("4 elec") == ("🖥 Electronics", 4.0, None)
+        assert parse_quick_entry("grocery 3") == ("🍎 Groceries", 3.0, None)
+
+    async def test_parse_quick_entry_rejects_other_text(self):
+        assert parse_quick_entry("groceries") is None
+        assert parse_quick_entry("12 13") is None
+        assert parse_quick_entry("hello world") is None
+        assert parse_quick_entry("-5 groceries") is None
+
+    async def test_parse_quick_entry_reads_currency(self):
+        assert parse_quick_entry("$12.50 groceries") == ("🍎 Groceries", 12.5, "USD")
+        assert parse_quick_entry("12.50 usd groceries") == (
+            "🍎 Groceries",
+            12.5,
+            "USD",
+        )
+        assert parse_quick_entry("groceries 12.50 GBP") == (
+            "🍎 Groceries",
+            12.5,
+            "GBP",
+        )
+        assert parse_quick_entry("fast food 9€") == ("🍔 Fast Food", 9.0, "EUR")
+
+    async def test_parse_money(self):
+        assert parse_money("5,50") == (5.5, None)
+        assert parse_money("¥500") == (500.0, "JPY")
+        assert parse_money("12 chf") == (12.0, "CHF")
+        assert parse_money("12 bananas") is None
+        assert parse_money("$12€") is None
+
     async def test_go_back_subscriptions(self):
         callback_mock = AsyncMock()
         callback_mock.data = "back_to:subscriptions"
@@ -120,14 +203,42 @@ class TestHandlers:
             patch("logic.get_year_expenses", return_value=500.0),
             patch("logic.get_all_categories_and_values", return_value=[("food", 50.0)]),
             patch("logic.get_month_subscriptions_expenses", return_value=0.0),
+            patch("logic.forecast_month", return_value=(150.0, {"food": 150.0})),
             patch("logic.call_graph_creator", return_value="graphs/test.png"),
-            patch("logic.remove_temp_files"),
+            patch("logic.read_temp_file", return_value=b"png"),
         ):
             await choose_category_for_stats(message_mock)
 
             message_mock.answer_photo.assert_called_once()
             call_kwargs = message_mock.answer_photo.call_args[1]
             assert "Statistics" in call_kwargs["caption"]
+            assert "Projected: <code>150.00€</code>" in call_kwargs["caption"]
+
+    async def test_choose_category_for_stats_coalesces_double_tap(self):
+        message_mock = AsyncMock()
+        message_mock.from_user.id = 123
+
+        async def slow_graph(*args):
+            await asyncio.sleep(0.01)
+            return "graphs/test.png"
+
+        with (
+            patch("logic.get_month_total_expenses", return_value=100.0),
+            patch("logic.get_savings", return_value=50.0),
+            patch("logic.get_year_expenses", return_value=500.0),
+            patch("logic.get_all_categories_and_values", return_value=[("food", 50.0)]),
+            patch("logic.get_month_subscriptions_expenses", return_value=0.0),
+            patch("logic.forecast_month", return_value=(150.0, {"food": 150.0})),
+            patch("logic.call_graph_creator", side_effect=slow_graph) as mock_graph,
+            patch("logic.read_temp_file", return_value=b"png"),
+        ):
+            await asyncio.gather(
+                choose_category_for_stats(message_mock),
+                choose_category_for_stats(message_mock),
+            )
+
+            mock_graph.assert_called_once()
+            assert message_mock.answer_photo.call_count == 2
 
     async def test_choose_category_for_stats_with_subscriptions(self):
         message_mock = AsyncMock()
@@ -139,8 +250,9 @@ class TestHandlers:
             patch("logic.get_year_expenses", return_value=500.0),
             patch("logic.get_all_categories_and_values", return_value=[("food", 50.0)]),
             patch("logic.get_month_subscriptions_expenses", return_value=25.0),
+            patch("logic.forecast_month", return_value=(150.0, {"food": 150.0})),
             patch("logic.call_graph_creator", return_value="graphs/test.png"),
-            patch("logic.remove_temp_files"),
+            patch("logic.read_temp_file", return_value=b"png"),
         ):
             await choose_category_for_stats(message_mock)
 
@@ -148,15 +260,17 @@ class TestHandlers:
 
     async def test_enable_subscription(self):
         callback_mock = AsyncMock()
-        callback_mock.data = "sub_enable:Netflix"
+        callback_mock.data = "sub_enable:7"
         callback_mock.from_user.id = 123
         callback_mock.message = AsyncMock()
         state_mock = AsyncMock(spec=FSMContext)
 
-        with patch("logic.enable_month_subscription") as mock_enable:
+        with patch(
+            "logic.enable_month_subscription", return_value="Netflix"
+        ) as mock_enable:
             await enable_subscription(callback_mock, state_mock)
 
-            mock_enable.assert_called_once_with(123, "Netflix")
+            mock_enable.assert_called_once_with(123, 7)
             state_mock.clear.assert_called_once()
             callback_mock.answer.assert_called_once()
             callback_mock.message.delete.assert_called_once()
@@ -168,9 +282,7 @@ class TestHandlers:
         state_mock = AsyncMock(spec=FSMContext)
 
         with (
-            patch(
-                "logic.get_subscriptions_breakdown", return_value=[("Netflix", 9.99)]
-            ),
+            patch("logic.get_subscriptions_page", return_value=[(7, "Netflix")]),
             patch("logic.subscriptions_keyboard") as mock_keyboard,
         ):
             mock_keyboard.return_value = MagicMock()
@@ -187,7 +299,7 @@ class TestHandlers:
         state_mock = AsyncMock(spec=FSMContext)
 
         with (
-            patch("logic.get_subscriptions_breakdown", return_value=[]),
+            patch("logic.get_subscriptions_page", return_value=[]),
             patch("logic.subscriptions_keyboard") as mock_keyboard,
         ):
             mock_keyboard.return_value = MagicMock()
@@ -255,9 +367,7 @@ class TestHandlers:
         state_mock = AsyncMock(spec=FSMContext)
 
         with (
-            patch(
-                "logic.get_subscriptions_breakdown", return_value=[("Netflix", 9.99)]
-            ),
+            patch("logic.get_subscriptions_page", return_value=[(7, "Netflix")]),
             patch("logic.subscriptions_keyboard") as mock_keyboard,
         ):
             mock_keyboard.return_value = MagicMock()
@@ -269,18 +379,82 @@ class TestHandlers:
 
     async def test_disable_subscription(self):
         callback_mock = AsyncMock()
-        callback_mock.data = "sub_select:Netflix"
+        callback_mock.data = "sub_select:7"
         callback_mock.from_user.id = 123
         callback_mock.message = AsyncMock()
         state_mock = AsyncMock(spec=FSMContext)
 
-        with patch("logic.disable_month_subscription") as mock_disable:
+        with patch(
+            "logic.disable_month_subscription", return_value="Netflix"
+        ) as mock_disable:
             await disable_subscription(callback_mock, state_mock)
 
-            mock_disable.assert_called_once_with(123, "Netflix")
+            mock_disable.assert_called_once_with(123, 7)
             callback_mock.answer.assert_called_once()
             callback_mock.message.delete.assert_called_once()
 
+    async def test_name_based_subscription_buttons_are_ignored(self):
+        callback_mock = AsyncMock()
+        callback_mock.from_user.id = 123
+        state_mock = AsyncMock(spec=FSMContext)
+
+        with (
+            patch("logic.enable_month_subscription") as mock_enable,
+            patch("logic.disable_month_subscription") as mock_disable,
+        ):
+            callback_mock.data = "sub_enable:Netflix"
+            await enable_subscription(callback_mock, state_mock)
+            callback_mock.data = "sub_select:Netflix"
+            await disable_subscription(callback_mock, state_mock)
+
+        mock_enable.assert_not_called()
+        mock_disable.assert_not_called()
+        assert callback_mock.answer.call_count == 2
+        callback_mock.message.delete.assert_not_called()
+
+    async def test_disable_subscription_not_found(self):
+        callback_mock = AsyncMock()
+        callback_mock.data = "sub_select:7"
+        callback_mock.from_user.id = 123
+        state_mock = AsyncMock(spec=FSMContext)
+
+        with patch("logic.disable_month_subscription", return_value=None):
+            await disable_subscription(callback_mock, state_mock)
+
+        callback_mock.answer.assert_called_once_with("❗ Subscription not found")
+        callback_mock.message.delete.assert_not_called()
+
+    async def test_subscriptions_page(self):
+        callback_mock = AsyncMock()
+        callback_mock.data = "sub_page:1:n:9"
+        callback_mock.from_user.id = 123
+        rows = [(index, f"Sub{index}") for index in range(10, 20)]
+
+        with patch("logic.get_subscriptions_page", return_value=rows) as mock_page:
+            await subscriptions_page(callback_mock)
+
+        mock_page.assert_called_once_with(123, True, True, 9, False, 10)
+        keyboard = callback_mock.message.edit_reply_markup.call_args[1]["reply_markup"]
+        assert [button.callback_data for button in keyboard.inline_keyboard[-2]] == [
+            "sub_page:1:p:10",
+            "sub_page:1:n:18",
+        ]
+
+    async def test_subscriptions_page_backwards(self):
+        callback_mock = AsyncMock()
+        callback_mock.data = "sub_page:0:p:10"
+        callback_mock.from_user.id = 123
+        rows = [(index, f"Sub{index}") for index in (9, 8, 7)]
+
+        with patch("logic.get_subscriptions_page", return_value=rows):
+            await subscriptions_page(callback_mock)
+
+        keyboard = callback_mock.message.edit_reply_markup.call_args[1]["reply_markup"]
+        assert keyboard.inline_keyboard[0][0].callback_data == "sub_enable:7"
+        assert [button.callback_data for button in keyboard.inline_keyboard[-2]] == [
+            "sub_page:0:n:9"
+        ]
+
     async def test_appear_subscriptions_menu(self):
         message_mock = AsyncMock()
         message_mock.from_user.id = 123
@@ -392,7 +566,7 @@ class TestHandlers:
 
         with (
             patch("logic.create_report", return_value="reports/test.xlsx"),
-            patch("logic.remove_temp_files"),
+            patch("logic.read_temp_file", return_value=b"xlsx"),
         ):
             await reports(callback_mock, AsyncMock())
 
@@ -407,7 +581,7 @@ class TestHandlers:
 
         with (
             patch("logic.create_report", return_value="reports/test.xlsx"),
-            patch("logic.remove_temp_files"),
+            patch("logic.read_temp_file", return_value=b"xlsx"),
         ):
             await reports(callback_mock, AsyncMock())
 
@@ -427,3 +601,488 @@ class TestHandlers:
             await reports(callback_mock, AsyncMock())
 
             mock_logger.error.assert_called_once()
+
+    async def test_trends_menu(self):
+        message_mock = AsyncMock()
+
+        await trends_menu(message_mock)
+
+        message_mock.answer.assert_called_once()
+        assert "Trends" in message_mock.answer.call_args[0][0]
+
+    async def test_trends(self):
+        callback_mock = AsyncMock()
+        callback_mock.data = "trends:6"
+        callback_mock.from_user.id = 123
+        callback_mock.message = AsyncMock()
+
+        with (
+            patch("logic.get_monthly_category_totals", return_value=[]) as mock_rows,
+            patch("logic.call_trends_creator", return_value="graphs/t.png"),
+            patch("logic.read_temp_file", return_value=b"png"),
+        ):
+            await trends(callback_mock, AsyncMock())
+
+            assert len(mock_rows.call_args[0][1]) == 6
+            callback_mock.message.answer_photo.assert_called_once()
+
+    async def test_trends_unknown_period(self):
+        callback_mock = AsyncMock()
+        callback_mock.data = "trends:7"
+        callback_mock.message = AsyncMock()
+
+        with patch("logic.get_monthly_category_totals") as mock_rows:
+            await trends(callback_mock, AsyncMock())
+
+            mock_rows.assert_not_called()
+            callback_mock.message.answer_photo.assert_not_called()
+
+    async def test_trends_malformed_period(self):
+        callback_mock = AsyncMock()
+        callback_mock.data = "trends:six"
+        callback_mock.message = AsyncMock()
+
+        with patch("logic.get_monthly_category_totals") as mock_rows:
+            await trends(callback_mock, AsyncMock())
+
+        mock_rows.assert_not_called()
+        callback_mock.answer.assert_called_once()
+
+    async def test_heatmap(self):
+        callback_mock = AsyncMock()
+        callback_mock.data = "heatmap:year"
+        callback_mock.from_user.id = 123
+        callback_mock.message = AsyncMock()
+
+        with (
+            patch("logic.get_daily_expenses", return_value=[]) as mock_rows,
+            patch("logic.call_heatmap_creator", return_value="graphs/h.png"),
+            patch("logic.read_temp_file", return_value=b"png"),
+        ):
+            await heatmap(callback_mock, AsyncMock())
+
+            mock_rows.assert_called_once()
+            callback_mock.message.answer_photo.assert_called_once()
+
+    async def test_format_month_summary(self):
+        summary = format_month_summary(
+            [("tech", 50.0, 0.0), ("groceries", 15.0, 10.0), ("housing", 0.0, 7.0)]
+        )
+
+        assert "<b>Electronics</b>: <code>50.00€</code>\n" in summary
+        assert "<b>Groceries</b>: <code>15.00€</code> (+50%)" in summary
+        assert "Housing" not in summary
+        assert "Spent: <code>65.00€</code> (previous month: <code>17.00€</code>)" in (
+            summary
+        )
+
+    async def test_slowlog(self):
+        message_mock = AsyncMock()
+        message_mock.text = "/slowlog 1"
+
+        rows = [
+            (
+                "SELECT * FROM expenses WHERE user_id < ?",
+                {"count": 2, "total_ms": 300.0, "max_ms": 200.0},
+            )
+        ]
+
+        with patch("logic.get_slowest_queries", return_value=rows) as mock_slowest:
+            await slowlog(message_mock)
+
+        mock_slowest.assert_called_once_with(1)
+        text = message_mock.answer.call_args[0][0]
+        assert "max <code>200.0ms</code>, avg <code>150.0ms</code>, 2×" in text
+        assert "user_id &lt; ?" in text
+
+    async def test_parse_admin_ids_skips_invalid_entries(self):
+        with patch("logic.logger") as mock_logger:
+            admin_ids = parse_admin_ids(" 123, abc,,-456 ,7.5")
+
+        assert admin_ids == {123, -456}
+        assert mock_logger.warning.call_count == 2
+
+    async def test_quick_entry(self):
+        message_mock = AsyncMock()
+        message_mock.text = "12.50 groceries"
+        message_mock.from_user.id = 32432
+
+        data = quick_entry_filter(message_mock)
+
+        with (
+            patch("logic.add_expense") as mock_add,
+            patch("logic.send_expense_alerts"),
+        ):
+            await quick_entry(message_mock, **data)
+
+        mock_add.assert_called_once_with(32432, "🍎 Groceries", 12.5, "EUR", 12.5)
+        assert "12.50€" in message_mock.answer.call_args[0][0]
+
+    async def test_quick_entry_converts_foreign_currency(self):
+        message_mock = AsyncMock()
+        message_mock.text = "$10 groceries"
+        message_mock.from_user.id = 32432
+
+        data = quick_entry_filter(message_mock)
+
+        with (
+            patch("logic.get_exchange_rate", return_value=0.9) as mock_rate,
+            patch("logic.add_expense") as mock_add,
+            patch("logic.send_expense_alerts") as mock_alerts,
+        ):
+            await quick_entry(message_mock, **data)
+
+        mock_rate.assert_called_once_with("USD", "EUR")
+        mock_add.assert_called_once_with(32432, "🍎 Groceries", 9.0, "USD", 10.0)
+        mock_alerts.assert_called_once_with(message_mock, [("🍎 Groceries", 9.0)])
+        assert "9.00€ (10.00$)" in message_mock.answer.call_args[0][0]
+
+    async def test_quick_entry_without_rate_adds_nothing(self):
+        message_mock = AsyncMock()
+        message_mock.text = "10 gbp groceries"
+
+        with (
+            patch("logic.get_exchange_rate", return_value=None),
+            patch("logic.add_expense") as mock_add,
+        ):
+            await quick_entry(message_mock, **quick_entry_filter(message_mock))
+
+        mock_add.assert_not_called()
+        assert "no exchange rate for GBP" in message_mock.answer.call_args[0][0]
+
+    async def test_quick_entry_filter_skips_unparsed_text(self):
+        message_mock = AsyncMock()
+        message_mock.text = "hello there"
+
+        assert quick_entry_filter(message_mock) is False
+
+    async def test_batch_entry(self):
+        message_mock = AsyncMock()
+        message_mock.text = (
+            "groceries 23.10 / transport 2.80 / fast food 9\ngroceries 1"
+        )
+        message_mock.from_user.id = 32432
+
+        data = batch_entry_filter(message_mock)
+
+        with (
+            patch("logic.add_expenses") as mock_add,
+            patch("logic.send_expense_alerts"),
+        ):
+            await batch_entry(message_mock, **data)
+
+        mock_add.assert_called_once_with(
+            32432,
+            [
+                ("🍎 Groceries", 23.1, "EUR", 23.1),
+                ("🚗 Transport", 2.8, "EUR", 2.8),
+                ("🍔 Fast Food", 9.0, "EUR", 9.0),
+                ("🍎 Groceries", 1.0, "EUR", 1.0),
+            ],
+        )
+        text = message_mock.answer.call_args[0][0]
+        assert "Added 4 expenses" in text
+        assert "<b>🍎 Groceries</b>: <code>24.10€</code>" in text
+        assert "Total: <code>35.90€</code>" in text
+
+    async def test_batch_entry_rejects_whole_batch_on_invalid_line(self):
+        message_mock = AsyncMock()
+        message_mock.text = "groceries 23.10\ntransport two euros"
+
+        with patch("logic.add_expenses") as mock_add:
+            await batch_entry(message_mock, **batch_entry_filter(message_mock))
+
+        mock_add.assert_not_called()
+        assert "transport two euros" in message_mock.answer.call_args[0][0]
+
+    async def test_batch_entry_filter_needs_several_lines(self):
+        message_mock = AsyncMock()
+
+        message_mock.text = "groceries 23.10"
+        assert batch_entry_filter(message_mock) is False
+
+        message_mock.text = "hello\nthere"
+        assert batch_entry_filter(message_mock) is False
+
+    async def test_history_first_page(self):
+        message_mock = AsyncMock()
+        message_mock.from_user.id = 123
+        rows = [
+            (index, "🍎 Groceries", 2.5, "2024-01-05") for index in range(20, 9, -1)
+        ]
+
+        with patch("logic.get_expenses_page", return_value=rows) as mock_page:
+            await history(message_mock)
+
+        mock_page.assert_called_once_with(123, None, None, None, False, 11)
+        text = message_mock.answer.call_args[0][0]
+        keyboard = message_mock.answer.call_args[1]["reply_markup"]
+        assert text.count("05.01 · 🍎 Groceries · <code>2.50€</code>") == 10
+        assert [button.callback_data for button in keyboard.inline_keyboard[0]] == [
+            "hist:-:a:n:2024-01-05:11"
+        ]
+
+    async def test_history_page_backwards_with_filters(self):
+        callback_mock = AsyncMock()
+        callback_mock.data = "hist:1:m:p:2024-01-05:11"
+        callback_mock.from_user.id = 123
+        rows = [(12, "🍎 Groceries", 1.0, "2024-01-05")]
+
+        with (
+            patch("logic.get_current_date", return_value="2024-01-20"),
+            patch("logic.get_expenses_page", return_value=rows) as mock_page,
+        ):
+            await history_page(callback_mock)
+
+        mock_page.assert_called_once_with(
+            123, "🍎 Groceries", "2024-01-01", ("2024-01-05", 11), True, 11
+        )
+        keyboard = callback_mock.message.edit_text.call_args[1]["reply_markup"]
+        assert [button.callback_data for button in keyboard.inline_keyboard[0]] == [
+            "hist:1:m:n:2024-01-05:12"
+        ]
+
+    async def test_spend_input_amount_offers_undo_and_edit(self):
+        message_mock = AsyncMock()
+        message_mock.text = "15.50"
+        message_mock.from_user.id = 32432
+        state_mock = AsyncMock(spec=FSMContext)
+        state_mock.get_data.return_value = {"category": "🍔 Fast Food"}
+
+        with (
+            patch("logic.add_expense", return_value=42),
+            patch("logic.send_expense_alerts"),
+        ):
+            await spend_input_amount(message_mock, state_mock)
+
+        keyboard = message_mock.answer.call_args[1]["reply_markup"]
+        assert [button.callback_data for button in keyboard.inline_keyboard[0]] == [
+            "exp_undo:42",
+            "exp_edit:42",
+        ]
+
+    async def test_undo_expense(self):
+        callback_mock = AsyncMock()
+        callback_mock.data = "exp_undo:42"
+        callback_mock.from_user.id = 123
+        state_mock = AsyncMock(spec=FSMContext)
+
+        expense = ("🍔 Fast Food", 15.5, "2020-01-05")
+
+        with (
+            patch("logic.delete_expense", return_value=expense) as mock_delete,
+            patch("logic.forecast_cache.forget") as mock_forget,
+        ):
+            await undo_expense(callback_mock, state_mock)
+
+        mock_delete.assert_called_once_with(123, 42)
+        mock_forget.assert_called_once_with(123)
+        assert "15.50€" in callback_mock.message.edit_text.call_args[0][0]
+
+    async def test_undo_expense_not_found(self):
+        callback_mock = AsyncMock()
+        callback_mock.data = "exp_undo:42"
+        state_mock = AsyncMock(spec=FSMContext)
+
+        with patch("logic.delete_expense", return_value=None):
+            await undo_expense(callback_mock, state_mock)
+
+        callback_mock.answer.assert_called_once_with("❗ Expense not found")
+        callback_mock.message.edit_text.assert_not_called()
+
+    async def test_edit_expense_updates_amount(self):
+        callback_mock = AsyncMock()
+        callback_mock.data = "exp_edit:42"
+        state_mock = AsyncMock(spec=FSMContext)
+
+        await edit_expense(callback_mock, state_mock)
+
+        state_mock.update_data.assert_called_once_with(expense_id=42)
+
+        message_mock = AsyncMock()
+        message_mock.text = "12"
+        message_mock.from_user.id = 123
+        state_mock.get_data.return_value = {"expense_id": 42}
+
+        expense = ("🍔 Fast Food", 12.0, get_periods().today)
+
+        with (
+            patch("logic.update_expense_amount", return_value=expense) as mock_update,
+            patch("logic.forecast_cache.forget") as mock_forget,
+        ):
+            await edit_expense_amount(message_mock, state_mock)
+
+        mock_update.assert_called_once_with(123, 42, 12.0)
+        # The model only covers past months, so it survives this month's edits.
+        mock_forget.assert_not_called()
+        assert "12.00€" in message_mock.answer.call_args[0][0]
+        state_mock.clear.assert_called_once()
+
+    async def test_recent_expenses_picker(self):
+        callback_mock = AsyncMock()
+        callback_mock.from_user.id = 123
+        rows = [(7, "🍎 Groceries", 2.5, "2024-01-05")]
+
+        with patch("logic.get_recent_expenses", return_value=rows) as mock_recent:
+            await recent_expenses(callback_mock)
+
+        mock_recent.assert_called_once_with(123)
+        keyboard = callback_mock.message.answer.call_args[1]["reply_markup"]
+        button = keyboard.inline_keyboard[0][0]
+        assert button.text == "05.01 · 🍎 Groceries · 2.50€"
+        assert button.callback_data == "exp_select:7"
+
+        callback_mock.data = "exp_select:7"
+        with patch(
+            "logic.get_expense", return_value=("🍎 Groceries", 2.5, "2024-01-05")
+        ):
+            await select_expense(callback_mock)
+
+        keyboard = callback_mock.message.edit_text.call_args[1]["reply_markup"]
+        assert keyboard.inline_keyboard[0][0].callback_data == "exp_undo:7"
+
+    async def test_crossed_budget_threshold(self):
+        assert crossed_budget_threshold(40.0, 10.0, 100.0) is None
+        assert crossed_budget_threshold(50.0, 10.0, 100.0) == 50
+        assert crossed_budget_threshold(85.0, 40.0, 100.0) == 80
+        assert crossed_budget_threshold(120.0, 30.0, 100.0) == 100
+        assert crossed_budget_threshold(130.0, 10.0, 100.0) is None
+
+    async def test_budget_alert(self):
+        with patch("logic.get_budget_progress", return_value=(105.0, 100.0)):
+            alert = await budget_alert(123, "🍎 Groceries", 10.0)
+
+        assert "over budget" in alert
+
+        with patch("logic.get_budget_progress", return_value=None):
+            assert await budget_alert(123, "🍎 Groceries", 10.0) is None
+
+    async def test_budget_command_sets_budget(self):
+        message_mock = AsyncMock()
+        message_mock.text = "/budget groceries 300"
+        message_mock.from_user.id = 123
+
+        with patch("logic.set_budget") as mock_set:
+            await budget(message_mock)
+
+        mock_set.assert_called_once_with(123, "🍎 Groceries", 300.0)
+
+    async def test_budget_command_removes_budget(self):
+        message_mock = AsyncMock()
+        message_mock.text = "/budget groceries off"
+        message_mock.from_user.id = 123
+
+        with patch("logic.remove_budget", return_value=True) as mock_remove:
+            await budget(message_mock)
+
+        mock_remove.assert_called_once_with(123, "🍎 Groceries")
+
+    async def test_budget_command_lists_budgets(self):
+        message_mock = AsyncMock()
+        message_mock.text = "/budget"
+        message_mock.from_user.id = 123
+
+        with patch("logic.get_budgets", return_value=[("🍎 Groceries", 200.0, 50.0)]):
+            await budget(message_mock)
+
+        text = message_mock.answer.call_args[0][0]
+        assert "<code>50.00€</code> of <code>200.00€</code> (25%)" in text
+
+    async def test_remove_samples_reverses_welford_updates(self):
+        # Stats of 10, 20, 30, 40 and 50.
+        count, mean, m2 = remove_samples(5, 30.0, 1000.0, [50.0, 40.0])
+
+        assert count == 3
+        assert mean == pytest.approx(20.0)
+        assert m2 == pytest.approx(200.0)
+
+    async def test_is_anomaly(self):
+        # Twenty expenses averaging 20€ with a standard deviation of 5€.
+        stats = (20, 20.0, 19 * 25.0)
+
+        assert is_anomaly(*stats, 100.0) is True
+        assert is_anomaly(*stats, 45.0) is False
+        assert is_anomaly(5, 20.0, 4 * 25.0, 100.0) is False
+
+    async def test_send_expense_alerts_flags_unusual_batch_entries(self):
+        message_mock = AsyncMock()
+        message_mock.from_user.id = 123
+        # Stats as the insert trigger leaves them: history plus both entries.
+        amounts = [15.0, 25.0] * 10 + [100.0, 25.0]
+        mean = statistics.mean(amounts)
+        stats = (len(amounts), mean, sum((x - mean) ** 2 for x in amounts))
+
+        with (
+            patch("logic.get_category_stats", return_value=stats),
+            patch("logic.get_budget_progress", return_value=None),
+        ):
+            await send_expense_alerts(
+                message_mock, [("🍎 Groceries", 100.0), ("🍎 Groceries", 25.0)]
+            )
+
+        message_mock.answer.assert_called_once()
+        assert (
+            "5× your usual <code>20.00€</code>" in message_mock.answer.call_args[0][0]
+        )
+
+    async def test_parse_timezone(self):
+        assert parse_timezone("Europe/Berlin") == "Europe/Berlin"
+        assert parse_timezone("+10") == "Etc/GMT-10"
+        assert parse_timezone("UTC-3") == "Etc/GMT+3"
+        assert parse_timezone("gmt") == "UTC"
+        assert parse_timezone("Mars/Olympus") is None
+        assert parse_timezone("../../etc/passwd") is None
+        assert parse_timezone("+99") is None
+
+    async def test_timezone_command_saves_zone(self):
+        message_mock = AsyncMock()
+        message_mock.text = "/timezone +10"
+        message_mock.from_user.id = 123
+
+        with patch("logic.set_user_timezone") as mock_set:
+            await user_timezone(message_mock)
+
+        mock_set.assert_called_once_with(123, "Etc/GMT-10")
+        assert "Etc/GMT-10" in message_mock.answer.call_args[0][0]
+
+    async def test_currency_command_converts_history(self):
+        message_mock = AsyncMock()
+        message_mock.text = "/currency usd"
+        message_mock.from_user.id = 123
+
+        with (
+            patch("logic.set_user_currency", return_value=[]) as mock_set,
+            patch("logic.forecast_cache.forget") as mock_forget,
+        ):
+            await user_currency(message_mock)
+
+        mock_set.assert_called_once_with(123, "USD")
+        mock_forget.assert_called_once_with(123)
+        assert "Home currency set to USD" in message_mock.answer.call_args[0][0]
+
+    async def test_currency_command_rejects_missing_rates(self):
+        message_mock = AsyncMock()
+        message_mock.text = "/currency GBP"
+        message_mock.from_user.id = 123
+
+        with patch("logic.set_user_currency", return_value=["GBP"]):
+            await user_currency(message_mock)
+
+        assert "no exchange rate for GBP" in message_mock.answer.call_args[0][0]
+
+    async def test_user_settings_middleware_sets_periods_and_currency(self):
+        middleware = UserSettingsMiddleware()
+        seen = []
+
+        async def handler(event, data):
+            seen.append((request_periods.get(), request_currency.get()))
+
+        data = {"event_from_user": MagicMock(id=123)}
+        with patch(
+            "logic.get_user_settings", return_value=UserSettings("Etc/GMT-14", "USD")
+        ):
+            await middleware(handler, None, data)
+
+        assert seen == [(get_periods("Etc/GMT-14"), "USD")]
+        assert request_periods.get() is None
+        assert request_currency.get() is None
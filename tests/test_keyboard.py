@@ -1,6 +1,10 @@
 import pytest
 
-from keyboard import subscriptions_keyboard
+from keyboard import (
+    history_categories_keyboard,
+    history_keyboard,
+    subscriptions_keyboard,
+)
 
 
 @pytest.mark.asyncio
@@ -13,15 +17,15 @@ class TestKeyboard:
         assert keyboard.inline_keyboard[0][0].callback_data == "back_to:subscriptions"
 
     async def test_subscriptions_keyboard_single_subscription(self):
-        keyboard = await subscriptions_keyboard(["Netflix"], True)
+        keyboard = await subscriptions_keyboard([(7, "Netflix")], True)
 
         assert len(keyboard.inline_keyboard) == 2
         assert keyboard.inline_keyboard[0][0].text == "Netflix"
-        assert keyboard.inline_keyboard[0][0].callback_data == "sub_select:Netflix"
+        assert keyboard.inline_keyboard[0][0].callback_data == "sub_select:7"
 
     async def test_subscriptions_keyboard_multiple_subscriptions(self):
         names = ["Netflix", "Spotify", "Disney+", "HBO", "Apple Music"]
-        keyboard = await subscriptions_keyboard(names, True)
+        keyboard = await subscriptions_keyboard(list(enumerate(names, start=1)), True)
 
         all_texts = [btn.text for row in keyboard.inline_keyboard[:-1] for btn in row]
         assert "Netflix" in all_texts
@@ -31,15 +35,49 @@ class TestKeyboard:
         assert "Apple Music" in all_texts
 
     async def test_subscriptions_keyboard_inactive_callback(self):
-        keyboard = await subscriptions_keyboard(["Netflix"], False)
+        keyboard = await subscriptions_keyboard([(7, "Netflix")], False)
 
-        assert keyboard.inline_keyboard[0][0].callback_data == "sub_enable:Netflix"
+        assert keyboard.inline_keyboard[0][0].callback_data == "sub_enable:7"
 
     async def test_subscriptions_keyboard_groups_by_three(self):
         names = ["Sub1", "Sub2", "Sub3", "Sub4", "Sub5", "Sub6", "Sub7"]
-        keyboard = await subscriptions_keyboard(names, True)
+        keyboard = await subscriptions_keyboard(list(enumerate(names, start=1)), True)
 
         assert len(keyboard.inline_keyboard[0]) == 3
         assert len(keyboard.inline_keyboard[1]) == 3
         assert len(keyboard.inline_keyboard[2]) == 1
         assert keyboard.inline_keyboard[3][0].text == "⬅️ Back"
+
+    async def test_subscriptions_keyboard_page_buttons(self):
+        keyboard = await subscriptions_keyboard(
+            [(7, "Netflix")], True, previous_cursor=7, next_cursor=7
+        )
+
+        assert [button.callback_data for button in keyboard.inline_keyboard[1]] == [
+            "sub_page:1:p:7",
+            "sub_page:1:n:7",
+        ]
+
+    async def test_subscriptions_keyboard_callback_data_fits_limit(self):
+        keyboard = await subscriptions_keyboard(
+            [(2**62, "A" * 200)], False, previous_cursor=2**62, next_cursor=2**62
+        )
+
+        for row in keyboard.inline_keyboard:
+            for button in row:
+                assert len(button.callback_data.encode()) <= 64
+
+    async def test_history_keyboard_marks_period_and_fits_limit(self):
+        cursor = ("2024-01-05", 2**62)
+        keyboard = await history_keyboard("11", "y", cursor, cursor)
+
+        assert keyboard.inline_keyboard[1][1].text == "• This year"
+        for row in keyboard.inline_keyboard:
+            for button in row:
+                assert len(button.callback_data.encode()) <= 64
+
+    async def test_history_categories_keyboard_keeps_period(self):
+        keyboard = await history_categories_keyboard("m")
+
+        assert keyboard.inline_keyboard[0][0].callback_data == "hist:0:m:n::"
+        assert keyboard.inline_keyboard[-1][0].callback_data == "hist:-:m:n::"
@@ -0,0 +1,25 @@
+import asyncio
+from unittest.mock import patch
+
+from benchmarks.datagen import Scale, generate_database
+from benchmarks.loadtest import run_load_test
+
+
+def test_load_test_runs_every_flow_end_to_end(tmp_path, monkeypatch):
+    path = generate_database(
+        str(tmp_path / "load.db"),
+        Scale(users=5, expenses=20, savings=2, subscriptions=2, years=1),
+    )
+    monkeypatch.chdir(tmp_path)
+
+    with patch("sql.DB_PATH", path), patch("storage.DB_PATH", path):
+        report = asyncio.run(run_load_test(users=8, flows_per_user=6, concurrency=4))
+
+    assert report["errors"] == {}
+    # Handlers that swallow their errors still have to send their result.
+    assert report["flows"]["report"] > 0
+    assert report["missing_calls"] == {}
+    assert report["updates"] >= 48
+    assert set(report["handlers"]) >= {"ask_spend_amount", "spend_input_amount"}
+    assert report["api_calls"]["SendMessage"] > 0
+    assert report["loop_lag"]["count"] > 0
@@ -0,0 +1,42 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+
+from loopwatch import EVENT_LOOP_LAG, EVENT_LOOP_STALLS, LoopWatchdog
+
+
+def blocking_call():
+    time.sleep(0.3)
+
+
+@pytest.mark.asyncio
+class TestLoopWatchdog:
+    async def test_logs_stack_of_blocking_call(self):
+        watchdog = LoopWatchdog(threshold=0.1, interval=0.01)
+        stalls_before = EVENT_LOOP_STALLS.values.get("MainThread", 0)
+
+        with patch("loopwatch.logger") as mock_logger:
+            watchdog.start()
+            await asyncio.sleep(0.05)
+            blocking_call()
+            await asyncio.sleep(0.05)
+            await watchdog.stop()
+
+        mock_logger.warning.assert_called_once()
+        message = mock_logger.warning.call_args[0][0]
+        assert "Event loop blocked" in message
+        assert "in blocking_call" in message
+        assert EVENT_LOOP_STALLS.values["MainThread"] == stalls_before + 1
+
+    async def test_quiet_loop_is_not_reported(self):
+        watchdog = LoopWatchdog(threshold=0.1, interval=0.01)
+
+        with patch("loopwatch.logger") as mock_logger:
+            watchdog.start()
+            await asyncio.sleep(0.1)
+            await watchdog.stop()
+
+        mock_logger.warning.assert_not_called()
+        assert "MainThread" in EVENT_LOOP_LAG.values
@@ -1,8 +1,13 @@
+import asyncio
+import socket
+from datetime import datetime
 from unittest.mock import AsyncMock, MagicMock, patch
+from zoneinfo import ZoneInfo
 
 import pytest
+from aiogram.exceptions import TelegramForbiddenError, TelegramNetworkError
 
-from main import start_bot
+from main import is_summary_due, send_month_summaries, serve_worker, start_bot
 
 
 @pytest.mark.asyncio
@@ -12,12 +17,14 @@ class TestMain:
             patch("main.connect_database") as mock_connect,
             patch("main.Bot") as mock_bot_class,
             patch("main.Dispatcher") as mock_dp_class,
-            patch("main.MemoryStorage"),
+            patch("main.SQLiteStorage"),
             patch("main.logger"),
             patch("main.main_menu"),
             patch("main.logic_router"),
+            patch("main.warm_up_renderer", new_callable=AsyncMock),
         ):
             mock_bot = MagicMock()
+            mock_bot.delete_webhook = AsyncMock()
             mock_bot_class.return_value = mock_bot
 
             mock_dp = MagicMock()
@@ -35,6 +42,8 @@ class TestMain:
 
             mock_connect.assert_called_once()
             mock_dp.include_router.assert_called_once()
+            # A webhook left by a webhook deploy would block getUpdates.
+            mock_bot.delete_webhook.assert_awaited_once()
             mock_dp.start_polling.assert_called_once_with(mock_bot)
 
     async def test_start_bot_creates_bot_with_token(self):
@@ -43,12 +52,14 @@ class TestMain:
             patch("main.os.getenv", return_value="test_token"),
             patch("main.Bot") as mock_bot_class,
             patch("main.Dispatcher") as mock_dp_class,
-            patch("main.MemoryStorage"),
+            patch("main.SQLiteStorage"),
             patch("main.logger"),
             patch("main.main_menu"),
             patch("main.logic_router"),
+            patch("main.warm_up_renderer", new_callable=AsyncMock),
         ):
             mock_bot = MagicMock()
+            mock_bot.delete_webhook = AsyncMock()
             mock_bot_class.return_value = mock_bot
 
             mock_dp = MagicMock()
@@ -70,12 +81,14 @@ class TestMain:
             patch("main.connect_database"),
             patch("main.Bot") as mock_bot_class,
             patch("main.Dispatcher") as mock_dp_class,
-            patch("main.MemoryStorage") as mock_storage_class,
+            patch("main.SQLiteStorage") as mock_storage_class,
             patch("main.logger"),
             patch("main.main_menu"),
             patch("main.logic_router"),
+            patch("main.warm_up_renderer", new_callable=AsyncMock),
         ):
             mock_bot = MagicMock()
+            mock_bot.delete_webhook = AsyncMock()
             mock_bot_class.return_value = mock_bot
 
             mock_storage = MagicMock()
@@ -95,3 +108,155 @@ class TestMain:
 
             mock_dp_class.assert_called_once()
             mock_storage_class.assert_called_once()
+
+    async def test_start_bot_warms_up_renderer(self):
+        with (
+            patch("main.connect_database"),
+            patch("main.Bot") as mock_bot_class,
+            patch("main.Dispatcher") as mock_dp_class,
+            patch("main.SQLiteStorage"),
+            patch("main.logger"),
+            patch("main.main_menu"),
+            patch("main.logic_router"),
+            patch("main.warm_up_renderer", new_callable=AsyncMock) as mock_warm_up,
+        ):
+            mock_bot_class.return_value.delete_webhook = AsyncMock()
+            mock_dp = MagicMock()
+            mock_dp.message = MagicMock(return_value=lambda func: func)
+
+            async def polling(bot):
+                await asyncio.sleep(0)
+                raise KeyboardInterrupt("Test stop")
+
+            mock_dp.start_polling = polling
+            mock_dp_class.return_value = mock_dp
+
+            try:
+                await start_bot()
+            except KeyboardInterrupt:
+                pass
+
+            mock_warm_up.assert_awaited_once()
+
+    async def test_start_bot_webhook_mode(self):
+        with (
+            patch("main.connect_database"),
+            patch("main.Bot") as mock_bot_class,
+            patch("main.Dispatcher") as mock_dp_class,
+            patch("main.SQLiteStorage"),
+            patch("main.logger"),
+            patch("main.main_menu"),
+            patch("main.logic_router"),
+            patch("main.warm_up_renderer", new_callable=AsyncMock),
+            patch("main.BOT_MODE", "webhook"),
+            patch(
+                "main.run_webhook", AsyncMock(side_effect=KeyboardInterrupt("Stop"))
+            ) as mock_run_webhook,
+        ):
+            mock_dp = MagicMock()
+            mock_dp.message = MagicMock(return_value=lambda func: func)
+            mock_dp.start_polling = AsyncMock()
+            mock_dp_class.return_value = mock_dp
+
+            try:
+                await start_bot()
+            except KeyboardInterrupt:
+                pass
+
+            mock_run_webhook.assert_called_once_with(
+                mock_dp, mock_bot_class.return_value
+            )
+            mock_dp.start_polling.assert_not_called()
+
+    async def test_serve_worker_runs_scheduler_only_in_first_worker(self):
+        for index, expected_calls in ((0, 1), (1, 0)):
+            ingress_sock, worker_sock = socket.socketpair()
+
+            with (
+                patch("main.create_bot") as mock_create_bot,
+                patch("main.create_dispatcher") as mock_create_dispatcher,
+                patch("main.start_scheduler") as mock_start_scheduler,
+                patch("main.scheduler"),
+                patch("main.warm_up_renderer", new_callable=AsyncMock),
+                patch("main.consume_updates", new_callable=AsyncMock) as mock_consume,
+            ):
+                mock_create_bot.return_value.session.close = AsyncMock()
+                mock_create_dispatcher.return_value.emit_startup = AsyncMock()
+                mock_create_dispatcher.return_value.emit_shutdown = AsyncMock()
+
+                await serve_worker(index, worker_sock)
+
+                mock_consume.assert_awaited_once()
+                assert mock_start_scheduler.call_count == expected_calls
+
+            ingress_sock.close()
+
+    async def test_send_month_summaries_only_to_due_time_zones(self):
+        async def summaries(timezone):
+            yield [(1, None, [("tech", 50.0, 0.0)])]
+
+        bot = MagicMock()
+        bot.send_message = AsyncMock()
+
+        with (
+            patch("main.get_user_timezones", return_value=["Asia/Tokyo", "UTC"]),
+            patch("main.is_summary_due", side_effect=lambda tz: tz == "Asia/Tokyo"),
+            patch("main.iter_month_summaries", side_effect=summaries) as mock_iter,
+            patch("main.logger"),
+        ):
+            await send_month_summaries(bot)
+
+        mock_iter.assert_called_once_with("Asia/Tokyo")
+        bot.send_message.assert_awaited_once()
+
+    async def test_summary_is_due_at_summary_hour_on_the_first(self):
+        with patch("main.datetime") as mock_datetime:
+            mock_datetime.now.return_value = datetime(2026, 11, 1, 10, 1)
+            assert is_summary_due("Asia/Tokyo")
+
+            mock_datetime.now.return_value = datetime(2026, 11, 1, 11, 1)
+            assert not is_summary_due(None)
+
+            mock_datetime.now.return_value = datetime(2026, 11, 2, 10, 1)
+            assert not is_summary_due(None)
+
+        assert mock_datetime.now.call_args.args[0] == ZoneInfo("UTC")
+
+    async def test_send_month_summaries_skips_blocked_users(self):
+        async def summaries():
+            yield [
+                (1, None, [("tech", 50.0, 0.0)]),
+                (2, "USD", [("gifts", 3.0, 0.0)]),
+            ]
+            yield [(3, None, [("housing", 0.0, 7.0)])]
+            yield [(4, None, [("tech", 1.0, 0.0)])]
+
+        bot = MagicMock()
+        bot.send_message = AsyncMock(
+            side_effect=[
+                None,
+                TelegramForbiddenError(MagicMock(), "blocked"),
+                TelegramNetworkError(MagicMock(), "timeout"),
+                None,
+            ]
+        )
+
+        with (
+            patch("main.get_user_timezones", return_value=[]),
+            patch("main.is_summary_due", return_value=True),
+            patch("main.iter_month_summaries", return_value=summaries()),
+            patch("main.logger") as mock_logger,
+        ):
+            await send_month_summaries(bot)
+
+        assert [call.args[0] for call in bot.send_message.call_args_list] == [
+            1,
+            2,
+            3,
+            4,
+        ]
+        assert "3.00$" in bot.send_message.call_args_list[1].args[1]
+        mock_logger.info.assert_called_with("Month summaries sent to 2 users.")
+        mock_logger.error.assert_called_once_with(
+            "Error sending month summary to 3: HTTP Client says - timeout"
+        )
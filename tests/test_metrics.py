@@ -0,0 +1,157 @@
+import socket
+import time
+from types import SimpleNamespace
+
+import aiohttp
+import pytest
+
+from metrics import (
+    Counter,
+    HandlerMetricsMiddleware,
+    Histogram,
+    Registry,
+    start_metrics_server,
+    timed,
+)
+
+
+def make_histogram():
+    return Histogram("test_seconds", "Test histogram.", "function", (0.1, 1.0))
+
+
+class TestHistogram:
+    def test_render_is_cumulative(self):
+        histogram = make_histogram()
+        histogram.observe("query", 0.05)
+        histogram.observe("query", 0.5)
+        histogram.observe("query", 5.0)
+
+        assert histogram.render() == [
+            "# HELP test_seconds Test histogram.",
+            "# TYPE test_seconds histogram",
+            'test_seconds_bucket{function="query",le="0.1"} 1',
+            'test_seconds_bucket{function="query",le="1.0"} 2',
+            'test_seconds_bucket{function="query",le="+Inf"} 3',
+            'test_seconds_sum{function="query"} 5.55',
+            'test_seconds_count{function="query"} 3',
+        ]
+
+    def test_registry_runs_collectors_before_rendering(self):
+        counter = Counter("test_total", "Test counter.", "event")
+        test_registry = Registry()
+        test_registry.register(counter)
+        test_registry.add_collector(lambda: counter.set("sent", 7))
+
+        assert 'test_total{event="sent"} 7' in test_registry.render()
+
+
+@pytest.mark.asyncio
+class TestTimed:
+    async def test_times_every_kind_of_function(self):
+        histogram = make_histogram()
+
+        @timed(histogram)
+        def sync_function():
+            return 1
+
+        @timed(histogram)
+        async def async_function():
+            return 2
+
+        @timed(histogram)
+        async def async_generator():
+            yield 3
+
+        assert sync_function() == 1
+        assert await async_function() == 2
+        assert [item async for item in async_generator()] == [3]
+        assert set(histogram.values) == {
+            "sync_function",
+            "async_function",
+            "async_generator",
+        }
+
+    async def test_generator_time_excludes_the_consumer(self):
+        histogram = make_histogram()
+
+        @timed(histogram)
+        async def async_generator():
+            yield 1
+            yield 2
+
+        async for _ in async_generator():
+            time.sleep(0.2)
+
+        counts, total = histogram.values["async_generator"]
+        assert sum(counts) == 1
+        assert total < 0.1
+
+    async def test_records_failed_calls(self):
+        histogram = make_histogram()
+
+        @timed(histogram)
+        async def failing():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            await failing()
+
+        assert sum(histogram.values["failing"][0]) == 1
+
+
+@pytest.mark.asyncio
+class TestHandlerMetricsMiddleware:
+    async def test_records_latency_by_handler_name(self):
+        histogram = make_histogram()
+        middleware = HandlerMetricsMiddleware(histogram)
+
+        async def reports(event, data):
+            return "done"
+
+        data = {"handler": SimpleNamespace(callback=reports)}
+
+        assert await middleware(reports, object(), data) == "done"
+        assert "reports" in histogram.values
+
+    async def test_overhead_is_under_50us_per_update(self):
+        middleware = HandlerMetricsMiddleware(make_histogram())
+
+        async def handler(event, data):
+            return None
+
+        data = {"handler": SimpleNamespace(callback=handler)}
+        iterations = 10_000
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await handler(None, data)
+        baseline = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await middleware(handler, None, data)
+        measured = time.perf_counter() - start
+
+        assert (measured - baseline) / iterations < 50e-6
+
+
+@pytest.mark.asyncio
+class TestMetricsServer:
+    async def test_serves_prometheus_text(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+
+        runner = await start_metrics_server("127.0.0.1", port)
+
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(f"http://127.0.0.1:{port}/metrics") as response:
+                    body = await response.text()
+
+            assert response.status == 200
+            assert response.content_type == "text/plain"
+            assert "# TYPE handler_duration_seconds histogram" in body
+
+        finally:
+            await runner.cleanup()
@@ -0,0 +1,166 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    AnswerCallbackQuery,
+    DeleteMessage,
+    EditMessageReplyMarkup,
+    EditMessageText,
+    SendMessage,
+)
+
+from outbound import (
+    BROADCAST,
+    INTERACTIVE,
+    OutboundScheduler,
+    TokenBucket,
+    broadcast_lane,
+    is_rate_limited,
+)
+
+
+def send(chat_id: int) -> SendMessage:
+    return SendMessage(chat_id=chat_id, text="Hi")
+
+
+class TestTokenBucket:
+    def test_bucket_allows_burst_then_waits(self):
+        bucket = TokenBucket(rate=10, capacity=2)
+        now = bucket.updated
+
+        assert bucket.delay(now) == 0
+        bucket.consume()
+        bucket.consume()
+        assert bucket.delay(now) == pytest.approx(0.1)
+        assert bucket.delay(now + 0.11) == 0
+
+    def test_is_rate_limited(self):
+        assert is_rate_limited(send(1))
+        assert is_rate_limited(EditMessageText(chat_id=1, message_id=1, text="Hi"))
+        assert is_rate_limited(DeleteMessage(chat_id=1, message_id=1))
+        assert not is_rate_limited(AnswerCallbackQuery(callback_query_id="1"))
+
+
+@pytest.mark.asyncio
+class TestOutboundScheduler:
+    async def test_per_chat_limit(self):
+        scheduler = OutboundScheduler(global_rate=1000, chat_rate=20, chat_burst=1)
+        make_request = AsyncMock(return_value="ok")
+
+        started = time.perf_counter()
+        for _ in range(3):
+            await scheduler(make_request, MagicMock(), send(1))
+        elapsed = time.perf_counter() - started
+
+        assert make_request.call_count == 3
+        assert elapsed >= 0.09
+        assert scheduler.stats[f"sent_{INTERACTIVE}"] == 3
+
+    async def test_other_chats_are_not_delayed(self):
+        scheduler = OutboundScheduler(global_rate=1000, chat_rate=1, chat_burst=1)
+        make_request = AsyncMock(return_value="ok")
+
+        started = time.perf_counter()
+        for chat_id in range(20):
+            await scheduler(make_request, MagicMock(), send(chat_id))
+
+        assert time.perf_counter() - started < 0.5
+
+    async def test_edits_share_the_chat_limit(self):
+        scheduler = OutboundScheduler(global_rate=1000, chat_rate=20, chat_burst=1)
+        make_request = AsyncMock(return_value=True)
+
+        started = time.perf_counter()
+        await scheduler(make_request, MagicMock(), send(1))
+        await scheduler(
+            make_request,
+            MagicMock(),
+            EditMessageReplyMarkup(chat_id=1, message_id=1),
+        )
+        await scheduler(
+            make_request, MagicMock(), DeleteMessage(chat_id=1, message_id=1)
+        )
+
+        assert time.perf_counter() - started >= 0.09
+        assert set(scheduler.chat_buckets) == {1}
+
+    async def test_unlimited_methods_skip_buckets(self):
+        scheduler = OutboundScheduler()
+        make_request = AsyncMock(return_value=True)
+
+        await scheduler(
+            make_request, MagicMock(), AnswerCallbackQuery(callback_query_id="1")
+        )
+
+        assert scheduler.chat_buckets == {}
+
+    async def test_interactive_goes_before_broadcast(self):
+        scheduler = OutboundScheduler(global_rate=50, chat_rate=1000, chat_burst=1000)
+        scheduler.global_bucket.tokens = 0
+        order = []
+
+        async def make_request(bot, method):
+            order.append(method.text)
+            return "ok"
+
+        async def broadcast(chat_id):
+            with broadcast_lane():
+                await scheduler(make_request, MagicMock(), send(chat_id))
+
+        async def reply(chat_id):
+            await asyncio.sleep(0.005)
+            message = SendMessage(chat_id=chat_id, text="reply")
+            await scheduler(make_request, MagicMock(), message)
+
+        await asyncio.gather(broadcast(1), broadcast(2), reply(3))
+
+        assert order[0] == "reply"
+
+    async def test_queue_depth(self):
+        scheduler = OutboundScheduler(global_rate=10, chat_rate=1000, chat_burst=1000)
+        scheduler.global_bucket.tokens = 0
+        make_request = AsyncMock(return_value="ok")
+
+        async def broadcast():
+            with broadcast_lane():
+                await scheduler(make_request, MagicMock(), send(1))
+
+        task = asyncio.create_task(broadcast())
+        await asyncio.sleep(0.01)
+
+        assert scheduler.queue_depth == {INTERACTIVE: 0, BROADCAST: 1}
+        await task
+        assert scheduler.queue_depth == {INTERACTIVE: 0, BROADCAST: 0}
+
+    async def test_retry_after_is_retried(self):
+        scheduler = OutboundScheduler()
+        method = send(1)
+        make_request = AsyncMock(
+            side_effect=[
+                TelegramRetryAfter(method=method, message="Flood", retry_after=0),
+                "ok",
+            ]
+        )
+
+        result = await scheduler(make_request, MagicMock(), method)
+
+        assert result == "ok"
+        assert make_request.call_count == 2
+        assert scheduler.stats["retry_after"] == 1
+
+    async def test_retry_after_gives_up(self):
+        scheduler = OutboundScheduler(max_retries=1)
+        method = send(1)
+        make_request = AsyncMock(
+            side_effect=TelegramRetryAfter(
+                method=method, message="Flood", retry_after=0
+            )
+        )
+
+        with pytest.raises(TelegramRetryAfter):
+            await scheduler(make_request, MagicMock(), method)
+
+        assert make_request.call_count == 2
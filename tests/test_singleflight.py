@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+class TestSingleFlight:
+    async def test_concurrent_calls_share_result(self):
+        flight = SingleFlight()
+        calls = 0
+
+        async def compute(value):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return value * 2
+
+        results = await asyncio.gather(
+            *(flight.do((1, "stats", ()), compute, 21) for _ in range(5))
+        )
+
+        assert results == [42] * 5
+        assert calls == 1
+        assert flight.calls["stats"] == 5
+        assert flight.coalesced["stats"] == 4
+        assert flight.in_flight == 0
+
+    async def test_different_keys_are_not_coalesced(self):
+        flight = SingleFlight()
+
+        async def compute(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        results = await asyncio.gather(
+            flight.do((1, "report", True), compute, "all"),
+            flight.do((1, "report", False), compute, "month"),
+            flight.do((2, "report", True), compute, "other"),
+        )
+
+        assert results == ["all", "month", "other"]
+        assert flight.coalesced["report"] == 0
+
+    async def test_sequential_calls_recompute(self):
+        flight = SingleFlight()
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            return calls
+
+        assert await flight.do((1, "stats", ()), compute) == 1
+        assert await flight.do((1, "stats", ()), compute) == 2
+
+    async def test_exception_is_shared(self):
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("Test error")
+
+        results = await asyncio.gather(
+            flight.do((1, "stats", ()), fail),
+            flight.do((1, "stats", ()), fail),
+            return_exceptions=True,
+        )
+
+        assert all(isinstance(result, ValueError) for result in results)
+        assert flight.in_flight == 0
+
+    async def test_cancelled_leader_does_not_cancel_waiters(self):
+        flight = SingleFlight()
+        started = asyncio.Event()
+
+        async def compute():
+            started.set()
+            await asyncio.sleep(0.01)
+            return 42
+
+        leader = asyncio.create_task(flight.do((1, "stats", ()), compute))
+        await started.wait()
+        waiter = asyncio.create_task(flight.do((1, "stats", ()), compute))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+
+        assert await waiter == 42
+        assert leader.cancelled()
+        assert flight.in_flight == 0
+
+    async def test_work_is_cancelled_when_every_caller_is(self):
+        flight = SingleFlight()
+        finished = False
+
+        async def compute():
+            nonlocal finished
+            await asyncio.sleep(1)
+            finished = True
+
+        callers = [
+            asyncio.create_task(flight.do((1, "stats", ()), compute)) for _ in range(2)
+        ]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+
+        assert not finished
+        assert flight.in_flight == 0
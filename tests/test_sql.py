@@ -1,24 +1,60 @@
+import asyncio
 import sys
+from datetime import datetime, timezone
 from pathlib import Path
 from unittest.mock import AsyncMock, patch
 
+import aiosqlite
 import pytest
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+import sql
 from sql import (
+    Periods,
+    UserSettings,
+    _execute,
     add_expense,
+    add_expenses,
     add_new_subscription,
     add_saving,
+    connect_database,
+    create_report,
+    delete_expense,
     disable_month_subscription,
     enable_month_subscription,
     get_all_categories_and_values,
+    get_budget_progress,
+    get_budgets,
+    get_category_stats,
     get_current_date,
+    get_daily_category_totals,
+    get_daily_expenses,
+    get_dataframes,
+    get_exchange_rate,
+    get_expense,
+    get_expenses_page,
     get_month_subscriptions_expenses,
     get_month_total_expenses,
+    get_monthly_category_totals,
+    get_periods,
+    get_recent_expenses,
+    get_recent_months,
     get_savings,
+    get_slowest_queries,
     get_subscriptions_breakdown,
+    get_subscriptions_page,
+    get_user_settings,
     get_year_expenses,
+    iter_month_summaries,
+    load_fx_rates,
+    remove_budget,
+    renew_active_subscriptions,
+    request_periods,
+    set_budget,
+    set_user_currency,
+    set_user_timezone,
+    update_expense_amount,
 )
 
 
@@ -51,6 +87,7 @@ class TestSQLFunctions:
 
         mock_db = AsyncMock()
         mock_db.cursor.return_value = mock_cursor
+        mock_cursor.execute.return_value = mock_cursor
         mock_connect.return_value.__aenter__.return_value = mock_db
 
         result = await get_month_total_expenses(123)
@@ -64,6 +101,7 @@ class TestSQLFunctions:
 
         mock_db = AsyncMock()
         mock_db.cursor.return_value = mock_cursor
+        mock_cursor.execute.return_value = mock_cursor
         mock_connect.return_value.__aenter__.return_value = mock_db
 
         result = await get_month_total_expenses(123)
@@ -77,6 +115,7 @@ class TestSQLFunctions:
 
         mock_db = AsyncMock()
         mock_db.cursor.return_value = mock_cursor
+        mock_cursor.execute.return_value = mock_cursor
         mock_connect.return_value.__aenter__.return_value = mock_db
 
         result = await get_savings(123, True)
@@ -90,6 +129,7 @@ class TestSQLFunctions:
 
         mock_db = AsyncMock()
         mock_db.cursor.return_value = mock_cursor
+        mock_cursor.execute.return_value = mock_cursor
         mock_connect.return_value.__aenter__.return_value = mock_db
 
         result = await get_savings(123, True)
@@ -103,6 +143,7 @@ class TestSQLFunctions:
 
         mock_db = AsyncMock()
         mock_db.cursor.return_value = mock_cursor
+        mock_cursor.execute.return_value = mock_cursor
         mock_connect.return_value.__aenter__.return_value = mock_db
 
         result = await get_savings(123, False)
@@ -116,6 +157,7 @@ class TestSQLFunctions:
 
         mock_db = AsyncMock()
         mock_db.cursor.return_value = mock_cursor
+        mock_cursor.execute.return_value = mock_cursor
         mock_connect.return_value.__aenter__.return_value = mock_db
 
         result = await get_savings(123, False)
@@ -146,7 +188,7 @@ class TestSQLFunctions:
         mock_db = AsyncMock()
         mock_connect.return_value.__aenter__.return_value = mock_db
 
-        await disable_month_subscription(123, "Netflix")
+        await disable_month_subscription(123, 7)
 
         mock_db.execute.assert_called_once()
         mock_db.commit.assert_called_once()
@@ -159,7 +201,7 @@ class TestSQLFunctions:
         mock_db = AsyncMock()
         mock_connect.return_value.__aenter__.return_value = mock_db
 
-        await enable_month_subscription(123, "Netflix")
+        await enable_month_subscription(123, 7)
 
         mock_db.execute.assert_called_once()
         mock_db.commit.assert_called_once()
@@ -187,6 +229,7 @@ class TestSQLFunctions:
 
         mock_db = AsyncMock()
         mock_db.cursor.return_value = mock_cursor
+        mock_cursor.execute.return_value = mock_cursor
         mock_connect.return_value.__aenter__.return_value = mock_db
 
         result = await get_all_categories_and_values(123)
@@ -201,6 +244,7 @@ class TestSQLFunctions:
 
         mock_db = AsyncMock()
         mock_db.cursor.return_value = mock_cursor
+        mock_cursor.execute.return_value = mock_cursor
         mock_connect.return_value.__aenter__.return_value = mock_db
 
         result = await get_year_expenses(123)
@@ -214,6 +258,7 @@ class TestSQLFunctions:
 
         mock_db = AsyncMock()
         mock_db.cursor.return_value = mock_cursor
+        mock_cursor.execute.return_value = mock_cursor
         mock_connect.return_value.__aenter__.return_value = mock_db
 
         result = await get_year_expenses(123)
@@ -256,6 +301,7 @@ class TestSQLFunctions:
 
         mock_db = AsyncMock()
         mock_db.cursor.return_value = mock_cursor
+        mock_cursor.execute.return_value = mock_cursor
         mock_connect.return_value.__aenter__.return_value = mock_db
 
         result = await get_month_subscriptions_expenses(123)
@@ -269,8 +315,706 @@ class TestSQLFunctions:
 
         mock_db = AsyncMock()
         mock_db.cursor.return_value = mock_cursor
+        mock_cursor.execute.return_value = mock_cursor
         mock_connect.return_value.__aenter__.return_value = mock_db
 
         result = await get_month_subscriptions_expenses(123)
 
         assert result == 0.0
+
+    async def test_get_recent_months(self):
+        months = get_recent_months(12)
+
+        assert len(months) == 12
+        assert months == sorted(months)
+        assert months[-1] == get_current_date()[:7]
+
+    @patch("sql.aiosqlite.connect")
+    async def test_get_monthly_category_totals(self, mock_connect):
+        mock_cursor = AsyncMock()
+        mock_cursor.fetchall = AsyncMock(
+            return_value=[("2026-09", "🍔 Fast Food", 100.0)]
+        )
+
+        mock_db = AsyncMock()
+        mock_db.cursor.return_value = mock_cursor
+        mock_cursor.execute.return_value = mock_cursor
+        mock_connect.return_value.__aenter__.return_value = mock_db
+
+        result = await get_monthly_category_totals(123, ["2026-08", "2026-09"])
+
+        assert result == [("2026-09", "🍔 Fast Food", 100.0)]
+        call_args = mock_cursor.execute.call_args[0]
+        assert "GROUP BY user_id, month, category" in call_args[0]
+        assert call_args[1] == (123, "2026-08-01", "2026-10-01")
+
+    async def test_get_monthly_category_totals_skips_later_months(self, tmp_path):
+        path = str(tmp_path / "trends.db")
+
+        with patch("sql.DB_PATH", path):
+            await connect_database()
+
+            async with aiosqlite.connect(path) as db:
+                await db.executemany(
+                    "INSERT INTO expenses (user_id, category, amount, date) "
+                    "VALUES (123, '🍎 Groceries', ?, ?)",
+                    [(1.0, "2025-11-30"), (2.0, "2025-12-31"), (4.0, "2026-01-01")],
+                )
+                await db.commit()
+
+            rows = await get_monthly_category_totals(123, ["2025-11", "2025-12"])
+
+        assert sorted(rows) == [
+            ("2025-11", "🍎 Groceries", 1.0),
+            ("2025-12", "🍎 Groceries", 2.0),
+        ]
+
+    @patch("sql.aiosqlite.connect")
+    async def test_get_daily_expenses(self, mock_connect):
+        mock_cursor = AsyncMock()
+        mock_cursor.fetchall = AsyncMock(return_value=[(0, 10.0), (5, 2.5)])
+
+        mock_db = AsyncMock()
+        mock_db.cursor.return_value = mock_cursor
+        mock_cursor.execute.return_value = mock_cursor
+        mock_connect.return_value.__aenter__.return_value = mock_db
+
+        result = await get_daily_expenses(123, 2026)
+
+        assert result == [(0, 10.0), (5, 2.5)]
+        call_args = mock_cursor.execute.call_args[0]
+        assert call_args[1] == (123, "2026-01-01", "2027-01-01")
+
+    async def test_iter_month_summaries_streams_users_in_chunks(self, tmp_path):
+        path = str(tmp_path / "summary.db")
+        previous, current, this_month = get_recent_months(3)
+
+        with patch("sql.DB_PATH", path):
+            await connect_database()
+
+            async with aiosqlite.connect(path) as db:
+                await db.executemany(
+                    "INSERT INTO expenses (user_id, category, amount, date) "
+                    "VALUES (?, ?, ?, ?)",
+                    [
+                        (1, "groceries", 10.0, f"{current}-05"),
+                        (1, "groceries", 5.0, f"{previous}-20"),
+                        (1, "tech", 50.0, f"{current}-10"),
+                        (2, "housing", 7.0, f"{previous}-01"),
+                        (3, "gifts", 3.0, f"{current}-28"),
+                        (3, "gifts", 100.0, f"{this_month}-01"),
+                    ],
+                )
+                await db.execute(
+                    "INSERT INTO user_settings (user_id, currency) VALUES (2, 'USD')"
+                )
+                await db.commit()
+
+            with patch("sql.aiosqlite.connect", wraps=aiosqlite.connect) as connect:
+                chunks = [chunk async for chunk in iter_month_summaries(chunk_size=2)]
+
+        assert chunks == [
+            [
+                (1, None, [("tech", 50.0, 0.0), ("groceries", 10.0, 5.0)]),
+                (2, "USD", [("housing", 0.0, 7.0)]),
+            ],
+            [(3, None, [("gifts", 3.0, 0.0)])],
+        ]
+        connect.assert_called_once()
+
+    async def test_iter_month_summaries_per_time_zone(self, tmp_path):
+        path = str(tmp_path / "summary.db")
+        current = get_recent_months(2)[0]
+
+        with patch("sql.DB_PATH", path):
+            await connect_database()
+            await add_expenses(1, [("tech", 5.0, "EUR", 5.0)])
+            await add_expenses(2, [("gifts", 3.0, "EUR", 3.0)])
+
+            async with aiosqlite.connect(path) as db:
+                await db.execute(f"UPDATE expenses SET date = '{current}-10'")
+                await db.execute(
+                    "INSERT INTO user_settings (user_id, timezone) VALUES (2, 'UTC')"
+                )
+                await db.commit()
+
+            default = [chunk async for chunk in iter_month_summaries()]
+            utc = [chunk async for chunk in iter_month_summaries("UTC")]
+
+        assert default == [[(1, None, [("tech", 5.0, 0.0)])]]
+        assert utc == [[(2, None, [("gifts", 3.0, 0.0)])]]
+
+    async def test_slow_queries_are_logged_with_a_cached_plan(self, tmp_path):
+        path = str(tmp_path / "slow.db")
+
+        with (
+            patch("sql.DB_PATH", path),
+            patch("sql.SLOW_QUERY_THRESHOLD_MS", 0),
+            patch("sql.slow_queries", {}),
+            patch("sql._query_plans", {}),
+            patch("sql.logger") as mock_logger,
+        ):
+            await connect_database()
+            await get_daily_expenses(123, 2026)
+
+            # The plan is cached, so no extra connection is opened for EXPLAIN.
+            with patch("sql.aiosqlite.connect", wraps=aiosqlite.connect) as connect:
+                await get_daily_expenses(789, 2026)
+                await get_daily_expenses(456, 2026)
+
+            assert connect.call_count == 2
+
+            slowest = get_slowest_queries(5)
+
+        message = mock_logger.warning.call_args[0][0]
+        assert "params=(int, str, str)" in message
+        assert "456" not in message
+        assert "USING INDEX idx_expenses_user_date" in message
+
+        assert len(slowest) == 1
+        statement, stats = slowest[0]
+        assert statement.startswith("SELECT CAST(strftime('%j', date) AS INTEGER)")
+        assert stats["count"] == 3
+
+    async def test_batch_inserts_and_report_reads_are_logged_when_slow(self, tmp_path):
+        path = str(tmp_path / "slow.db")
+
+        with (
+            patch("sql.DB_PATH", path),
+            patch("sql.SLOW_QUERY_THRESHOLD_MS", 0),
+            patch("sql.slow_queries", {}),
+            patch("sql._query_plans", {}),
+            patch("sql.logger"),
+        ):
+            await connect_database()
+            await add_expenses(123, [("🍎 Groceries", 23.1, "EUR", 23.1)])
+            await get_dataframes(123, True)
+
+            statements = [statement for statement, _ in get_slowest_queries(10)]
+
+        assert any(s.startswith("INSERT INTO expenses") for s in statements)
+        assert "SELECT * FROM expenses WHERE user_id = ?" in statements
+
+    async def test_slow_query_timing_includes_the_fetch(self):
+        async def slow_fetchall():
+            await asyncio.sleep(0.05)
+            return [("row",)]
+
+        cursor = AsyncMock()
+        cursor.fetchall = slow_fetchall
+        db = AsyncMock()
+        db.execute.return_value = cursor
+
+        with (
+            patch("sql.SLOW_QUERY_THRESHOLD_MS", 40),
+            patch("sql.slow_queries", {}),
+            patch("sql._query_plans", {"SELECT 1": "SCAN"}),
+            patch("sql.logger"),
+        ):
+            rows = await _execute(db, "SELECT 1", fetch="all")
+            slowest = get_slowest_queries(1)
+
+        assert rows == [("row",)]
+        assert slowest[0][0] == "SELECT 1"
+
+    async def test_old_rows_are_backfilled_so_reports_build(
+        self, tmp_path, monkeypatch
+    ):
+        path = str(tmp_path / "old.db")
+        monkeypatch.chdir(tmp_path)
+
+        async with aiosqlite.connect(path) as db:
+            await db.execute(
+                "CREATE TABLE expenses (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "user_id INTEGER, category TEXT, amount REAL, date TEXT)"
+            )
+            await db.execute(
+                "CREATE TABLE savings (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "user_id INTEGER, amount REAL, date TEXT)"
+            )
+            await db.execute(
+                "INSERT INTO expenses (user_id, category, amount, date) "
+                "VALUES (1, '🍎 Groceries', 5.0, '2026-01-02')"
+            )
+            await db.execute(
+                "INSERT INTO savings (user_id, amount, date) "
+                "VALUES (1, 2.0, '2026-01-02')"
+            )
+            await db.commit()
+
+        with patch("sql.DB_PATH", path):
+            await connect_database()
+            await add_expense(1, "🍎 Groceries", 3.0)
+            report_path = await create_report(1, True)
+
+        assert Path(report_path).exists()
+        async with aiosqlite.connect(path) as db:
+            cursor = await db.execute(
+                "SELECT currency, original_amount FROM expenses ORDER BY id"
+            )
+            assert await cursor.fetchall() == [("EUR", 5.0), ("EUR", 3.0)]
+
+    async def test_add_expenses_inserts_batch_in_one_transaction(self, tmp_path):
+        path = str(tmp_path / "batch.db")
+
+        with patch("sql.DB_PATH", path):
+            await connect_database()
+            await add_expenses(
+                123,
+                [
+                    ("🍎 Groceries", 23.1, "EUR", 23.1),
+                    ("🚗 Transport", 2.8, "USD", 3.0),
+                ],
+            )
+
+        async with aiosqlite.connect(path) as db:
+            cursor = await db.execute(
+                "SELECT user_id, category, amount FROM expenses ORDER BY id"
+            )
+            rows = await cursor.fetchall()
+
+        assert rows == [(123, "🍎 Groceries", 23.1), (123, "🚗 Transport", 2.8)]
+
+    async def test_subscriptions_are_paged_and_toggled_by_id(self, tmp_path):
+        path = str(tmp_path / "subscriptions.db")
+
+        with patch("sql.DB_PATH", path):
+            await connect_database()
+            for index in range(5):
+                await add_new_subscription(123, f"Sub{index}", 1.0)
+            await add_new_subscription(456, "Other", 1.0)
+
+            first = await get_subscriptions_page(123, True, True, limit=2)
+            second = await get_subscriptions_page(
+                123, True, True, first[-1][0], limit=2
+            )
+            back = await get_subscriptions_page(
+                123, True, True, second[0][0], backwards=True, limit=2
+            )
+
+            assert first == [(1, "Sub0"), (2, "Sub1")]
+            assert second == [(3, "Sub2"), (4, "Sub3")]
+            assert back == [(2, "Sub1"), (1, "Sub0")]
+
+            assert await disable_month_subscription(123, 3) == "Sub2"
+            assert await disable_month_subscription(123, 6) is None
+            assert await get_subscriptions_page(123, False, False) == [(3, "Sub2")]
+            assert await enable_month_subscription(123, 3) == "Sub2"
+
+    async def test_expenses_are_paged_newest_first_by_date_and_id(self, tmp_path):
+        path = str(tmp_path / "history.db")
+
+        with patch("sql.DB_PATH", path):
+            await connect_database()
+
+            async with aiosqlite.connect(path) as db:
+                await db.executemany(
+                    "INSERT INTO expenses (user_id, category, amount, date) "
+                    "VALUES (?, ?, ?, ?)",
+                    [
+                        (123, "🍎 Groceries", 1.0, "2024-01-02"),
+                        (123, "🚗 Transport", 2.0, "2024-01-01"),
+                        (123, "🍎 Groceries", 3.0, "2024-01-02"),
+                        (123, "🍎 Groceries", 4.0, "2023-12-31"),
+                        (456, "🍎 Groceries", 5.0, "2024-01-03"),
+                    ],
+                )
+                await db.commit()
+
+            first = await get_expenses_page(123, limit=2)
+            second = await get_expenses_page(123, cursor=("2024-01-02", 1), limit=2)
+            back = await get_expenses_page(
+                123, cursor=("2024-01-01", 2), backwards=True, limit=2
+            )
+
+            assert [row[0] for row in first] == [3, 1]
+            assert [row[0] for row in second] == [2, 4]
+            assert [row[0] for row in back] == [1, 3]
+
+            groceries = await get_expenses_page(
+                123, "🍎 Groceries", start_date="2024-01-01"
+            )
+            assert [row[0] for row in groceries] == [3, 1]
+
+    async def test_expenses_are_edited_and_deleted_by_id(self, tmp_path):
+        path = str(tmp_path / "edit.db")
+
+        with patch("sql.DB_PATH", path):
+            await connect_database()
+            ids = [
+                await add_expense(123, "🍎 Groceries", amount) for amount in range(1, 7)
+            ]
+            other_id = await add_expense(456, "🚗 Transport", 9.0)
+
+            recent = await get_recent_expenses(123)
+            assert [row[0] for row in recent] == ids[:0:-1]
+
+            assert await update_expense_amount(123, ids[0], 1.5) == (
+                "🍎 Groceries",
+                1.5,
+                get_current_date(),
+            )
+            assert await update_expense_amount(123, other_id, 1.5) is None
+            assert (await get_expense(123, ids[0]))[:2] == ("🍎 Groceries", 1.5)
+
+            assert await delete_expense(123, ids[-1]) == (
+                "🍎 Groceries",
+                6.0,
+                get_current_date(),
+            )
+            assert await delete_expense(123, other_id) is None
+            assert await get_expense(123, ids[-1]) is None
+            assert await get_expense(456, other_id) is not None
+
+    async def test_expense_rollups_follow_every_change(self, tmp_path):
+        path = str(tmp_path / "rollups.db")
+
+        async def rollups():
+            async with aiosqlite.connect(path) as db:
+                cursor = await db.execute(
+                    "SELECT category, total FROM expense_rollups "
+                    "WHERE user_id = 123 ORDER BY category"
+                )
+                return await cursor.fetchall()
+
+        with patch("sql.DB_PATH", path):
+            await connect_database()
+            first = await add_expense(123, "🍎 Groceries", 10.0)
+            await add_expense(123, "🍎 Groceries", 5.0)
+            second = await add_expense(123, "🚗 Transport", 2.0)
+
+            assert await rollups() == [("🍎 Groceries", 15.0), ("🚗 Transport", 2.0)]
+
+            await update_expense_amount(123, first, 20.0)
+            await delete_expense(123, second)
+
+            assert await rollups() == [("🍎 Groceries", 25.0), ("🚗 Transport", 0.0)]
+
+    async def test_expense_rollups_are_backfilled_once(self, tmp_path):
+        path = str(tmp_path / "backfill.db")
+
+        async with aiosqlite.connect(path) as db:
+            await db.execute(
+                "CREATE TABLE expenses (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "user_id INTEGER, category TEXT, amount REAL, date TEXT)"
+            )
+            await db.executemany(
+                "INSERT INTO expenses (user_id, category, amount, date) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (123, "🍎 Groceries", 1.0, "2024-01-02"),
+                    (123, "🍎 Groceries", 2.0, "2024-01-30"),
+                    (123, "🍎 Groceries", 4.0, "2024-02-01"),
+                ],
+            )
+            await db.commit()
+
+        with patch("sql.DB_PATH", path):
+            await connect_database()
+            await connect_database()
+
+        async with aiosqlite.connect(path) as db:
+            cursor = await db.execute(
+                "SELECT month, total FROM expense_rollups ORDER BY month"
+            )
+            assert await cursor.fetchall() == [("2024-01", 3.0), ("2024-02", 4.0)]
+
+    async def test_budgets_report_this_months_rollup(self, tmp_path):
+        path = str(tmp_path / "budgets.db")
+
+        with patch("sql.DB_PATH", path):
+            await connect_database()
+            await set_budget(123, "🍎 Groceries", 100.0)
+            await set_budget(123, "🍎 Groceries", 200.0)
+            await set_budget(123, "🚗 Transport", 50.0)
+            await add_expense(123, "🍎 Groceries", 30.0)
+
+            assert await get_budget_progress(123, "🍎 Groceries") == (30.0, 200.0)
+            assert await get_budget_progress(123, "🎁 Gifts") is None
+            assert await get_budgets(123) == [
+                ("🍎 Groceries", 200.0, 30.0),
+                ("🚗 Transport", 50.0, 0),
+            ]
+
+            assert await remove_budget(123, "🚗 Transport") is True
+            assert await remove_budget(123, "🚗 Transport") is False
+
+    async def test_get_daily_category_totals(self, tmp_path):
+        path = str(tmp_path / "daily.db")
+
+        with patch("sql.DB_PATH", path):
+            await connect_database()
+
+            async with aiosqlite.connect(path) as db:
+                await db.executemany(
+                    "INSERT INTO expenses (user_id, category, amount, date) "
+                    "VALUES (?, ?, ?, ?)",
+                    [
+                        (123, "🍎 Groceries", 1.0, "2024-01-02"),
+                        (123, "🍎 Groceries", 2.0, "2024-01-02"),
+                        (123, "🚗 Transport", 4.0, "2024-01-31"),
+                        (123, "🍎 Groceries", 8.0, "2024-02-01"),
+                    ],
+                )
+                await db.commit()
+
+            rows = await get_daily_category_totals(123, "2024-01-01", "2024-02-01")
+
+        assert sorted(rows) == [
+            ("2024-01", 2, "🍎 Groceries", 3.0),
+            ("2024-01", 31, "🚗 Transport", 4.0),
+        ]
+
+    async def test_category_stats_track_mean_and_variance(self, tmp_path):
+        path = str(tmp_path / "stats.db")
+
+        with patch("sql.DB_PATH", path):
+            await connect_database()
+            ids = [
+                await add_expense(123, "🍎 Groceries", amount)
+                for amount in (10.0, 20.0, 30.0, 100.0)
+            ]
+            await delete_expense(123, ids[-1])
+            await update_expense_amount(123, ids[0], 40.0)
+
+            count, mean, m2 = await get_category_stats(123, "🍎 Groceries")
+
+        # Remaining amounts: 40, 20, 30.
+        assert count == 3
+        assert mean == pytest.approx(30.0)
+        assert m2 / (count - 1) == pytest.approx(100.0)
+
+    async def test_category_stats_are_backfilled(self, tmp_path):
+        path = str(tmp_path / "stats_backfill.db")
+
+        async with aiosqlite.connect(path) as db:
+            await db.execute(
+                "CREATE TABLE expenses (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "user_id INTEGER, category TEXT, amount REAL, date TEXT)"
+            )
+            await db.executemany(
+                "INSERT INTO expenses (user_id, category, amount, date) "
+                "VALUES (123, '🍎 Groceries', ?, '2024-01-01')",
+                [(2.0,), (4.0,), (9.0,)],
+            )
+            await db.commit()
+
+        with patch("sql.DB_PATH", path):
+            await connect_database()
+            count, mean, m2 = await get_category_stats(123, "🍎 Groceries")
+
+        assert count == 3
+        assert mean == pytest.approx(5.0)
+        assert m2 == pytest.approx(26.0)
+
+    async def test_get_periods_follows_the_time_zone(self):
+        moment = datetime(2024, 12, 31, 23, 30, tzinfo=timezone.utc)
+
+        with patch("sql.datetime") as mock_datetime:
+            mock_datetime.now.side_effect = moment.astimezone
+            utc = get_periods("UTC")
+            sydney = get_periods("Etc/GMT-10")
+
+        assert utc == Periods(
+            "2024-12-31", "2024-12-01", "2025-01-01", "2024-01-01", "2025-01-01"
+        )
+        assert sydney == Periods(
+            "2025-01-01", "2025-01-01", "2025-02-01", "2025-01-01", "2026-01-01"
+        )
+
+    async def test_queries_use_the_request_periods(self, tmp_path):
+        path = str(tmp_path / "periods.db")
+        periods = Periods(
+            "2024-01-31", "2024-01-01", "2024-02-01", "2024-01-01", "2025-01-01"
+        )
+
+        with patch("sql.DB_PATH", path):
+            await connect_database()
+
+            async with aiosqlite.connect(path) as db:
+                await db.executemany(
+                    "INSERT INTO expenses (user_id, category, amount, date) "
+                    "VALUES (123, '🍎 Groceries', ?, ?)",
+                    [(1.0, "2023-12-31"), (2.0, "2024-01-01"), (4.0, "2024-02-01")],
+                )
+                await db.commit()
+
+            token = request_periods.set(periods)
+            try:
+                month = await get_all_categories_and_values(123)
+                year = await get_year_expenses(123)
+                await add_expense(123, "🍎 Groceries", 8.0)
+                recent = await get_recent_expenses(123, 1)
+            finally:
+                request_periods.reset(token)
+
+        assert month == [("🍎 Groceries", 2.0)]
+        assert year == 6.0
+        assert recent[0][3] == "2024-01-31"
+
+    async def test_subscriptions_renew_when_the_users_month_starts(self, tmp_path):
+        path = str(tmp_path / "renewal.db")
+        periods = {
+            None: Periods(
+                "2024-01-31", "2024-01-01", "2024-02-01", "2024-01-01", "2025-01-01"
+            ),
+            "Etc/GMT-10": Periods(
+                "2024-02-01", "2024-02-01", "2024-03-01", "2024-01-01", "2025-01-01"
+            ),
+        }
+
+        with (
+            patch("sql.DB_PATH", path),
+            patch.dict("sql._user_settings", clear=True),
+            patch("sql.get_periods", side_effect=lambda zone=None: periods[zone]),
+        ):
+            await connect_database()
+            await set_user_timezone(2, "Etc/GMT-10")
+
+            async with aiosqlite.connect(path) as db:
+                await db.executemany(
+                    "INSERT INTO subscriptions "
+                    "(user_id, name, amount, count, is_active, date) "
+                    "VALUES (?, 'Netflix', 9.99, 1, 1, '2024-01-05')",
+                    [(1,), (2,)],
+                )
+                await db.commit()
+
+            await renew_active_subscriptions()
+
+        async with aiosqlite.connect(path) as db:
+            cursor = await db.execute(
+                "SELECT user_id, count, date FROM subscriptions ORDER BY user_id"
+            )
+            rows = await cursor.fetchall()
+
+        assert rows == [(1, 1, "2024-01-05"), (2, 2, "2024-02-01")]
+
+    async def test_user_timezone_is_cached(self, tmp_path):
+        path = str(tmp_path / "settings.db")
+
+        with patch("sql.DB_PATH", path), patch.dict("sql._user_settings", clear=True):
+            await connect_database()
+            assert await get_user_settings(123) == UserSettings()
+
+            await set_user_timezone(123, "Europe/Berlin")
+            assert await get_user_settings(123) == UserSettings("Europe/Berlin")
+
+            with patch("sql.aiosqlite.connect") as mock_connect:
+                assert await get_user_settings(123) == UserSettings("Europe/Berlin")
+            mock_connect.assert_not_called()
+
+    async def test_user_settings_cache_evicts_least_recently_used(self, tmp_path):
+        path = str(tmp_path / "settings.db")
+
+        with (
+            patch("sql.DB_PATH", path),
+            patch("sql.MAX_CACHED_SETTINGS", 2),
+            patch.dict("sql._user_settings", clear=True),
+        ):
+            await connect_database()
+            await get_user_settings(1)
+            await get_user_settings(2)
+            await get_user_settings(1)
+            await set_user_timezone(3, "Europe/Berlin")
+
+            assert list(sql._user_settings) == [1, 3]
+
+    async def test_exchange_rate_uses_latest_rate_up_to_date(self, tmp_path):
+        path = str(tmp_path / "fx.db")
+        rates = tmp_path / "rates.csv"
+        rates.write_text(
+            "date,currency,rate\n"
+            "2024-01-01,USD,1.10\n"
+            "2024-02-01,USD,1.20\n"
+            "2024-01-01,GBP,0.80\n"
+        )
+
+        with patch("sql.DB_PATH", path), patch("sql.FX_RATES_PATH", str(rates)):
+            await connect_database()
+
+            assert await get_exchange_rate("EUR", "USD", "2024-01-20") == 1.1
+            assert await get_exchange_rate("EUR", "USD", "2024-03-01") == 1.2
+            # Dates before the first rate use the earliest one.
+            assert await get_exchange_rate("EUR", "USD", "2023-06-01") == 1.1
+            assert await get_exchange_rate("GBP", "USD", "2024-01-20") == 1.375
+            assert await get_exchange_rate("USD", "CHF", "2024-01-20") is None
+
+    async def test_set_user_currency_converts_history_in_sql(self, tmp_path):
+        path = str(tmp_path / "currency.db")
+        rates = tmp_path / "rates.csv"
+        rates.write_text("date,currency,rate\n2024-01-01,USD,1.25\n")
+
+        with patch("sql.DB_PATH", path), patch.dict("sql._user_settings", clear=True):
+            await connect_database()
+
+            async with aiosqlite.connect(path) as db:
+                assert await load_fx_rates(db, str(rates)) == 1
+                await db.execute(
+                    "INSERT INTO expenses (user_id, category, amount, date) "
+                    "VALUES (123, '🍎 Groceries', 10.0, '2024-01-05')"
+                )
+                await db.execute(
+                    "INSERT INTO expenses "
+                    "(user_id, category, amount, date, currency, original_amount) "
+                    "VALUES (123, '🍎 Groceries', 8.0, '2024-01-06', 'USD', 10.0)"
+                )
+                await db.execute(
+                    "INSERT INTO savings (user_id, amount, date) "
+                    "VALUES (123, 4.0, '2024-01-05')"
+                )
+                await db.commit()
+            await set_budget(123, "🍎 Groceries", 100.0)
+
+            assert await set_user_currency(123, "USD") == []
+            assert (await get_user_settings(123)).currency == "USD"
+
+            async with aiosqlite.connect(path) as db:
+                cursor = await db.execute(
+                    "SELECT amount, currency, original_amount FROM expenses "
+                    "ORDER BY id"
+                )
+                expenses = await cursor.fetchall()
+                cursor = await db.execute("SELECT amount FROM savings")
+                savings = await cursor.fetchall()
+                cursor = await db.execute("SELECT total FROM expense_rollups")
+                rollups = await cursor.fetchall()
+
+            assert expenses == [(12.5, "EUR", 10.0), (10.0, "USD", 10.0)]
+            assert savings == [(5.0,)]
+            assert rollups == [(22.5,)]
+            assert await get_budgets(123) == [("🍎 Groceries", 125.0, 0)]
+
+            assert await set_user_currency(123, "EUR") == []
+            stats = await get_category_stats(123, "🍎 Groceries")
+            assert stats[0] == 2
+            assert stats[1] == pytest.approx(9.0)
+
+    async def test_set_user_currency_needs_rates(self, tmp_path):
+        path = str(tmp_path / "currency.db")
+
+        with patch("sql.DB_PATH", path), patch.dict("sql._user_settings", clear=True):
+            await connect_database()
+            await add_expense(123, "🍎 Groceries", 10.0)
+
+            assert await set_user_currency(123, "GBP") == ["GBP"]
+            assert await get_user_settings(123) == UserSettings()
+            assert (await get_expense(123, 1))[1] == 10.0
+
+    async def test_connect_database_adds_currency_columns(self, tmp_path):
+        path = str(tmp_path / "old.db")
+
+        async with aiosqlite.connect(path) as db:
+            await db.execute(
+                "CREATE TABLE expenses (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "user_id INTEGER, category TEXT, amount REAL, date TEXT)"
+            )
+            await db.commit()
+
+        with patch("sql.DB_PATH", path):
+            await connect_database()
+            await add_expense(123, "🍎 Groceries", 10.0)
+
+        async with aiosqlite.connect(path) as db:
+            cursor = await db.execute("SELECT currency, original_amount FROM expenses")
+            assert await cursor.fetchall() == [("EUR", 10.0)]
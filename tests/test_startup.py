@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+LAZY_MODULES = ("pandas", "matplotlib", "numpy", "xlsxwriter")
+
+# Import time of main.py on top of aiogram itself, in microseconds. aiogram
+# builds all of its pydantic models on import, which we cannot avoid.
+IMPORT_TIME_BUDGET_US = int(os.getenv("IMPORT_TIME_BUDGET_US", "400000"))
+
+
+def import_main_with_importtime() -> dict[str, int]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, total, name = line.split("|")
+        cumulative.setdefault(name.strip(), int(total))
+
+    return cumulative
+
+
+class TestStartup:
+    def test_main_does_not_import_heavy_dependencies(self):
+        imported = import_main_with_importtime()
+
+        loaded = [name for name in imported if name.split(".")[0] in LAZY_MODULES]
+        assert loaded == []
+
+    def test_main_import_time_budget(self):
+        imported = import_main_with_importtime()
+
+        own_import_time = imported["main"] - imported["aiogram"]
+        assert own_import_time < IMPORT_TIME_BUDGET_US
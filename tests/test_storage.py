@@ -0,0 +1,136 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+import pytest_asyncio
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import StorageKey
+
+from sql import connect_database
+from storage import FSMFlushMiddleware, SQLiteStorage
+
+
+class Form(StatesGroup):
+    waiting = State()
+
+
+KEY = StorageKey(bot_id=1, chat_id=123, user_id=123)
+
+
+@pytest_asyncio.fixture
+async def db_path(tmp_path):
+    path = str(tmp_path / "fsm.db")
+    with patch("sql.DB_PATH", path):
+        await connect_database()
+    return path
+
+
+@pytest.mark.asyncio
+class TestSQLiteStorage:
+    async def test_state_and_data_survive_restart(self, db_path):
+        storage = SQLiteStorage(db_path)
+        await storage.set_state(KEY, Form.waiting)
+        await storage.update_data(KEY, {"category": "🍔 Fast Food"})
+        await storage.close()
+
+        restarted = SQLiteStorage(db_path)
+
+        assert await restarted.get_state(KEY) == "Form:waiting"
+        assert await restarted.get_data(KEY) == {"category": "🍔 Fast Food"}
+
+    async def test_writes_are_coalesced_into_one_flush(self, db_path):
+        storage = SQLiteStorage(db_path)
+        await storage.get_state(KEY)
+
+        with patch("storage.aiosqlite.connect") as mock_connect:
+            mock_db = AsyncMock()
+            mock_connect.return_value.__aenter__.return_value = mock_db
+
+            await storage.set_state(KEY, Form.waiting)
+            await storage.update_data(KEY, {"category": "🍔 Fast Food"})
+            await storage.set_data(KEY, {"category": "🚗 Transport"})
+            await storage.flush()
+
+            mock_connect.assert_called_once()
+            mock_db.executemany.assert_called_once()
+            rows = mock_db.executemany.call_args[0][1]
+            assert rows == [
+                (
+                    SQLiteStorage.build_key(KEY),
+                    "Form:waiting",
+                    '{"category": "\\ud83d\\ude97 Transport"}',
+                )
+            ]
+
+    async def test_cached_reads_skip_database(self, db_path):
+        storage = SQLiteStorage(db_path)
+        await storage.get_state(KEY)
+
+        with patch("storage.aiosqlite.connect") as mock_connect:
+            await storage.get_state(KEY)
+            await storage.get_data(KEY)
+
+            mock_connect.assert_not_called()
+
+    async def test_cache_drops_least_recently_used_clean_records(self, db_path):
+        storage = SQLiteStorage(db_path, max_size=2)
+        keys = [StorageKey(bot_id=1, chat_id=user, user_id=user) for user in (1, 2, 3)]
+
+        await storage.set_state(keys[0], Form.waiting)
+        await storage.get_state(keys[1])
+        await storage.get_state(keys[2])
+
+        # The unsaved record stays; the oldest clean one goes.
+        assert list(storage._cache) == [
+            SQLiteStorage.build_key(keys[0]),
+            SQLiteStorage.build_key(keys[2]),
+        ]
+
+        await storage.flush()
+        await storage.get_state(keys[1])
+
+        assert len(storage._cache) == 2
+        assert await storage.get_state(keys[0]) == "Form:waiting"
+
+    async def test_clear_deletes_row(self, db_path):
+        storage = SQLiteStorage(db_path)
+        await storage.set_state(KEY, Form.waiting)
+        await storage.flush()
+
+        await storage.set_state(KEY, None)
+        await storage.set_data(KEY, {})
+        await storage.flush()
+
+        restarted = SQLiteStorage(db_path)
+        assert await restarted.get_state(KEY) is None
+        assert await restarted.get_data(KEY) == {}
+
+    async def test_flush_without_writes_does_nothing(self, db_path):
+        storage = SQLiteStorage(db_path)
+
+        with patch("storage.aiosqlite.connect") as mock_connect:
+            await storage.flush()
+
+            mock_connect.assert_not_called()
+
+    async def test_failed_flush_keeps_records_dirty(self, db_path):
+        storage = SQLiteStorage(db_path)
+        await storage.set_state(KEY, Form.waiting)
+
+        with patch("storage.aiosqlite.connect", side_effect=Exception("Test error")):
+            with pytest.raises(Exception):
+                await storage.flush()
+
+        await storage.flush()
+
+        restarted = SQLiteStorage(db_path)
+        assert await restarted.get_state(KEY) == "Form:waiting"
+
+    async def test_middleware_flushes_after_handler(self):
+        storage = AsyncMock()
+        middleware = FSMFlushMiddleware(storage)
+        handler = AsyncMock(return_value="handled")
+
+        result = await middleware(handler, object(), {})
+
+        assert result == "handled"
+        storage.flush.assert_awaited_once()
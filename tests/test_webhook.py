@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message
+from aiohttp.test_utils import TestClient, TestServer
+
+from webhook import SECRET_HEADER, WEBHOOK_HANDLER_KEY, create_webhook_app
+
+UPDATES = 500
+
+
+def fake_update(update_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1760000000,
+            "chat": {"id": update_id % 50, "type": "private"},
+            "from": {"id": update_id % 50, "is_bot": False, "first_name": "Test"},
+            "text": "📊 Statistics",
+        },
+    }
+
+
+def create_dispatcher(handled: list, delay: float = 0) -> Dispatcher:
+    router = Router()
+
+    @router.message()
+    async def handle(message: Message):
+        await asyncio.sleep(delay)
+        handled.append(message.message_id)
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+async def wait_until(condition, timeout: float = 5.0):
+    deadline = time.perf_counter() + timeout
+    while not condition() and time.perf_counter() < deadline:
+        await asyncio.sleep(0.001)
+
+
+@pytest.mark.asyncio
+class TestWebhook:
+    async def test_webhook_throughput(self):
+        handled = []
+        bot = Bot(token="42:TEST")
+        app = create_webhook_app(create_dispatcher(handled), bot, "/webhook")
+
+        async with TestClient(TestServer(app)) as client:
+            started = time.perf_counter()
+            responses = await asyncio.gather(
+                *(client.post("/webhook", json=fake_update(i)) for i in range(UPDATES))
+            )
+            await wait_until(lambda: len(handled) == UPDATES)
+            elapsed = time.perf_counter() - started
+
+        await bot.session.close()
+
+        assert all(response.status == 200 for response in responses)
+        assert sorted(handled) == list(range(UPDATES))
+        print(f"\nWebhook throughput: {UPDATES / elapsed:.0f} updates/s")
+
+    async def test_webhook_limits_in_flight_updates(self):
+        handled = []
+        bot = Bot(token="42:TEST")
+        app = create_webhook_app(
+            create_dispatcher(handled, delay=0.02), bot, "/webhook", max_in_flight=5
+        )
+        handler = app[WEBHOOK_HANDLER_KEY]
+        peak = 0
+
+        async def watch():
+            nonlocal peak
+            while True:
+                peak = max(peak, handler.in_flight)
+                await asyncio.sleep(0)
+
+        async with TestClient(TestServer(app)) as client:
+            watcher = asyncio.create_task(watch())
+            await asyncio.gather(
+                *(client.post("/webhook", json=fake_update(i)) for i in range(20))
+            )
+            await wait_until(lambda: len(handled) == 20)
+            watcher.cancel()
+
+        await bot.session.close()
+
+        assert len(handled) == 20
+        assert peak <= 5
+
+    async def test_webhook_rejects_wrong_secret(self):
+        handled = []
+        bot = Bot(token="42:TEST")
+        app = create_webhook_app(
+            create_dispatcher(handled), bot, "/webhook", secret_token="secret"
+        )
+
+        async with TestClient(TestServer(app)) as client:
+            rejected = await client.post(
+                "/webhook", json=fake_update(1), headers={SECRET_HEADER: "wrong"}
+            )
+            accepted = await client.post(
+                "/webhook", json=fake_update(2), headers={SECRET_HEADER: "secret"}
+            )
+            await wait_until(lambda: len(handled) == 1)
+
+        await bot.session.close()
+
+        assert rejected.status == 401
+        assert accepted.status == 200
+        assert handled == [2]
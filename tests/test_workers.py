@@ -0,0 +1,117 @@
+import asyncio
+import json
+import socket
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message, Update
+
+from workers import (
+    IngressDispatcher,
+    consume_updates,
+    get_update_user_id,
+    restart_dead_workers,
+)
+
+
+def fake_update(update_id: int, user_id: int) -> Update:
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": 1760000000,
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+                "text": "📊 Statistics",
+            },
+        }
+    )
+
+
+@pytest.mark.asyncio
+class TestWorkers:
+    async def test_get_update_user_id(self):
+        assert get_update_user_id(fake_update(1, 42)) == 42
+        assert get_update_user_id(Update(update_id=1)) == 0
+
+    async def test_ingress_routes_by_user_id(self):
+        writers = [MagicMock(drain=AsyncMock()) for _ in range(3)]
+        dp = IngressDispatcher(writers)
+
+        for update_id, user_id in enumerate([1, 2, 3, 4, 1]):
+            await dp.feed_update(MagicMock(), fake_update(update_id, user_id))
+
+        assert writers[0].write.call_count == 1
+        assert writers[1].write.call_count == 3
+        assert writers[2].write.call_count == 1
+
+        line = writers[1].write.call_args_list[0][0][0]
+        assert line.endswith(b"\n")
+        assert json.loads(line)["message"]["from"]["id"] == 1
+
+    async def test_ingress_logs_dead_worker(self):
+        writer = MagicMock(drain=AsyncMock(side_effect=ConnectionResetError()))
+        dp = IngressDispatcher([writer])
+
+        await dp.feed_update(MagicMock(), fake_update(1, 1))
+
+    async def test_updates_reach_worker_dispatcher(self):
+        ingress_sock, worker_sock = socket.socketpair()
+        _, writer = await asyncio.open_connection(sock=ingress_sock)
+        reader, worker_writer = await asyncio.open_connection(sock=worker_sock)
+
+        handled = []
+        router = Router()
+
+        @router.message()
+        async def handle(message: Message):
+            # Earlier updates take longer, so concurrent handling would reorder them.
+            await asyncio.sleep((20 - message.message_id) / 1000)
+            handled.append((message.from_user.id, message.message_id))
+
+        worker_dp = Dispatcher()
+        worker_dp.include_router(router)
+        bot = Bot(token="42:TEST")
+
+        consumer = asyncio.create_task(consume_updates(worker_dp, bot, reader))
+
+        ingress = IngressDispatcher([writer])
+        for update_id in range(10):
+            await ingress.feed_update(bot, fake_update(update_id, 7 + update_id % 2))
+
+        writer.close()
+        await asyncio.wait_for(consumer, timeout=5)
+        worker_writer.close()
+        await bot.session.close()
+
+        for user_id in (7, 8):
+            assert [update for update in handled if update[0] == user_id] == [
+                (user_id, update_id) for update_id in range(user_id - 7, 10, 2)
+            ]
+
+    async def test_dead_workers_are_restarted(self):
+        alive = MagicMock(is_alive=MagicMock(return_value=True))
+        dead = MagicMock(is_alive=MagicMock(return_value=False), exitcode=1)
+        replacement = MagicMock(is_alive=MagicMock(return_value=True))
+        ingress_sock, worker_sock = socket.socketpair()
+        old_writer = MagicMock()
+        dp = IngressDispatcher([MagicMock(), old_writer])
+        processes = [alive, dead]
+        spawn = MagicMock(return_value=(replacement, ingress_sock))
+
+        watcher = asyncio.create_task(
+            restart_dead_workers(dp, processes, spawn, interval=0)
+        )
+        for _ in range(5):
+            await asyncio.sleep(0)
+        watcher.cancel()
+
+        spawn.assert_called_once_with(1)
+        old_writer.close.assert_called_once()
+        assert processes == [alive, replacement]
+        assert dp.writers[1] is not old_writer
+
+        dp.writers[1].close()
+        worker_sock.close()
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+from typing import Any, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookHandler:
+    """Accepts updates over HTTP and processes them concurrently.
+
+    Every update is answered as soon as it is scheduled. At most
+    ``max_in_flight`` updates are processed at once; past that, requests wait
+    for a free slot before they are acknowledged, which pushes back on Telegram
+    instead of piling up tasks.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        secret_token: Optional[str] = None,
+        max_in_flight: int = 100,
+        **data: Any,
+    ):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.secret_token = secret_token
+        self.data = data
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if (
+            self.secret_token
+            and request.headers.get(SECRET_HEADER) != self.secret_token
+        ):
+            return web.Response(status=401)
+
+        update = Update.model_validate(await request.json(), context={"bot": self.bot})
+
+        await self._semaphore.acquire()
+        task = asyncio.create_task(self._process_update(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+        return web.Response()
+
+    async def _process_update(self, update: Update):
+        try:
+            await self.dispatcher.feed_update(self.bot, update, **self.data)
+
+        except Exception as e:
+            logger.error(f"Error processing update {update.update_id}: {e}")
+
+        finally:
+            self._semaphore.release()
+
+    async def close(self, app: Optional[web.Application] = None):
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+WEBHOOK_HANDLER_KEY = web.AppKey("webhook_handler", WebhookHandler)
+
+
+def create_webhook_app(
+    dispatcher: Dispatcher,
+    bot: Bot,
+    path: str,
+    secret_token: Optional[str] = None,
+    max_in_flight: int = 100,
+    **data: Any,
+) -> web.Application:
+    handler = WebhookHandler(dispatcher, bot, secret_token, max_in_flight, **data)
+
+    app = web.Application()
+    app[WEBHOOK_HANDLER_KEY] = handler
+    app.router.add_post(path, handler.handle)
+    app.on_shutdown.append(handler.close)
+
+    return app
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import socket
+from collections import deque
+from multiprocessing.process import BaseProcess
+from typing import Any, Callable
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+STREAM_LIMIT = 4 * 1024 * 1024
+WORKER_CHECK_INTERVAL = 1.0
+
+
+def get_update_user_id(update: Update) -> int:
+    try:
+        user = getattr(update.event, "from_user", None)
+    except Exception:
+        user = None
+
+    return user.id if user else 0
+
+
+class IngressDispatcher(Dispatcher):
+    """Receives updates (polling or webhook) and forwards them to workers.
+
+    Updates from the same user always go to the same worker, so that user's
+    FSM state and handler ordering live in a single process. Handlers are never
+    run here; routers are only included so allowed update types resolve.
+    """
+
+    def __init__(self, writers: list[asyncio.StreamWriter], **kwargs: Any):
+        super().__init__(**kwargs)
+        self.writers = writers
+
+    def get_worker_index(self, update: Update) -> int:
+        return hash(get_update_user_id(update)) % len(self.writers)
+
+    async def feed_update(self, bot: Bot, update: Update, **kwargs: Any) -> Any:
+        index = self.get_worker_index(update)
+        writer = self.writers[index]
+
+        try:
+            writer.write(
+                update.model_dump_json(by_alias=True, exclude_unset=True).encode()
+                + b"\n"
+            )
+            await writer.drain()
+
+        except ConnectionError as e:
+            logger.error(f"Error forwarding update to worker {index}: {e}")
+
+
+async def _process_update(dp: Dispatcher, bot: Bot, update: Update):
+    try:
+        await dp.feed_update(bot, update)
+
+    except Exception as e:
+        logger.error(f"Error processing update {update.update_id}: {e}")
+
+
+async def consume_updates(dp: Dispatcher, bot: Bot, reader: asyncio.StreamReader):
+    """Handles updates from the ingress process.
+
+    Different users are handled concurrently, but each user's updates run one
+    at a time in arrival order, so FSM flows see them as the user sent them.
+    """
+    pending: dict[int, deque[Update]] = {}
+    tasks: set[asyncio.Task] = set()
+
+    async def process_user_updates(queue: deque[Update], user_id: int):
+        while queue:
+            await _process_update(dp, bot, queue[0])
+            queue.popleft()
+        del pending[user_id]
+
+    try:
+        while line := await reader.readline():
+            update = Update.model_validate_json(line, context={"bot": bot})
+            user_id = get_update_user_id(update)
+
+            queue = pending.get(user_id)
+            if queue is not None:
+                queue.append(update)
+                continue
+
+            queue = pending[user_id] = deque([update])
+            task = asyncio.create_task(process_user_updates(queue, user_id))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+    finally:
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def restart_dead_workers(
+    dp: IngressDispatcher,
+    processes: list[BaseProcess],
+    spawn: Callable[[int], tuple[BaseProcess, socket.socket]],
+    interval: float = WORKER_CHECK_INTERVAL,
+):
+    """Replaces worker processes that exited, so their users keep being served.
+
+    ``spawn(index)`` starts a worker and returns it with the ingress end of
+    its socket; updates routed to a worker while it is down are lost.
+    """
+    while True:
+        await asyncio.sleep(interval)
+
+        for index, process in enumerate(processes):
+            if process.is_alive():
+                continue
+
+            logger.error(
+                f"Worker {index} exited with code {process.exitcode}, restarting it."
+            )
+            dp.writers[index].close()
+            processes[index], sock = spawn(index)
+            _, dp.writers[index] = await asyncio.open_connection(
+                sock=sock, limit=STREAM_LIMIT
+            )